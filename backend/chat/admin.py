@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Message, TelegramUser, ChatSession, Document, ApplicantProfile, BroadcastMessage, ScrapedContent
+from .models import Message, TelegramUser, ChatSession, Document, ApplicantProfile, BroadcastMessage, ScrapedContent, ScheduleSnapshot
 
 @admin.register(TelegramUser)
 class TelegramUserAdmin(admin.ModelAdmin):
@@ -72,10 +72,10 @@ class ApplicantProfileAdmin(admin.ModelAdmin):
 
 @admin.register(BroadcastMessage)
 class BroadcastMessageAdmin(admin.ModelAdmin):
-    list_display = ['message_preview', 'sender', 'target_user_type', 'sent_count', 'created_at']
-    list_filter = ['target_user_type', 'created_at']
+    list_display = ['message_preview', 'sender', 'target_user_type', 'status', 'sent_count', 'failed_count', 'total_count', 'created_at']
+    list_filter = ['target_user_type', 'status', 'created_at']
     search_fields = ['message_text', 'sender__username']
-    readonly_fields = ['id', 'sent_count', 'created_at']
+    readonly_fields = ['id', 'status', 'total_count', 'sent_count', 'failed_count', 'last_user_id', 'started_at', 'finished_at', 'created_at']
     filter_horizontal = ['target_users']
     
     def message_preview(self, obj):
@@ -92,7 +92,14 @@ class ScrapedContentAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).order_by('-scraped_at')
 
+@admin.register(ScheduleSnapshot)
+class ScheduleSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['group', 'date', 'version', 'content_hash', 'created_at']
+    list_filter = ['date', 'created_at']
+    search_fields = ['group__name']
+    readonly_fields = ['group', 'date', 'version', 'content_hash', 'diff', 'created_at']
+
 # Custom admin site title
 admin.site.site_header = "МВЭУ - Администрирование бота"
 admin.site.site_title = "МВЭУ Admin"
-admin.site.index_title = "Панель администрирования"
\ No newline at end of file
+admin.site.index_title = "Панель администрирования"
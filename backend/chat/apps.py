@@ -10,6 +10,8 @@ class ChatConfig(AppConfig):
     name = 'chat'
     
     def ready(self):
+        from . import signals  # noqa: F401 - connects cache invalidation receivers
+        
         # Start Telegram bot in a separate thread
         if not hasattr(self, '_bot_started'):
             self._bot_started = True
@@ -23,6 +25,8 @@ class ChatConfig(AppConfig):
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
                 loop.run_until_complete(start_telegram_bot())
+                # Keep the loop alive for polling, webhook workers and background jobs
+                loop.run_forever()
             except Exception as e:
                 logger.error(f"Error starting Telegram bot: {e}")
         
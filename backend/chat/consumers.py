@@ -1,8 +1,9 @@
 import json
+import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from .models import Message, TelegramUser
-from .telegram_bot import bot
+from .models import TelegramUser
+from .telegram_bot import send_scheduler, run_in_bot_loop
+from .services.message_buffer import message_buffer
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -41,7 +42,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             # Send message to Telegram if telegram_user_id is provided
             if telegram_user_id:
                 try:
-                    await bot.send_message(chat_id=telegram_user_id, text=message_text)
+                    # The scheduler lives on the bot loop, wait for it from this one
+                    await asyncio.wrap_future(
+                        run_in_bot_loop(send_scheduler.send_message(telegram_user_id, message_text))
+                    )
                 except Exception as e:
                     await self.send(text_data=json.dumps({
                         'error': f'Failed to send message to Telegram: {str(e)}'
@@ -101,20 +105,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'message_id': event['message_id']
         }))
 
-    @database_sync_to_async
-    def save_message(self, text, source, direction, telegram_user_id=None, telegram_username=None, telegram_message_id=None):
-        telegram_user = None
+    async def save_message(self, text, source, direction, telegram_user_id=None, telegram_username=None, telegram_message_id=None):
+        telegram_user_pk = None
         if telegram_user_id:
-            try:
-                telegram_user = TelegramUser.objects.get(telegram_id=telegram_user_id)
-            except TelegramUser.DoesNotExist:
-                pass
+            telegram_user_pk = await TelegramUser.objects.filter(
+                telegram_id=telegram_user_id
+            ).values_list('pk', flat=True).afirst()
         
-        return Message.objects.create(
+        # Write-behind: the row is inserted by the buffer, id/created_at are already set
+        return message_buffer.add(
             text=text,
             source=source,
             direction=direction,
-            telegram_user=telegram_user,
+            telegram_user_id=telegram_user_pk,
             telegram_message_id=telegram_message_id
         )
 
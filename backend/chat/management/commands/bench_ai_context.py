@@ -0,0 +1,142 @@
+import os
+import random
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from chat.models import ScrapedContent
+from chat.services.knowledge_index import KnowledgeIndex
+from chat.services.openai_service import UniversityAIService
+from chat.services.vector_index import VectorIndex
+
+DISCIPLINES = [
+    ('экономика', 'экономики'), ('менеджмент', 'менеджмента'), ('юриспруденция', 'юриспруденции'),
+    ('информатика', 'информатики'), ('социология', 'социологии'), ('психология', 'психологии'),
+    ('журналистика', 'журналистики'), ('туризм', 'туризма'), ('реклама', 'рекламы'),
+    ('дизайн', 'дизайна'), ('лингвистика', 'лингвистики'), ('финансы', 'финансов'),
+    ('маркетинг', 'маркетинга'), ('логистика', 'логистики'), ('политология', 'политологии'),
+    ('статистика', 'статистики'), ('бухгалтерский учёт', 'бухгалтерского учёта'),
+    ('государственное управление', 'государственного управления'),
+    ('международные отношения', 'международных отношений'), ('гостиничное дело', 'гостиничного дела'),
+]
+
+FILLER = [
+    "Университет ведёт подготовку бакалавров и магистров по очной и заочной формам обучения.",
+    "Студенты проходят практику в ведущих компаниях города.",
+    "На кафедрах работают преподаватели с опытом практической работы.",
+    "Учебные планы направлений обновляются каждый год.",
+    "Для студентов открыта библиотека и компьютерные классы.",
+    "Расписание занятий публикуется на сайте университета.",
+    "Выпускники получают диплом государственного образца.",
+    "Университет участвует в программах академической мобильности.",
+    "В течение года проводятся дни открытых дверей для абитуриентов.",
+    "Обучение по направлению включает курсовые проекты и стажировки.",
+]
+
+def misspell(rng, text):
+    """Drop one letter inside the longest word"""
+    word = max(text.split(), key=len)
+    position = rng.randint(1, len(word) - 2)
+    return text.replace(word, word[:position] + word[position + 1:])
+
+def build_fact(rng, nominative, genitive, kind):
+    """(sentence placed on a page, question asked about it)"""
+    if kind == 0:
+        return (f"Кафедра {genitive} расположена в корпусе {rng.randint(1, 9)}, аудитория {rng.randint(100, 599)}.",
+                f"в каком корпусе находится кафедра {genitive}?")
+    if kind == 1:
+        return (f"Стоимость обучения по направлению «{nominative}» составляет {rng.randint(90, 300)} тысяч рублей в год.",
+                f"сколько стоит учиться на направлении {nominative}")
+    return (f"Проходной балл на направление «{nominative}» в прошлом году составил {rng.randint(150, 290)}.",
+            f"какой проходной балл был на {nominative}")
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark AI context selection: the first 10 active pages (legacy "
+        "get_university_context) vs BM25, vector and fused retrieval over chunks. "
+        "Reports the share of questions whose answer sentence reaches the prompt "
+        "and the latency per question. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=200)
+        parser.add_argument('--k', type=int, default=5, help="chunks put into the prompt")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                self.run(directory, options['pages'], options['k'], options['seed'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, pages, rng):
+        facts = [
+            build_fact(rng, nominative, genitive, kind)
+            for kind in range(3) for nominative, genitive in DISCIPLINES
+        ][:pages]
+        placement = dict(zip(rng.sample(range(pages), len(facts)), facts))
+        contents = []
+        for i in range(pages):
+            sentences = [rng.choice(FILLER) for _ in range(rng.randint(15, 30))]
+            if i in placement:
+                sentences.insert(rng.randint(0, len(sentences)), placement[i][0])
+            contents.append(ScrapedContent(
+                url=f"https://www.mveu.ru/page-{i}/",
+                title=f"Раздел {i}",
+                content=' '.join(sentences)[:3000]
+            ))
+        ScrapedContent.objects.bulk_create(contents)
+        # The scraper caps pages at 3000 chars; keep only facts that survived the cut
+        stored = ' '.join(content.content for content in contents)
+        return [(sentence, question, misspell(rng, question)) for sentence, question in facts if sentence in stored]
+
+    def run(self, directory, pages, k, seed):
+        facts = self.seed(pages, random.Random(seed))
+
+        start = time.perf_counter()
+        keyword = KnowledgeIndex(os.path.join(directory, 'knowledge_index.json'))
+        keyword.ensure_loaded()
+        vectors = VectorIndex(os.path.join(directory, 'knowledge_vectors.npy'), keyword, settings.KNOWLEDGE_VECTOR_DIM)
+        vectors.ensure_synced()
+        self.stdout.write(
+            f"{pages} pages, {keyword.stats()['chunks']} chunks, {len(facts)} questions, "
+            f"indexed in {time.perf_counter() - start:.2f}s\n"
+        )
+
+        def first_pages(question):
+            # Legacy context: 10 newest pages, each cut to 800 chars in the prompt
+            return [{'content': content.content[:800]} for content in ScrapedContent.objects.filter(is_active=True)[:10]]
+
+        def fused(question):
+            return UniversityAIService.fuse_rankings(
+                keyword.search(question, k),
+                vectors.search(question, k),
+                settings.AI_CONTEXT_KEYWORD_CHUNKS
+            )[:k]
+
+        for name, select in [
+            ('first 10 pages (before)', first_pages),
+            ('BM25 chunks', lambda question: keyword.search(question, k)),
+            ('vector chunks', lambda question: vectors.search(question, k)),
+            ('BM25 + vector (after)', fused),
+        ]:
+            line = f"{name:<24}"
+            for label, column in (('exact', 1), ('typos', 2)):
+                hits, timings = 0, []
+                for fact in facts:
+                    started = time.perf_counter()
+                    context = select(fact[column])
+                    timings.append(time.perf_counter() - started)
+                    hits += any(fact[0] in chunk['content'] for chunk in context)
+                timings.sort()
+                line += (
+                    f"  {label}: recall {hits / len(facts):6.1%}"
+                    f" mean {sum(timings) / len(timings) * 1000:6.3f} ms"
+                    f" p95 {timings[int(len(timings) * 0.95)] * 1000:6.3f} ms"
+                )
+            self.stdout.write(line)
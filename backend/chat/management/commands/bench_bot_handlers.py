@@ -0,0 +1,101 @@
+import asyncio
+import os
+import tempfile
+import time
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from chat.models import Message, StudentGroup, StudentProfile, TelegramUser
+from chat.services.db_executor import run_db
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the bot handlers' DB access pattern with concurrent simulated users: "
+        "legacy sync_to_async hops vs the async ORM / DB executor paths. "
+        "Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        users = options['users']
+        rounds = options['rounds']
+
+        if connection.vendor == 'sqlite':
+            # Shared-cache in-memory SQLite fails concurrent writers instead of waiting
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                tempfile.gettempdir(), 'bench_bot_handlers.sqlite3'
+            )
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            user_ids = self.seed(users)
+            self.stdout.write(f"{users} concurrent users x {rounds} updates each\n")
+            for name, handler in [
+                ('sync_to_async (before)', self.legacy_update),
+                ('async ORM (after)', self.async_orm_update),
+                ('DB executor (after)', self.executor_update),
+            ]:
+                elapsed = asyncio.run(self.run_scenario(handler, user_ids, rounds))
+                total = users * rounds
+                self.stdout.write(
+                    f"{name:<24} {elapsed:8.3f}s  {total / elapsed:10.1f} updates/s"
+                )
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, count):
+        group = StudentGroup.objects.create(name='БЕНЧ-001', course='1 курс', faculty='Бенчмарк')
+        user_ids = []
+        for i in range(count):
+            user = TelegramUser.objects.create(telegram_id=f"bench-{i}", user_type='student')
+            StudentProfile.objects.create(telegram_user=user, group=group)
+            user_ids.append(user.telegram_id)
+        return user_ids
+
+    async def run_scenario(self, handler, user_ids, rounds):
+        async def simulate_user(user_id):
+            for _ in range(rounds):
+                await handler(user_id)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[simulate_user(user_id) for user_id in user_ids])
+        return time.perf_counter() - start
+
+    # One update = identity lookup (user, profile, group) + question/answer rows,
+    # i.e. what handle_ai_question_student and show_my_schedule do.
+
+    async def legacy_update(self, user_id):
+        telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
+        profile = await sync_to_async(lambda: getattr(telegram_user, 'studentprofile', None))()
+        await sync_to_async(lambda: profile.group.name)()
+        for direction in ('incoming', 'outgoing'):
+            await sync_to_async(Message.objects.create)(
+                text='bench', source='telegram', direction=direction, telegram_user=telegram_user
+            )
+
+    async def async_orm_update(self, user_id):
+        telegram_user = await TelegramUser.objects.select_related(
+            'studentprofile__group'
+        ).aget(telegram_id=user_id)
+        telegram_user.studentprofile.group.name
+        for direction in ('incoming', 'outgoing'):
+            await Message.objects.acreate(
+                text='bench', source='telegram', direction=direction, telegram_user=telegram_user
+            )
+
+    async def executor_update(self, user_id):
+        def update():
+            telegram_user = TelegramUser.objects.select_related(
+                'studentprofile__group'
+            ).get(telegram_id=user_id)
+            Message.objects.bulk_create([
+                Message(text='bench', source='telegram', direction=direction, telegram_user=telegram_user)
+                for direction in ('incoming', 'outgoing')
+            ])
+        await run_db(update)
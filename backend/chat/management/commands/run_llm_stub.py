@@ -0,0 +1,91 @@
+import asyncio
+import json
+import time
+import uuid
+from aiohttp import web
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local OpenAI-compatible /v1/chat/completions stub that streams a canned "
+        "answer word by word. Point the bot at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 "
+        "and any OPENAI_API_KEY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--first-token-delay', type=float, default=0.3, help="seconds before the first word")
+        parser.add_argument('--token-delay', type=float, default=0.05, help="seconds between words")
+        parser.add_argument('--words', type=int, default=60, help="answer length in words")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.active = 0
+        self.max_active = 0
+        self.requests = 0
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.completions)
+        app.router.add_get('/stats', self.stats)
+        self.stdout.write(f"LLM stub listening on http://{options['host']}:{options['port']}/v1")
+        web.run_app(app, host=options['host'], port=options['port'], print=None)
+
+    def answer_words(self, messages):
+        prompt = messages[-1]['content'] if messages else ''
+        question = prompt.split('Вопрос пользователя:')[-1].split('\n')[0].strip()
+        words = f"Тестовый ответ на вопрос «{question}».".split()
+        length = max(self.options['words'], len(words))
+        filler = "Приемная комиссия МВЭУ подскажет подробности по телефону и через бота.".split()
+        while len(words) < length:
+            words.extend(filler)
+        return words[:length]
+
+    def chunk(self, completion_id, model, delta, finish_reason=None):
+        return {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+
+    async def completions(self, request):
+        body = await request.json()
+        words = self.answer_words(body.get('messages', []))
+        model = body.get('model', 'stub')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.options['first_token_delay'])
+            if not body.get('stream'):
+                await asyncio.sleep(self.options['token_delay'] * len(words))
+                return web.json_response({
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': model,
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': ' '.join(words)},
+                        'finish_reason': 'stop',
+                    }],
+                })
+
+            response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+            await response.prepare(request)
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(self.options['token_delay'])
+                delta = {'role': 'assistant', 'content': word} if i == 0 else {'content': f" {word}"}
+                await response.write(f"data: {json.dumps(self.chunk(completion_id, model, delta))}\n\n".encode('utf-8'))
+            await response.write(f"data: {json.dumps(self.chunk(completion_id, model, {}, 'stop'))}\n\n".encode('utf-8'))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            self.active -= 1
+
+    async def stats(self, request):
+        return web.json_response({'requests': self.requests, 'active': self.active, 'max_active': self.max_active})
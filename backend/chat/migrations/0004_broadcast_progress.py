@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_classroom_studentgroup_teacher_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastmessage',
+            name='failed_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='broadcastmessage',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='broadcastmessage',
+            name='last_user_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='broadcastmessage',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='broadcastmessage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Отправляется'), ('completed', 'Завершена'), ('failed', 'Ошибка')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='broadcastmessage',
+            name='total_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:41
+
+import re
+from datetime import time
+
+from django.db import migrations, models
+
+LESSON_TIME_RE = re.compile(r'(\d{1,2})[:.](\d{2})\s*[-–—]\s*(\d{1,2})[:.](\d{2})')
+
+
+def fill_lesson_times(apps, schema_editor):
+    ScheduleEntry = apps.get_model('chat', 'ScheduleEntry')
+    batch = []
+    for entry in ScheduleEntry.objects.filter(start_time__isnull=True).only('id', 'time').iterator(chunk_size=2000):
+        match = LESSON_TIME_RE.search(entry.time or '')
+        if not match:
+            continue
+        try:
+            h1, m1, h2, m2 = map(int, match.groups())
+            entry.start_time, entry.end_time = time(h1, m1), time(h2, m2)
+        except ValueError:
+            continue
+        batch.append(entry)
+        if len(batch) >= 2000:
+            ScheduleEntry.objects.bulk_update(batch, ['start_time', 'end_time'])
+            batch = []
+    if batch:
+        ScheduleEntry.objects.bulk_update(batch, ['start_time', 'end_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_broadcast_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='end_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='start_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleentry',
+            index=models.Index(fields=['group', 'date', 'start_time'], name='chat_entry_group_date_start'),
+        ),
+        migrations.RunPython(fill_lesson_times, migrations.RunPython.noop),
+    ]
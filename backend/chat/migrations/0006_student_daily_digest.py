@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_lesson_times'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='daily_digest',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_student_daily_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='reminder_minutes',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
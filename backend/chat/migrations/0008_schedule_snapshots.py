@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_student_reminder_minutes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('version', models.PositiveIntegerField()),
+                ('content_hash', models.CharField(max_length=40)),
+                ('diff', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='chat.studentgroup')),
+            ],
+            options={
+                'ordering': ['group', 'date', 'version'],
+                'unique_together': {('group', 'date', 'version')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+def opt_out_existing_students(apps, schema_editor):
+    # 0006 subscribed every existing profile; the digest is opt-in from here on
+    StudentProfile = apps.get_model('chat', 'StudentProfile')
+    StudentProfile.objects.filter(daily_digest=True).update(daily_digest=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_schedule_snapshots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='daily_digest',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(opt_out_existing_students, migrations.RunPython.noop),
+    ]
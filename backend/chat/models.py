@@ -1,8 +1,23 @@
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
+from datetime import time as dt_time
+import re
 import uuid
 
+LESSON_TIME_RE = re.compile(r'(\d{1,2})[:.](\d{2})\s*[-–—]\s*(\d{1,2})[:.](\d{2})')
+
+def parse_lesson_time(text):
+    """Parse "09:00-10:30" into (start, end) times, (None, None) if unparseable"""
+    match = LESSON_TIME_RE.search(text or '')
+    if not match:
+        return None, None
+    try:
+        h1, m1, h2, m2 = map(int, match.groups())
+        return dt_time(h1, m1), dt_time(h2, m2)
+    except ValueError:
+        return None, None
+
 class TelegramUser(models.Model):
     USER_TYPES = [
         ('applicant', 'Абитуриент'),
@@ -79,6 +94,8 @@ class ScheduleEntry(models.Model):
     group = models.ForeignKey(StudentGroup, on_delete=models.CASCADE)
     date = models.DateField()
     time = models.CharField(max_length=20)  # e.g., "09:00-10:30"
+    start_time = models.TimeField(blank=True, null=True)  # parsed from `time`
+    end_time = models.TimeField(blank=True, null=True)
     subject = models.CharField(max_length=200)
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
     classroom = models.ForeignKey(Classroom, on_delete=models.CASCADE)
@@ -89,10 +106,41 @@ class ScheduleEntry(models.Model):
     
     class Meta:
         ordering = ['date', 'time']
+        indexes = [
+            models.Index(fields=['group', 'date', 'start_time'], name='chat_entry_group_date_start'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # Always follow `time`, an edited slot must not keep the old times
+        self.start_time, self.end_time = parse_lesson_time(self.time)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'time' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'start_time', 'end_time'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.group.name} - {self.subject} ({self.time})"
 
+class ScheduleSnapshot(models.Model):
+    """One version of a group/date schedule, stored as a diff against the previous one.
+
+    Lessons are compact [time, subject, teacher, classroom, type] lists;
+    replaying the diffs from version 1 (everything "added") gives any version.
+    """
+    group = models.ForeignKey(StudentGroup, on_delete=models.CASCADE)
+    date = models.DateField()
+    version = models.PositiveIntegerField()
+    content_hash = models.CharField(max_length=40)
+    diff = models.JSONField(default=dict)  # {"added": [...], "removed": [...], "moved": [...]}
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['group', 'date', 'version']
+        ordering = ['group', 'date', 'version']
+    
+    def __str__(self):
+        return f"{self.group.name} {self.date} v{self.version}"
+
 # Student profile for schedule
 class StudentProfile(models.Model):
     telegram_user = models.OneToOneField(TelegramUser, on_delete=models.CASCADE)
@@ -102,6 +150,8 @@ class StudentProfile(models.Model):
     email = models.EmailField(blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     course = models.CharField(max_length=10, blank=True, null=True)
+    daily_digest = models.BooleanField(default=False)  # morning schedule digest, opt-in
+    reminder_minutes = models.PositiveSmallIntegerField(blank=True, null=True)  # lesson reminder lead time, None = off
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -210,13 +260,30 @@ class ScrapedContent(models.Model):
         return f"{self.title} ({self.url})"
 
 class BroadcastMessage(models.Model):
+    STATUSES = [
+        ('pending', 'Ожидает'),
+        ('running', 'Отправляется'),
+        ('completed', 'Завершена'),
+        ('failed', 'Ошибка'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     sender = models.ForeignKey(User, on_delete=models.CASCADE)  # Web admin user
     message_text = models.TextField()
     target_user_type = models.CharField(max_length=20, choices=TelegramUser.USER_TYPES, blank=True, null=True)
     target_users = models.ManyToManyField(TelegramUser, blank=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    total_count = models.IntegerField(default=0)
     sent_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    last_user_id = models.BigIntegerField(default=0)  # Resume cursor: last processed TelegramUser pk
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
     
+    @property
+    def pending_count(self):
+        return max(self.total_count - self.sent_count - self.failed_count, 0)
+    
     def __str__(self):
         return f"Рассылка от {self.sender} - {self.message_text[:50]}"
\ No newline at end of file
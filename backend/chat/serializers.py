@@ -92,4 +92,5 @@ class BroadcastMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = BroadcastMessage
         fields = ['id', 'sender_username', 'message_text', 'target_user_type',
-                 'target_user_type_display', 'sent_count', 'created_at']
\ No newline at end of file
+                 'target_user_type_display', 'status', 'total_count', 'sent_count',
+                 'failed_count', 'pending_count', 'started_at', 'finished_at', 'created_at']
\ No newline at end of file
@@ -0,0 +1,169 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+import numpy as np
+from django.conf import settings
+from .knowledge_index import STOP_WORDS, TOKEN_RE, stem
+
+_PRIME = (1 << 31) - 1
+
+# Stop words that change what is asked ("с общежитием" vs "без общежития",
+# "до сессии" vs "после сессии"); they stay in the key as typed
+MEANINGFUL_WORDS = frozenset("""
+не нет ни без с со до после больше более лучше перед через над под при между для от из к у о об про за
+в во на по
+""".split())
+KEY_STOP_WORDS = STOP_WORDS - MEANINGFUL_WORDS
+
+def normalize_question(question: str) -> str:
+    """Stems of the question without filler words and punctuation.
+
+    Unlike the search tokenizer, negations, prepositions and comparatives
+    are kept, so questions asking the opposite never share a key.
+    """
+    return ' '.join(
+        token if token in MEANINGFUL_WORDS else stem(token)
+        for token in TOKEN_RE.findall((question or '').lower().replace('ё', 'е'))
+        if token in MEANINGFUL_WORDS or (token not in KEY_STOP_WORDS and (len(token) > 1 or token.isdigit()))
+    )
+
+def shingles(key: str) -> FrozenSet[str]:
+    padded = f" {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+class AnswerCache:
+    """LRU + TTL cache of AI answers keyed by the normalized question.
+
+    Besides exact key hits, near-duplicates are found with MinHash LSH over
+    character trigrams of the key: candidates sharing a band are confirmed
+    by exact Jaccard similarity, and every word must have a close match in
+    the other question, so typos and word order are tolerated but "очной"
+    vs "заочной" or "1 курс" vs "2 курс" is not. Entries carry the
+    knowledge base version they were generated against and only match
+    lookups for the same version; the cache is also cleared on a change.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: int = 3600, similarity: float = 0.8,
+                 bands: int = 16, rows: int = 4):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.bands = bands
+        self.rows = rows
+        generator = np.random.default_rng(0)
+        self._a = generator.integers(1, _PRIME, size=(bands * rows, 1), dtype=np.int64)
+        self._b = generator.integers(0, _PRIME, size=(bands * rows, 1), dtype=np.int64)
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _bands(self, grams: FrozenSet[str]) -> List[Tuple[int, Tuple[int, ...]]]:
+        values = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.int64, count=len(grams))
+        # a < 2^31 and values < 2^32, so the products fit in int64
+        signature = ((self._a * values + self._b) % _PRIME).min(axis=1).tolist()
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    @staticmethod
+    def _words(key: str) -> List[FrozenSet[str]]:
+        return [shingles(word) for word in set(key.split())]
+
+    @staticmethod
+    def _words_align(words: List[FrozenSet[str]], others: List[FrozenSet[str]], threshold: float = 0.5) -> bool:
+        def matched(word, candidates):
+            return any(len(word & other) / len(word | other) >= threshold for other in candidates)
+        return all(matched(word, others) for word in words) and all(matched(other, words) for other in others)
+
+    def get(self, question: str, version: int = 0) -> Optional[str]:
+        key = normalize_question(question)
+        if not key:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires_at'] > now and entry['version'] == version:
+                self.exact_hits += 1
+                return self._hit(key, entry)
+
+            grams, words = shingles(key), self._words(key)
+            best_key, best_similarity = None, self.similarity
+            candidates = set().union(*(self._buckets.get(band, ()) for band in self._bands(grams)))
+            for candidate in candidates:
+                other = self._entries[candidate]
+                if other['expires_at'] <= now or other['version'] != version:
+                    continue
+                similarity = len(grams & other['grams']) / len(grams | other['grams'])
+                if similarity >= best_similarity and self._words_align(words, other['words']):
+                    best_key, best_similarity = candidate, similarity
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.near_hits += 1
+            return self._hit(best_key, self._entries[best_key])
+
+    def _hit(self, key: str, entry: Dict) -> str:
+        self._entries.move_to_end(key)
+        self.saved_seconds += entry['latency']
+        return entry['answer']
+
+    def put(self, question: str, answer: str, latency: float, version: int = 0):
+        """Store an answer with the time it took to produce"""
+        key = normalize_question(question)
+        if not key:
+            return
+        grams = shingles(key)
+        with self._lock:
+            self._remove(key)
+            bands = self._bands(grams)
+            self._entries[key] = {
+                'answer': answer,
+                'latency': latency,
+                'version': version,
+                'expires_at': time.monotonic() + self.ttl,
+                'grams': grams,
+                'words': self._words(key),
+                'bands': bands,
+            }
+            for band in bands:
+                self._buckets[band].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in entry['bands']:
+            bucket = self._buckets[band]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.exact_hits + self.near_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'exact_hits': self.exact_hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'saved_seconds': round(self.saved_seconds, 3),
+            }
+
+answer_cache = AnswerCache(
+    max_entries=settings.AI_ANSWER_CACHE_SIZE,
+    ttl=settings.AI_ANSWER_CACHE_TTL,
+    similarity=settings.AI_ANSWER_CACHE_SIMILARITY
+)
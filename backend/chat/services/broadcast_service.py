@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import List, Tuple
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from ..models import BroadcastMessage, Message
+from .send_scheduler import PRIORITY_BROADCAST
+from .db_executor import run_db
+
+logger = logging.getLogger(__name__)
+
+class BroadcastEngine:
+    """Resumable broadcast job runner.
+
+    The audience is walked in primary-key order chunk by chunk. After each
+    chunk the per-recipient Message rows are bulk-inserted and the counters
+    and resume cursor are saved, so a job interrupted by a crash continues
+    from the last finished chunk.
+    """
+
+    def __init__(self, send_scheduler, chunk_size: int = 500, concurrency: int = 30):
+        self.send_scheduler = send_scheduler
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.running = set()
+
+    async def run(self, broadcast_id):
+        """Send (or resume sending) a broadcast"""
+        if broadcast_id in self.running:
+            return
+        self.running.add(broadcast_id)
+
+        try:
+            broadcast = await BroadcastMessage.objects.aget(pk=broadcast_id)
+            if broadcast.status == 'completed':
+                return
+
+            await BroadcastMessage.objects.filter(pk=broadcast_id).aupdate(
+                status='running',
+                started_at=broadcast.started_at or timezone.now()
+            )
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            cursor = broadcast.last_user_id
+
+            while True:
+                chunk = await run_db(self._load_chunk, broadcast, cursor)
+                if not chunk:
+                    break
+
+                results = await asyncio.gather(*[
+                    self._send(semaphore, telegram_id, broadcast.message_text)
+                    for _, telegram_id in chunk
+                ])
+                sent_ids = [user_id for (user_id, _), ok in zip(chunk, results) if ok]
+                cursor = chunk[-1][0]
+
+                await run_db(self._save_chunk, broadcast, sent_ids, len(chunk) - len(sent_ids), cursor)
+
+            await BroadcastMessage.objects.filter(pk=broadcast_id).aupdate(
+                status='completed',
+                finished_at=timezone.now()
+            )
+            logger.info(f"Broadcast {broadcast_id} completed")
+
+        except Exception as e:
+            logger.error(f"Broadcast {broadcast_id} failed: {e}")
+            await BroadcastMessage.objects.filter(pk=broadcast_id).aupdate(status='failed')
+        finally:
+            self.running.discard(broadcast_id)
+
+    async def resume_unfinished(self):
+        """Resume broadcasts interrupted by a restart, started or not"""
+        async for broadcast_id in BroadcastMessage.objects.filter(
+            status__in=['pending', 'running']
+        ).values_list('id', flat=True):
+            logger.info(f"Resuming broadcast {broadcast_id}")
+            asyncio.create_task(self.run(broadcast_id))
+
+    async def _send(self, semaphore: asyncio.Semaphore, telegram_id: str, text: str) -> bool:
+        async with semaphore:
+            try:
+                await self.send_scheduler.send_message(telegram_id, text, priority=PRIORITY_BROADCAST)
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to send broadcast to {telegram_id}: {e}")
+                return False
+
+    def _load_chunk(self, broadcast: BroadcastMessage, cursor: int) -> List[Tuple[int, str]]:
+        # Keyset pagination on the pk doubles as the resume cursor
+        return list(
+            broadcast.target_users.filter(pk__gt=cursor, is_active=True)
+            .order_by('pk')
+            .values_list('pk', 'telegram_id')[:self.chunk_size]
+        )
+
+    def _save_chunk(self, broadcast: BroadcastMessage, sent_ids: List[int], failed: int, cursor: int):
+        with transaction.atomic():
+            Message.objects.bulk_create([
+                Message(
+                    text=broadcast.message_text,
+                    source='web',
+                    direction='outgoing',
+                    message_type='admin_broadcast',
+                    telegram_user_id=user_id
+                )
+                for user_id in sent_ids
+            ])
+            BroadcastMessage.objects.filter(pk=broadcast.pk).update(
+                sent_count=F('sent_count') + len(sent_ids),
+                failed_count=F('failed_count') + failed,
+                last_user_id=cursor
+            )
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class EndpointHealth:
+    """Success/failure statistics and breaker state of one upstream endpoint"""
+
+    def __init__(self, window: int):
+        self.state = CLOSED
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.last_success_at = 0.0
+        self.trial_in_flight = False
+        self.latencies = deque(maxlen=window)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker for the schedule site URL patterns.
+
+    An endpoint opens after `failure_threshold` consecutive failures and is
+    skipped for `cooldown` seconds; then a single trial request (half-open)
+    decides whether it closes again. `candidates()` orders the usable
+    endpoints so the pattern that worked most recently is tried first.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 300,
+                 hedge_percentile: float = 0.95, hedge_min_samples: int = 20, window: int = 200):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.window = window
+        self._endpoints: Dict[str, EndpointHealth] = {}
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.short_circuits = 0
+
+    def _health(self, name: str) -> EndpointHealth:
+        health = self._endpoints.get(name)
+        if health is None:
+            health = self._endpoints[name] = EndpointHealth(self.window)
+        return health
+
+    def candidates(self, names: List[str]) -> List[str]:
+        """Endpoints that may be called now, most recently successful first"""
+        now = time.time()
+        allowed = []
+        with self._lock:
+            for name in names:
+                health = self._health(name)
+                if health.state == OPEN and now - health.opened_at >= self.cooldown:
+                    health.state = HALF_OPEN
+                    health.trial_in_flight = False
+                if health.state == OPEN or (health.state == HALF_OPEN and health.trial_in_flight):
+                    self.short_circuits += 1
+                    continue
+                if health.state == HALF_OPEN:
+                    health.trial_in_flight = True
+                allowed.append(name)
+            allowed.sort(key=lambda name: -self._endpoints[name].last_success_at)
+        return allowed
+
+    def record_success(self, name: str, latency: float):
+        with self._lock:
+            health = self._health(name)
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.last_success_at = time.time()
+            health.latencies.append(latency)
+            health.state = CLOSED
+            health.trial_in_flight = False
+
+    def record_failure(self, name: str):
+        with self._lock:
+            health = self._health(name)
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.trial_in_flight = False
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                health.state = OPEN
+                health.opened_at = time.time()
+
+    def release(self, name: str):
+        """Forget an in-flight trial that was cancelled before it finished"""
+        with self._lock:
+            self._health(name).trial_in_flight = False
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """Latency after which a second endpoint is raced, None without enough samples"""
+        with self._lock:
+            health = self._health(name)
+            if len(health.latencies) < self.hedge_min_samples:
+                return None
+            return health.percentile(self.hedge_percentile)
+
+    def stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            endpoints = {}
+            for name, health in self._endpoints.items():
+                p50 = health.percentile(0.5)
+                p95 = health.percentile(0.95)
+                endpoints[name] = {
+                    'state': health.state,
+                    'successes': health.successes,
+                    'failures': health.failures,
+                    'consecutive_failures': health.consecutive_failures,
+                    'retry_in_seconds': (
+                        round(max(0.0, self.cooldown - (now - health.opened_at)), 1)
+                        if health.state == OPEN else None
+                    ),
+                    'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+                    'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                }
+        return {
+            'endpoints': endpoints,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'short_circuits': self.short_circuits,
+        }
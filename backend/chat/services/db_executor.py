@@ -0,0 +1,35 @@
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Dedicated pool for ORM work that the async ORM API can't express
+# (transactions, lazy relations, bulk operations). Unlike the default
+# thread_sensitive=True executor it is not serialized onto one thread,
+# so concurrent updates can use several DB connections at once.
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_EXECUTOR_WORKERS,
+    thread_name_prefix='db'
+)
+
+def _call(func, *args, **kwargs):
+    # Drop connections that went stale while the worker thread was idle
+    close_old_connections()
+    return func(*args, **kwargs)
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking ORM function on the DB executor pool"""
+    return await sync_to_async(_call, thread_sensitive=False, executor=db_executor)(
+        func, *args, **kwargs
+    )
+
+def db_sync_to_async(func):
+    """Decorator turning a blocking ORM function into a coroutine run on the DB pool"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from ..models import StudentGroup
+from .identity_cache import identity_cache
+
+logger = logging.getLogger(__name__)
+
+# Last-resort catalog used when upstream was never reachable and there is no snapshot
+FALLBACK_CATALOG = {
+    "1 курс": ["ДБ-241/21", "ДГД-241.1/21", "ДГД-241.2/21", "ДГД-241.3/21", "ДГД-241.4/21", "ДД-241.1/21", "ДД-241/21.Б", "ДД-241.2/21", "ДИС-241.1/21", "ДИС-241.2/21", "ДИС-241.3/21", "ДИС-241.4/21", "ДИС-241.5/21", "ДИС-241/21.Б", "ДИС-241.6/21", "ДНГ-241/21", "ДП-241.1/21", "ДП-241.2/21", "ДП-241.3/21", "ДР-241.1/21", "ДР-241.2/21", "ДР-241.3/21", "ДТГ-241.1/21", "ДТГ-241.2/21", "ДТГ-241.3/21", "ДТД-241/21", "ДЮ-241.1/21", "ДЮ-241.2/21"],
+    "2 курс": ["ДБ-232/21", "ДГД-232.1/21", "ДГД-232.2/21", "ДГД-232/2", "ДГД-214/21", "ДГД-232/21", "ДГД-241/2", "ДГД-232/21Б", "ДГД-232.3/21", "ДД-232.1/21", "ДД-232/21Б", "ДД-232.2/21", "ДИС-232.1/21", "ДИС-241.1/2", "ДИС-232.2/21", "ДИС-232.3/21", "ДИС-232.4/21", "ДИС-232.5/21", "ДИС-232/21 Б", "ДИС-232.6/21", "ДИС-241.2/2", "ДИС-232.7/21", "ДК 232.1/21", "ДК-232/21Б", "ДК-232.2/21", "ДНГ-232/21", "ДНГ-241/2", "ДОИС-232/21", "ДОИС-241/2", "ДП-232.1/21", "ДП-232.2/21", "ДП-232.3/21", "ДП-241/2", "ДПО-232/21", "ДР-232.1/21", "ДР-232.2/21", "ДР-241/2", "ДР-232/21н", "ДТГ-232/21", "ДТГ-241/2"],
+    "3 курс": ["ДБ-223/21", "ДБ-232/2", "ДД-223.1/21", "ДД-232/2", "ДД-223.2/21", "ДИС-223.1/21", "ДИС-232.2/21", "ДИС-223.3/21", "ДИС-223.4/21", "ДК-223/21", "ДК-232/2", "ДНГ-223/21", "ДП-223.1/21", "ДП-223.2/21", "ДП-223.3/21", "ДП 232/2", "ДПО-223/21", "ДПО-232/2", "ДР-223.1/21", "ДР 232.1/2", "ДР-223.2/21", "ДР 232.2/2", "ДР-223.3/21", "ДР 232.3/2", "ДТГ-223/21", "ДТГ-232/2"],
+    "4 курс": ["ДД-214/21", "ДД-214/21Б", "ДД-223/2", "ДИС-214.1/21", "ДИС-223/2", "ДИС-214/21Б", "ДИС-214.2/21", "ДИС-214.3/21", "ДНГ-214/21", "ДНГ-223/2", "ДР-214.1/21", "ДР-223/2", "ДР-214.2/21"]
+}
+
+class GroupCatalog:
+    """The {course: [group names]} catalog of the schedule site.
+
+    Kept in memory and mirrored to a JSON snapshot so a restart starts warm.
+    Refreshes after `ttl` seconds use ETag / Last-Modified conditional
+    requests, so an unchanged catalog costs a 304 and no parsing.
+    """
+
+    def __init__(self, snapshot_path: str, ttl: int = 3600):
+        self.snapshot_path = snapshot_path
+        self.ttl = ttl
+        self.data: Dict[str, List[str]] = {}
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.fetched_at = 0.0
+        self.source = 'empty'  # 'upstream', 'snapshot' or 'fallback'
+        self.refreshes = 0
+        self.not_modified = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self.load_snapshot()
+
+    def is_stale(self) -> bool:
+        return not self.data or time.time() - self.fetched_at >= self.ttl
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def update(self, data: Dict[str, List[str]], etag: str = None, last_modified: str = None) -> bool:
+        """Store a freshly fetched catalog, returns True if its content changed"""
+        with self._lock:
+            changed = data != self.data
+            self.data = data
+            self.etag = etag
+            self.last_modified = last_modified
+            self.fetched_at = time.time()
+            self.source = 'upstream'
+            self.refreshes += 1
+        if changed:
+            self.save_snapshot()
+        return changed
+
+    def mark_not_modified(self):
+        self.fetched_at = time.time()
+        self.not_modified += 1
+
+    def mark_failed(self) -> bool:
+        """Record a failed refresh; falls back to the built-in catalog if nothing is known"""
+        self.failures += 1
+        # Retry after a minute rather than on every call
+        self.fetched_at = time.time() - self.ttl + 60
+        if self.data:
+            return False
+        self.data = FALLBACK_CATALOG
+        self.source = 'fallback'
+        return True
+
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable group catalog snapshot {self.snapshot_path}: {e}")
+            return
+        self.data = snapshot.get('groups') or {}
+        self.etag = snapshot.get('etag')
+        self.last_modified = snapshot.get('last_modified')
+        # Snapshot content is served at once and revalidated in the background on first use
+        self.fetched_at = 0.0
+        self.source = 'snapshot'
+
+    def save_snapshot(self):
+        snapshot = {
+            'groups': self.data,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'saved_at': time.time(),
+        }
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not write group catalog snapshot: {e}")
+
+    def sync_groups(self, extract_faculty) -> Dict[str, int]:
+        """Mirror the catalog into StudentGroup rows (create missing, fix course)"""
+        courses = {}
+        for course, groups in self.data.items():
+            for group_name in groups:
+                courses.setdefault(group_name, course)
+
+        existing = {group.name: group for group in StudentGroup.objects.filter(name__in=list(courses))}
+        new_groups = [
+            StudentGroup(
+                name=group_name,
+                course=course,
+                faculty=extract_faculty(group_name),
+                is_active=True
+            )
+            for group_name, course in courses.items()
+            if group_name not in existing
+        ]
+        changed = []
+        for group_name, group in existing.items():
+            if group.course != courses[group_name] or not group.is_active:
+                group.course = courses[group_name]
+                group.is_active = True
+                changed.append(group)
+
+        StudentGroup.objects.bulk_create(new_groups, ignore_conflicts=True)
+        StudentGroup.objects.bulk_update(changed, ['course', 'is_active'])
+        # Bulk writes skip post_save; new groups cannot be in a cached identity yet
+        for group in changed:
+            identity_cache.invalidate_group(group.pk)
+        return {'created': len(new_groups), 'updated': len(changed)}
+
+    def stats(self) -> Dict:
+        return {
+            'source': self.source,
+            'groups': sum(len(groups) for groups in self.data.values()),
+            'age_seconds': round(time.time() - self.fetched_at, 1) if self.fetched_at else None,
+            'etag': self.etag,
+            'refreshes': self.refreshes,
+            'not_modified': self.not_modified,
+            'failures': self.failures,
+        }
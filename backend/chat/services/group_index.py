@@ -0,0 +1,116 @@
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+# Latin letters typed instead of Cyrillic ones: by sound ("DIS" -> "ДИС")...
+TRANSLIT = [
+    ('SHCH', 'Щ'), ('SCH', 'Щ'), ('SH', 'Ш'), ('CH', 'Ч'), ('ZH', 'Ж'), ('KH', 'Х'),
+    ('TS', 'Ц'), ('YU', 'Ю'), ('YA', 'Я'), ('YO', 'Ё'),
+    ('A', 'А'), ('B', 'Б'), ('V', 'В'), ('G', 'Г'), ('D', 'Д'), ('E', 'Е'), ('Z', 'З'),
+    ('I', 'И'), ('J', 'Й'), ('K', 'К'), ('L', 'Л'), ('M', 'М'), ('N', 'Н'), ('O', 'О'),
+    ('P', 'П'), ('R', 'Р'), ('S', 'С'), ('T', 'Т'), ('U', 'У'), ('F', 'Ф'), ('H', 'Х'),
+    ('C', 'К'), ('Y', 'Ы'), ('W', 'В'), ('X', 'КС'), ('Q', 'К'),
+]
+# ...and by shape ("P" looks like "Р", "H" like "Н")
+HOMOGLYPHS = str.maketrans('ABCEHKMOPTXY', 'АВСЕНКМОРТХУ')
+
+SEPARATORS = re.compile(r'[\s\-–—._/\\,]+')
+TRANSLIT_PATTERN = re.compile('|'.join(latin for latin, _ in TRANSLIT))
+TRANSLIT_MAP = dict(TRANSLIT)
+
+def normalize(text: str) -> str:
+    """Uppercase, drop separators and fold Ё into Е"""
+    return SEPARATORS.sub('', text.upper()).replace('Ё', 'Е')
+
+def query_variants(query: str) -> Set[str]:
+    """Normalized forms of a user query: as typed, transliterated and homoglyph-mapped"""
+    base = normalize(query)
+    variants = {base}
+    if re.search('[A-Z]', base):
+        variants.add(TRANSLIT_PATTERN.sub(lambda m: TRANSLIT_MAP[m.group(0)], base).replace('Ё', 'Е'))
+        variants.add(base.translate(HOMOGLYPHS))
+    return {variant for variant in variants if variant}
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class GroupSearchIndex:
+    """In-memory index over the group catalog.
+
+    Names are normalized once at build time; a query is scored against
+    candidates found by shared trigrams, so a lookup never scans the whole
+    catalog or touches the network. Queries shorter than a trigram ("ИС")
+    fall back to a substring scan of the normalized names.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names: List[str] = []
+        self._keys: List[str] = []
+        self._tokens: List[List[str]] = []
+        self._trigrams: Dict[str, Set[int]] = {}
+        self.source = None
+
+    def build(self, groups_data: Dict[str, List[str]]):
+        """(Re)build the index from a {course: [group names]} catalog"""
+        names = list(dict.fromkeys(name for groups in groups_data.values() for name in groups))
+        keys = [normalize(name) for name in names]
+        tokens = [[normalize(token) for token in SEPARATORS.split(name.upper()) if token] for name in names]
+        postings = defaultdict(set)
+        for i, key in enumerate(keys):
+            for gram in trigrams(key):
+                postings[gram].add(i)
+
+        with self._lock:
+            self._names, self._keys, self._tokens = names, keys, tokens
+            self._trigrams = dict(postings)
+            self.source = groups_data
+
+    def __len__(self):
+        return len(self._names)
+
+    def search(self, query: str, limit: int = 10) -> List[str]:
+        """Ranked group names matching the query"""
+        with self._lock:
+            names, keys, tokens, postings = self._names, self._keys, self._tokens, self._trigrams
+
+        scores: Dict[int, float] = {}
+        for variant in query_variants(query):
+            for i, score in self._score(variant, keys, tokens, postings):
+                if score > scores.get(i, 0):
+                    scores[i] = score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(names[item[0]]), names[item[0]]))
+        return [names[i] for i, _ in ranked[:limit]]
+
+    @staticmethod
+    def _score(variant: str, keys, tokens, postings) -> List[Tuple[int, float]]:
+        query_grams = trigrams(variant)
+        candidates = defaultdict(int)
+        if len(variant) < 3:
+            # Too short to share an inner trigram with a name
+            candidates.update((i, 0) for i, key in enumerate(keys) if variant in key)
+        for gram in query_grams:
+            for i in postings.get(gram, ()):
+                candidates[i] += 1
+
+        results = []
+        for i, shared in candidates.items():
+            key = keys[i]
+            if key == variant:
+                score = 100.0
+            elif key.startswith(variant):
+                score = 80.0 + 10.0 * len(variant) / len(key)
+            elif any(token.startswith(variant) for token in tokens[i]):
+                score = 70.0
+            elif variant in key:
+                score = 60.0
+            else:
+                similarity = shared / len(query_grams | trigrams(key))
+                if similarity < 0.3:
+                    continue
+                score = 50.0 * similarity
+            results.append((i, score))
+        return results
@@ -0,0 +1,142 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date as date_type, datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, Tuple
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from ..models import ScheduleEntry, StudentGroup
+
+def _escape(value: str) -> str:
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets (RFC 5545 3.1)"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, current, size = [], '', 0
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > (75 if not parts else 74):
+            parts.append(current)
+            current, size = '', 0
+        current += char
+        size += char_size
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+class IcsFeedCache:
+    """iCalendar feeds per group, assembled from cached group-week blocks.
+
+    Each week's VEVENT block is rendered from ScheduleEntry once and kept
+    with its hash; the feed ETag is derived from the block hashes, so a poll
+    whose blocks are cached is answered (or 304'd) without touching the DB.
+    Blocks are dropped when the schedule_changed signal reports their dates;
+    a per-block generation keeps a render racing an invalidation from
+    storing the outdated block.
+    """
+
+    def __init__(self, weeks: int = 2, max_entries: int = 2000):
+        self.weeks = weeks
+        self.max_entries = max_entries
+        self.time_zone = ZoneInfo(settings.SCHEDULE_TIME_ZONE)
+        self._blocks: "OrderedDict[Tuple[str, date_type], Tuple[str, str]]" = OrderedDict()
+        self._generations: "OrderedDict[Tuple[str, date_type], int]" = OrderedDict()
+        self._groups = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def feed(self, group_name: str, today: date_type) -> Tuple[str, str]:
+        """(calendar text, strong ETag) of the group's current and following weeks.
+
+        Raises StudentGroup.DoesNotExist for an unknown group.
+        """
+        if group_name not in self._groups:
+            if not StudentGroup.objects.filter(name=group_name).exists():
+                raise StudentGroup.DoesNotExist(group_name)
+            with self._lock:
+                self._groups.add(group_name)
+        monday = today - timedelta(days=today.weekday())
+        blocks = [self._week_block(group_name, monday + timedelta(weeks=i)) for i in range(self.weeks)]
+        etag = '"' + hashlib.sha1(''.join(digest for _, digest in blocks).encode('ascii')).hexdigest() + '"'
+
+        lines = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//MVEU//Schedule Bot//RU',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            _fold(f'X-WR-CALNAME:{_escape(f"Расписание {group_name}")}'),
+            'X-PUBLISHED-TTL:PT1H',
+        ]
+        body = '\r\n'.join(lines) + '\r\n' + ''.join(text for text, _ in blocks) + 'END:VCALENDAR\r\n'
+        return body, etag
+
+    def _week_block(self, group_name: str, monday: date_type) -> Tuple[str, str]:
+        key = (group_name, monday)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return block
+            self.misses += 1
+            generation = self._generations.get(key, 0)
+
+        text = self._render_week(group_name, monday)
+        # DTSTAMP is left out of the hash so a re-render of unchanged lessons keeps the ETag
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        stamp = datetime.now(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        block = (text.replace('DTSTAMP:\r\n', f'DTSTAMP:{stamp}\r\n'), digest)
+        with self._lock:
+            if self._generations.get(key, 0) == generation:
+                self._blocks[key] = block
+                while len(self._blocks) > self.max_entries:
+                    self._blocks.popitem(last=False)
+        return block
+
+    def _render_week(self, group_name: str, monday: date_type) -> str:
+        entries = ScheduleEntry.objects.filter(
+            group__name=group_name,
+            date__range=(monday, monday + timedelta(days=6)),
+            is_cancelled=False,
+            start_time__isnull=False,
+            end_time__isnull=False
+        ).select_related('teacher', 'classroom').order_by('date', 'start_time')
+        lesson_types = dict(ScheduleEntry.LESSON_TYPES)
+
+        lines = []
+        for entry in entries:
+            start = datetime.combine(entry.date, entry.start_time, tzinfo=self.time_zone).astimezone(dt_timezone.utc)
+            end = datetime.combine(entry.date, entry.end_time, tzinfo=self.time_zone).astimezone(dt_timezone.utc)
+            uid = hashlib.sha1(f"{group_name}|{entry.date}|{entry.time}|{entry.subject}".encode('utf-8')).hexdigest()
+            lesson_type = lesson_types.get(entry.lesson_type, entry.lesson_type)
+            lines += [
+                'BEGIN:VEVENT',
+                f'UID:{uid}@mveu-schedule',
+                'DTSTAMP:',
+                f"DTSTART:{start.strftime('%Y%m%dT%H%M%SZ')}",
+                f"DTEND:{end.strftime('%Y%m%dT%H%M%SZ')}",
+                _fold(f'SUMMARY:{_escape(f"{entry.subject} ({lesson_type})")}'),
+                _fold(f'LOCATION:{_escape(entry.classroom.name)}'),
+                _fold(f'DESCRIPTION:{_escape(f"Преподаватель: {entry.teacher.name}")}'),
+                'END:VEVENT',
+            ]
+        return ''.join(f'{line}\r\n' for line in lines)
+
+    def invalidate(self, group_name: str, dates: Iterable[date_type]):
+        with self._lock:
+            for day in dates:
+                key = (group_name, day - timedelta(days=day.weekday()))
+                self._blocks.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self._generations.move_to_end(key)
+            while len(self._generations) > self.max_entries:
+                self._generations.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {'blocks': len(self._blocks), 'hits': self.hits, 'misses': self.misses}
+
+ics_feed = IcsFeedCache()
@@ -0,0 +1,109 @@
+import copy
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+from django.conf import settings
+from ..models import TelegramUser, StudentProfile, StudentGroup
+
+logger = logging.getLogger(__name__)
+
+class Identity:
+    """A Telegram user together with their student profile and group"""
+
+    __slots__ = ('user', 'profile', 'group')
+
+    def __init__(self, user: TelegramUser):
+        self.user = user
+        self.profile: Optional[StudentProfile] = getattr(user, 'studentprofile', None)
+        self.group: Optional[StudentGroup] = self.profile.group if self.profile else None
+
+class IdentityCache:
+    """TTL + LRU cache of bot user identities keyed by telegram id.
+
+    A miss loads user, profile and group with one select_related query.
+    Entries are invalidated by post_save/post_delete signals (see chat.signals),
+    which may fire on any thread, hence the lock; a load that overlaps an
+    invalidation is returned but not cached. Every caller gets its own copy
+    of the model instances, so handlers may modify and save them.
+    """
+
+    def __init__(self, ttl: int = 300, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get(self, telegram_id: str) -> Identity:
+        """Get the identity, raises TelegramUser.DoesNotExist for unknown users"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(telegram_id)
+            if item is not None and item[1] > now:
+                self._entries.move_to_end(telegram_id)
+                self.hits += 1
+                return Identity(copy.deepcopy(item[0].user))
+            self.misses += 1
+            generation = self._generation
+
+        user = await TelegramUser.objects.select_related(
+            'studentprofile__group'
+        ).aget(telegram_id=telegram_id)
+        identity = Identity(user)
+
+        with self._lock:
+            # Something was invalidated while loading: the rows read may be stale
+            if self._generation == generation:
+                self._entries[telegram_id] = (Identity(copy.deepcopy(user)), time.monotonic() + self.ttl)
+                self._entries.move_to_end(telegram_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return identity
+
+    def invalidate(self, telegram_id: str):
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(telegram_id, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_user_pk(self, user_pk: int):
+        self._invalidate_where(lambda identity: identity.user.pk == user_pk)
+
+    def invalidate_group(self, group_pk: int):
+        self._invalidate_where(lambda identity: identity.group is not None and identity.group.pk == group_pk)
+
+    def _invalidate_where(self, predicate):
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, (identity, _) in self._entries.items() if predicate(identity)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+identity_cache = IdentityCache(
+    ttl=settings.IDENTITY_CACHE_TTL,
+    max_entries=settings.IDENTITY_CACHE_MAX_ENTRIES
+)
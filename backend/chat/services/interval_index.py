@@ -0,0 +1,204 @@
+import bisect
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date as date_type, time as dt_time
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..models import Classroom, ScheduleEntry
+
+def _minutes(value: dt_time) -> int:
+    return value.hour * 60 + value.minute
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+class Lesson:
+    """A stored lesson reduced to what the interval queries need"""
+
+    __slots__ = ('start', 'end', 'group_id', 'group', 'subject', 'teacher_id', 'teacher',
+                 'classroom_id', 'classroom', 'time')
+
+    def __init__(self, entry: ScheduleEntry):
+        self.start = _minutes(entry.start_time)
+        self.end = _minutes(entry.end_time)
+        self.group_id = entry.group_id
+        self.group = entry.group.name
+        self.subject = entry.subject
+        self.teacher_id = entry.teacher_id
+        self.teacher = entry.teacher.name
+        self.classroom_id = entry.classroom_id
+        self.classroom = entry.classroom.name
+        self.time = entry.time
+
+    def as_dict(self) -> Dict:
+        return {
+            'time': self.time,
+            'start': _clock(self.start),
+            'end': _clock(self.end),
+            'group': self.group,
+            'subject': self.subject,
+            'teacher_id': self.teacher_id,
+            'teacher': self.teacher,
+            'classroom_id': self.classroom_id,
+            'classroom': self.classroom,
+        }
+
+class DayIndex:
+    """Immutable per-date index: lessons sorted by start per classroom and per teacher"""
+
+    def __init__(self, lessons: List[Lesson]):
+        self.lessons = lessons
+        self.by_classroom = self._group(lessons, 'classroom_id')
+        self.by_teacher = self._group(lessons, 'teacher_id')
+        # Per classroom: sorted starts and running max of ends. A query interval
+        # overlaps a lesson iff some lesson starting before its end ends after its start
+        self.starts = {key: [lesson.start for lesson in items] for key, items in self.by_classroom.items()}
+        self.max_ends = {key: self._running_max(items) for key, items in self.by_classroom.items()}
+        self.teacher_conflicts = self._conflicts(self.by_teacher, lambda a, b: (a.classroom_id, a.subject) != (b.classroom_id, b.subject))
+        self.classroom_conflicts = self._conflicts(self.by_classroom, lambda a, b: (a.teacher_id, a.subject) != (b.teacher_id, b.subject))
+
+    @staticmethod
+    def _group(lessons: List[Lesson], attribute: str) -> Dict[int, List[Lesson]]:
+        grouped = defaultdict(list)
+        for lesson in lessons:
+            grouped[getattr(lesson, attribute)].append(lesson)
+        for items in grouped.values():
+            items.sort(key=lambda lesson: (lesson.start, lesson.end))
+        return dict(grouped)
+
+    @staticmethod
+    def _running_max(items: List[Lesson]) -> List[int]:
+        running, result = 0, []
+        for lesson in items:
+            running = max(running, lesson.end)
+            result.append(running)
+        return result
+
+    @staticmethod
+    def _conflicts(grouped: Dict[int, List[Lesson]], differs) -> List[Tuple[Lesson, Lesson]]:
+        """Overlapping pairs per resource (a joint lecture of several groups is not a conflict)"""
+        pairs = []
+        for items in grouped.values():
+            active: List[Lesson] = []
+            for lesson in items:
+                active = [other for other in active if other.end > lesson.start]
+                pairs.extend((other, lesson) for other in active if differs(other, lesson))
+                active.append(lesson)
+        return pairs
+
+    def is_busy(self, classroom_id: int, start: int, end: int) -> bool:
+        starts = self.starts.get(classroom_id)
+        if not starts:
+            return False
+        i = bisect.bisect_left(starts, end)
+        return i > 0 and self.max_ends[classroom_id][i - 1] > start
+
+class ScheduleIntervalIndex:
+    """In-memory interval index over ScheduleEntry, one DayIndex per date.
+
+    A date is loaded with one query on first use and kept in a small LRU.
+    When a group's lessons change (schedule_changed signal) only that group's
+    lessons are reloaded and the day index is rebuilt from memory. Indexes
+    are swapped in under the lock only if nothing replaced them meanwhile.
+    """
+
+    def __init__(self, max_days: int = 31):
+        self.max_days = max_days
+        self._days: "OrderedDict[date_type, DayIndex]" = OrderedDict()
+        self._classrooms: Optional[List[Tuple[int, str]]] = None
+        self._lock = threading.Lock()
+        self._changes = 0
+        self.loads = 0
+        self.group_reloads = 0
+
+    def _entries(self, day: date_type, group_id: int = None) -> Iterable[ScheduleEntry]:
+        queryset = ScheduleEntry.objects.filter(
+            date=day,
+            is_cancelled=False,
+            start_time__isnull=False,
+            end_time__isnull=False
+        ).select_related('group', 'teacher', 'classroom')
+        if group_id is not None:
+            queryset = queryset.filter(group_id=group_id)
+        return queryset
+
+    def day(self, day: date_type) -> DayIndex:
+        with self._lock:
+            index = self._days.get(day)
+            if index is not None:
+                self._days.move_to_end(day)
+                return index
+            changes = self._changes
+
+        index = DayIndex([Lesson(entry) for entry in self._entries(day)])
+        with self._lock:
+            self.loads += 1
+            # A group changed while loading: the rows read may be stale, don't keep them
+            if self._changes == changes:
+                self._days[day] = index
+                self._days.move_to_end(day)
+                while len(self._days) > self.max_days:
+                    self._days.popitem(last=False)
+        return index
+
+    def group_changed(self, group_id: int, dates: Iterable[date_type]):
+        """Swap in fresh lessons of one group for the dates already indexed"""
+        with self._lock:
+            self._changes += 1
+            # New classrooms may have appeared
+            self._classrooms = None
+        for day in dates:
+            with self._lock:
+                index = self._days.get(day)
+            if index is None:
+                continue
+            lessons = [lesson for lesson in index.lessons if lesson.group_id != group_id]
+            lessons.extend(Lesson(entry) for entry in self._entries(day, group_id))
+            fresh = DayIndex(lessons)
+            with self._lock:
+                self.group_reloads += 1
+                if self._days.get(day) is index:
+                    self._days[day] = fresh
+                else:
+                    # Another change replaced the day meanwhile: let day() reload it whole
+                    self._days.pop(day, None)
+
+    def classrooms(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            classrooms, changes = self._classrooms, self._changes
+        if classrooms is None:
+            classrooms = list(Classroom.objects.order_by('name').values_list('id', 'name'))
+            with self._lock:
+                if self._changes == changes:
+                    self._classrooms = classrooms
+        return classrooms
+
+    def free_classrooms(self, day: date_type, start: dt_time, end: dt_time = None) -> List[Dict]:
+        """Classrooms with no lesson overlapping [start, end) (a single minute if no end)"""
+        index = self.day(day)
+        start_min = _minutes(start)
+        end_min = _minutes(end) if end else start_min + 1
+        return [
+            {'id': classroom_id, 'name': name}
+            for classroom_id, name in self.classrooms()
+            if not index.is_busy(classroom_id, start_min, end_min)
+        ]
+
+    def teacher_timetable(self, day: date_type, teacher_id: int) -> List[Dict]:
+        return [lesson.as_dict() for lesson in self.day(day).by_teacher.get(teacher_id, [])]
+
+    def conflicts(self, day: date_type, kind: str = 'teacher') -> List[Dict]:
+        """Double-booked teachers or classrooms on a date"""
+        index = self.day(day)
+        pairs = index.teacher_conflicts if kind == 'teacher' else index.classroom_conflicts
+        return [{'first': first.as_dict(), 'second': second.as_dict()} for first, second in pairs]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'days': len(self._days),
+                'lessons': sum(len(index.lessons) for index in self._days.values()),
+                'loads': self.loads,
+                'group_reloads': self.group_reloads,
+            }
+
+interval_index = ScheduleIntervalIndex()
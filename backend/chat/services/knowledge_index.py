@@ -0,0 +1,320 @@
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+from django.conf import settings
+from ..models import ScrapedContent
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+TOKEN_RE = re.compile(r'[a-zа-я0-9]+')
+SENTENCE_RE = re.compile(r'(?<=[.!?…])\s+')
+
+STOP_WORDS = frozenset("""
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было вот
+от меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас нибудь опять
+уж вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам чтоб без
+будто чего раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь этом один почти
+мой тем чтобы нее сейчас были куда зачем всех никогда можно при наконец два об другой хоть после над больше
+тот через эти нас про всего них какая много разве три эту моя впрочем хорошо свою этой перед иногда лучше
+чуть том нельзя такой им более всегда конечно всю между это как какие какое каких
+""".split())
+
+# Light Russian stemmer after the Snowball algorithm (endings are removed from RV,
+# the part of the word after its first vowel)
+_VOWELS = 'аеиоуыэюя'
+_PERFECTIVE_GERUND = re.compile(r'((?<=[ая])(в|вши|вшись)|(ив|ивши|ившись|ыв|ывши|ывшись))$')
+_REFLEXIVE = re.compile(r'(ся|сь)$')
+_ADJECTIVE = re.compile(r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$')
+_PARTICIPLE = re.compile(r'((?<=[ая])(ем|нн|вш|ющ|щ)|(ивш|ывш|ующ))$')
+_VERB = re.compile(r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)|'
+                   r'(ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю))$')
+_NOUN = re.compile(r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+_DERIVATIONAL = re.compile(r'(ост|ость)$')
+_SUPERLATIVE = re.compile(r'(ейш|ейше)$')
+
+def stem(word: str) -> str:
+    """Strip Russian inflectional endings (Latin words and numbers pass through)"""
+    position = next((i for i, char in enumerate(word) if char in _VOWELS), None)
+    if position is None:
+        return word
+    head, rv = word[:position + 1], word[position + 1:]
+
+    rv, found = _PERFECTIVE_GERUND.subn('', rv)
+    if not found:
+        rv = _REFLEXIVE.sub('', rv)
+        rv, found = _ADJECTIVE.subn('', rv)
+        if found:
+            rv = _PARTICIPLE.sub('', rv)
+        else:
+            rv, found = _VERB.subn('', rv)
+            if not found:
+                rv = _NOUN.sub('', rv)
+    rv = re.sub('и$', '', rv)
+    if len(rv) > 4:
+        rv = _DERIVATIONAL.sub('', rv)
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        rv, found = _SUPERLATIVE.subn('', rv)
+        if found and rv.endswith('нн'):
+            rv = rv[:-1]
+        elif not found:
+            rv = re.sub('ь$', '', rv)
+    return head + rv
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stop-word-free stems"""
+    return [
+        stem(token) for token in TOKEN_RE.findall((text or '').lower().replace('ё', 'е'))
+        if token not in STOP_WORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+def split_chunks(text: str, size: int = 700, overlap: int = 150) -> List[str]:
+    """Split page text into chunks of whole sentences, at most `size` chars.
+
+    The last sentence of a chunk is repeated at the start of the next one
+    when it is shorter than `overlap`, so an answer spanning the border
+    is still found in one chunk.
+    """
+    sentences = []
+    for sentence in SENTENCE_RE.split((text or '').strip()):
+        while len(sentence) > size:
+            cut = sentence.rfind(' ', 0, size)
+            cut = cut if cut > size // 2 else size
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            sentences.append(sentence)
+
+    chunks, current = [], []
+    for sentence in sentences:
+        if current and sum(len(part) + 1 for part in current) + len(sentence) > size:
+            chunks.append(' '.join(current))
+            current = [current[-1]] if len(current[-1]) <= overlap and len(current[-1]) + len(sentence) < size else []
+        current.append(sentence)
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+def content_digest(content: ScrapedContent) -> str:
+    return hashlib.sha1(f"{content.url}\n{content.title}\n{content.content}".encode('utf-8')).hexdigest()
+
+class KnowledgeIndex:
+    """BM25 inverted index over chunks of the active ScrapedContent pages.
+
+    Pages are chunked and tokenized once when they are stored; the per-chunk
+    term counts are mirrored to a JSON snapshot and the postings are rebuilt
+    from it at startup, so nothing is re-tokenized on a restart. On load the
+    snapshot is reconciled with the active rows by id. `version` changes
+    whenever the indexed text changes.
+    """
+
+    def __init__(self, snapshot_path: str, k1: float = 1.5, b: float = 0.75):
+        self.snapshot_path = snapshot_path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._docs: Dict[int, Dict] = {}  # content id -> {'digest', 'chunks': [chunk id]}
+        self._chunks: Dict[int, Dict] = {}  # chunk id -> url, title, text, length, terms
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._total_length = 0
+        self._next_chunk = 1
+        self.version = 0
+        self.loaded = False
+        self.searches = 0
+
+    # Building
+
+    def _add(self, content: ScrapedContent, digest: str):
+        title_terms = tokenize(content.title)
+        chunk_ids = []
+        for text in split_chunks(content.content):
+            terms = Counter(tokenize(text))
+            terms.update(title_terms)
+            chunk_id = self._next_chunk
+            self._next_chunk += 1
+            self._insert(chunk_id, {
+                'content_id': content.id,
+                'url': content.url,
+                'title': content.title,
+                'text': text,
+                'length': sum(terms.values()),
+                'terms': dict(terms),
+            })
+            chunk_ids.append(chunk_id)
+        self._docs[content.id] = {'digest': digest, 'chunks': chunk_ids}
+
+    def _insert(self, chunk_id: int, chunk: Dict):
+        self._chunks[chunk_id] = chunk
+        self._total_length += chunk['length']
+        for term, count in chunk['terms'].items():
+            self._postings[term][chunk_id] = count
+
+    def _remove(self, content_id: int):
+        doc = self._docs.pop(content_id, None)
+        if doc is None:
+            return
+        for chunk_id in doc['chunks']:
+            chunk = self._chunks.pop(chunk_id)
+            self._total_length -= chunk['length']
+            for term in chunk['terms']:
+                postings = self._postings[term]
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def update(self, added: Iterable[ScrapedContent] = (), removed: Iterable[int] = ()) -> bool:
+        """Index new pages and drop deactivated ones; True if the indexed text changed.
+
+        A page re-stored with identical text under a new id keeps its chunks.
+        """
+        with self._lock:
+            retired = {}
+            for content_id in removed:
+                doc = self._docs.get(content_id)
+                if doc is not None:
+                    retired[doc['digest']] = content_id
+
+            changed = False
+            for content in added:
+                digest = content_digest(content)
+                previous = retired.pop(digest, None)
+                if previous is not None:
+                    doc = self._docs.pop(previous)
+                    for chunk_id in doc['chunks']:
+                        self._chunks[chunk_id]['content_id'] = content.id
+                    self._docs[content.id] = doc
+                    continue
+                self._remove(content.id)
+                self._add(content, digest)
+                changed = True
+
+            for content_id in retired.values():
+                self._remove(content_id)
+                changed = True
+            if changed:
+                self.version += 1
+            return changed
+
+    def ensure_loaded(self):
+        """Load the snapshot and reconcile it with the active pages (once)"""
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            self.load_snapshot()
+            active = set(ScrapedContent.objects.filter(is_active=True).values_list('id', flat=True))
+            stale = set(self._docs) - active
+            missing = active - set(self._docs)
+            if stale or missing:
+                self.update(added=ScrapedContent.objects.filter(id__in=missing), removed=stale)
+                self.save_snapshot()
+            self.loaded = True
+
+    # Persistence
+
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable knowledge index snapshot {self.snapshot_path}: {e}")
+            return
+        if snapshot.get('format') != SNAPSHOT_FORMAT:
+            return
+
+        self._docs = {int(content_id): doc for content_id, doc in snapshot['docs'].items()}
+        self._chunks, self._postings, self._total_length = {}, defaultdict(dict), 0
+        for chunk_id, chunk in snapshot['chunks'].items():
+            self._insert(int(chunk_id), chunk)
+        self._next_chunk = snapshot['next_chunk']
+        self.version = snapshot['version']
+        logger.info(f"Loaded knowledge index snapshot: {len(self._docs)} pages, {len(self._chunks)} chunks")
+
+    def save_snapshot(self):
+        with self._lock:
+            snapshot = {
+                'format': SNAPSHOT_FORMAT,
+                'version': self.version,
+                'next_chunk': self._next_chunk,
+                'docs': self._docs,
+                'chunks': self._chunks,
+            }
+            tmp_path = f"{self.snapshot_path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                os.replace(tmp_path, self.snapshot_path)
+            except OSError as e:
+                logger.warning(f"Could not write knowledge index snapshot: {e}")
+
+    # Querying
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """Top-k chunks by BM25 score"""
+        terms = set(tokenize(query))
+        with self._lock:
+            self.searches += 1
+            total = len(self._chunks)
+            if not terms or not total:
+                return []
+            average_length = self._total_length / total
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, count in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._chunks[chunk_id]['length'] / average_length)
+                    scores[chunk_id] += idf * count * (self.k1 + 1) / (count + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [self.result(chunk_id, score) for chunk_id, score in best]
+
+    def leading_chunks(self, k: int = 5) -> List[Dict]:
+        """First chunk of the most recently stored pages (no usable query terms)"""
+        with self._lock:
+            content_ids = sorted(self._docs, reverse=True)[:k]
+            return [self.result(self._docs[content_id]['chunks'][0], 0.0)
+                    for content_id in content_ids if self._docs[content_id]['chunks']]
+
+    def result(self, chunk_id: int, score: float) -> Optional[Dict]:
+        chunk = self._chunks.get(chunk_id)
+        if chunk is None:
+            return None
+        return {
+            'chunk_id': chunk_id,
+            'url': chunk['url'],
+            'title': chunk['title'],
+            'content': chunk['text'],
+            'score': round(score, 4),
+        }
+
+    def chunk_texts(self) -> Dict[int, str]:
+        """Title and text of every indexed chunk by chunk id"""
+        with self._lock:
+            return {chunk_id: f"{chunk['title']}\n{chunk['text']}" for chunk_id, chunk in self._chunks.items()}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'pages': len(self._docs),
+                'chunks': len(self._chunks),
+                'terms': len(self._postings),
+                'version': self.version,
+                'searches': self.searches,
+            }
+
+knowledge_index = KnowledgeIndex(settings.KNOWLEDGE_INDEX_SNAPSHOT)
@@ -0,0 +1,226 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import date as date_type, datetime, timedelta
+from typing import Dict, List, Optional, Set
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from ..models import StudentProfile, ScheduleEntry
+from .db_executor import run_db
+from .send_scheduler import PRIORITY_NOTIFICATION
+
+logger = logging.getLogger(__name__)
+
+# Lead times a student can choose, in minutes
+REMINDER_CHOICES = (5, 10, 15, 30)
+
+class LessonReminders:
+    """Heap-scheduled "lesson starts in N minutes" reminders.
+
+    Work is keyed by (group, time slot, lead time), never by user: the heap
+    holds one timer per slot and lead time, and firing it fans one rendered
+    text out to the group's subscribers from a reverse index
+    (group -> lead time -> telegram ids). The heap covers the current day;
+    a group's timers are rebuilt when its schedule for today changes or a
+    new lead time appears in it, stale timers are dropped lazily by version.
+    """
+
+    def __init__(self):
+        self.send_scheduler = None
+        self.time_zone = ZoneInfo(settings.SCHEDULE_TIME_ZONE)
+        self._subscribers: Dict[int, Dict[int, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        self._subscriptions: Dict[str, tuple] = {}  # telegram id -> (group id, minutes)
+        self._lock = threading.Lock()
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._versions: Dict[int, int] = defaultdict(int)
+        self._day: Optional[date_type] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._reloads: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.fired = 0
+        self.sent = 0
+        self.failed = 0
+
+    async def start(self, send_scheduler):
+        self.send_scheduler = send_scheduler
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await run_db(self._load_subscribers)
+        await self._rebuild_day()
+        self._task = asyncio.create_task(self._run(), name="lesson-reminders")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._loop = None
+
+    def _now(self) -> datetime:
+        return datetime.now(self.time_zone)
+
+    # Reverse index (may be called from any thread)
+
+    def _load_subscribers(self):
+        with self._lock:
+            self._subscribers.clear()
+            self._subscriptions.clear()
+            for telegram_id, group_id, minutes in StudentProfile.objects.filter(
+                reminder_minutes__isnull=False,
+                group__isnull=False,
+                telegram_user__is_active=True
+            ).values_list('telegram_user__telegram_id', 'group_id', 'reminder_minutes'):
+                self._subscribers[group_id][minutes].add(telegram_id)
+                self._subscriptions[telegram_id] = (group_id, minutes)
+
+    def update_subscriber(self, telegram_id: str, group_id: Optional[int], minutes: Optional[int]):
+        """Move a student in the reverse index (called from StudentProfile signals)"""
+        subscription = (group_id, minutes) if group_id and minutes else None
+        with self._lock:
+            previous = self._subscriptions.pop(telegram_id, None)
+            if previous is not None:
+                self._subscribers[previous[0]][previous[1]].discard(telegram_id)
+            if subscription is None:
+                return
+            new_lead_time = not self._subscribers[group_id][minutes]
+            self._subscribers[group_id][minutes].add(telegram_id)
+            self._subscriptions[telegram_id] = subscription
+        if new_lead_time:
+            self.schedule_changed(group_id, [self._now().date()])
+
+    def schedule_changed(self, group_id: int, dates):
+        """Rebuild a group's timers if today's schedule changed (thread-safe)"""
+        loop = self._loop
+        if loop is None or self._day not in dates:
+            return
+        loop.call_soon_threadsafe(self._request_reload, group_id)
+
+    def _request_reload(self, group_id: int):
+        if group_id in self._reloads:
+            return
+        self._reloads.add(group_id)
+        self._spawn(self._reload_group(group_id))
+    
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # Heap (event loop only)
+
+    async def _rebuild_day(self):
+        self._day = self._now().date()
+        self._heap = []
+        with self._lock:
+            group_ids = [group_id for group_id, leads in self._subscribers.items() if any(leads.values())]
+        slots = await run_db(self._load_slots, group_ids, self._day)
+        for group_id in group_ids:
+            self._versions[group_id] += 1
+            self._push_group(group_id, slots.get(group_id, []))
+        self._wakeup.set()
+
+    async def _reload_group(self, group_id: int):
+        try:
+            slots = await run_db(self._load_slots, [group_id], self._day)
+            self._versions[group_id] += 1
+            self._push_group(group_id, slots.get(group_id, []))
+            self._wakeup.set()
+        except Exception as e:
+            logger.error(f"Reloading reminders of group {group_id} failed: {e}")
+        finally:
+            self._reloads.discard(group_id)
+
+    def _push_group(self, group_id: int, slots: List[Dict]):
+        with self._lock:
+            lead_times = [minutes for minutes, ids in self._subscribers[group_id].items() if ids]
+        now = self._now()
+        version = self._versions[group_id]
+        for slot in slots:
+            starts_at = datetime.combine(self._day, slot['start_time'], tzinfo=now.tzinfo)
+            for minutes in lead_times:
+                fire_at = starts_at - timedelta(minutes=minutes)
+                if fire_at > now:
+                    heapq.heappush(self._heap, (fire_at.timestamp(), next(self._seq), group_id, version, minutes, slot))
+
+    def _load_slots(self, group_ids: List[int], day: date_type) -> Dict[int, List[Dict]]:
+        """Today's lessons of the groups, one slot per (group, start time)"""
+        slots = defaultdict(dict)
+        for entry in ScheduleEntry.objects.filter(
+            group_id__in=group_ids,
+            date=day,
+            is_cancelled=False,
+            start_time__isnull=False
+        ).select_related('classroom').order_by('group_id', 'start_time'):
+            slot = slots[entry.group_id].setdefault(entry.start_time, {
+                'start_time': entry.start_time,
+                'time': entry.time,
+                'lessons': [],
+            })
+            slot['lessons'].append(f"📚 {entry.subject} — 🏢 {entry.classroom.name}")
+        return {group_id: list(by_time.values()) for group_id, by_time in slots.items()}
+
+    async def _run(self):
+        while True:
+            now = self._now()
+            if now.date() != self._day:
+                await self._rebuild_day()
+                continue
+
+            midnight = datetime.combine(self._day + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+            next_at = self._heap[0][0] if self._heap else midnight.timestamp()
+            delay = min(next_at, midnight.timestamp()) - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if not self._heap:
+                continue
+            _, _, group_id, version, minutes, slot = heapq.heappop(self._heap)
+            if version != self._versions[group_id]:
+                continue
+            self._spawn(self._fire(group_id, minutes, slot))
+
+    async def _fire(self, group_id: int, minutes: int, slot: Dict):
+        with self._lock:
+            recipients = list(self._subscribers[group_id][minutes])
+        if not recipients:
+            return
+        self.fired += 1
+        text = f"⏰ Через {minutes} мин. начинается пара ({slot['time']})\n\n" + "\n".join(slot['lessons'])
+
+        async def send(telegram_id):
+            try:
+                await self.send_scheduler.send_message(telegram_id, text, priority=PRIORITY_NOTIFICATION)
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Failed to send reminder to {telegram_id}: {e}")
+
+        await asyncio.gather(*[send(telegram_id) for telegram_id in recipients])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            subscribers = len(self._subscriptions)
+            groups = sum(1 for leads in self._subscribers.values() if any(leads.values()))
+        return {
+            'subscribers': subscribers,
+            'groups': groups,
+            'day': self._day.isoformat() if self._day else None,
+            'pending_timers': len(self._heap),
+            'fired': self.fired,
+            'sent': self.sent,
+            'failed': self.failed,
+        }
+
+lesson_reminders = LessonReminders()
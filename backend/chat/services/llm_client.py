@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional, Set, Union
+import httpx
+import openai
+from django.conf import settings
+from .db_executor import run_db
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """One upstream request and the callers reading it"""
+
+    def __init__(self, key: Optional[Hashable] = None):
+        self.key = key
+        self.deltas: List[str] = []
+        self.subscribers: Set[Callable] = set()
+        self.task: Optional[asyncio.Task] = None
+
+class LLMClient:
+    """Streaming chat-completions client shared by the bot and the web API.
+
+    Requests run on the client's own event loop thread, so one asyncio
+    semaphore bounds concurrent upstream calls process-wide whichever loop
+    asks. Deltas are handed back to the caller's loop as they arrive; a
+    request is cancelled once no caller reads it any more. Identical
+    concurrent requests are coalesced by key (single flight). `base_url`
+    points the client at any OpenAI-compatible server (e.g. run_llm_stub).
+    """
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str], model: str,
+                 max_concurrency: int = 8, timeout: float = 60, connect_timeout: float = 5,
+                 max_retries: int = 1):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._client: Optional[openai.AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.first_token_times = deque(maxlen=1000)
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._subscriptions: Dict[Callable, _Flight] = {}
+        self.flights_started = 0
+        self.flights_joined = 0
+        self.max_subscribers = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='llm-client', daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self) -> openai.AsyncOpenAI:
+        # Only called on the client's own loop
+        if self._client is None:
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url or None,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                max_retries=self.max_retries
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def stream(self, messages: Union[List[Dict], Callable[[], List[Dict]]],
+                     key: Optional[Hashable] = None) -> AsyncIterator[str]:
+        """Yield answer text deltas (from any event loop).
+
+        Concurrent calls with the same `key` share one upstream request: a
+        caller joining late first gets the deltas produced so far. `messages`
+        may be a function; only the caller that starts the request runs it
+        (on the DB pool).
+        """
+        caller = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        loop = self._get_loop()
+
+        def emit(kind: str, value=None):
+            caller.call_soon_threadsafe(queue.put_nowait, (kind, value))
+
+        loop.call_soon_threadsafe(self._subscribe, key, messages, emit)
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == 'delta':
+                    yield value
+                elif kind == 'error':
+                    raise value
+                else:
+                    return
+        finally:
+            loop.call_soon_threadsafe(self._unsubscribe, emit)
+
+    # Flights (client loop only)
+
+    def _subscribe(self, key, messages, emit):
+        flight = self._flights.get(key) if key is not None else None
+        if flight is None:
+            flight = _Flight(key)
+            self.flights_started += 1
+            if key is not None:
+                self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run_flight(flight, messages))
+        else:
+            self.flights_joined += 1
+            for delta in flight.deltas:
+                emit('delta', delta)
+        flight.subscribers.add(emit)
+        self.max_subscribers = max(self.max_subscribers, len(flight.subscribers))
+        self._subscriptions[emit] = flight
+
+    def _unsubscribe(self, emit):
+        flight = self._subscriptions.pop(emit, None)
+        if flight is None:
+            return
+        flight.subscribers.discard(emit)
+        if not flight.subscribers and not flight.task.done():
+            # Nobody is reading any more; a later caller starts a new request
+            self._forget(flight)
+            flight.task.cancel()
+
+    def _forget(self, flight: '_Flight'):
+        if flight.key is not None and self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    async def _run_flight(self, flight: '_Flight', messages):
+        # Reported to whoever is still subscribed if the flight gets cancelled
+        result = ('error', RuntimeError("LLM request was cancelled"))
+        try:
+            if callable(messages):
+                messages = await run_db(messages)
+            async for delta in self._request(messages):
+                flight.deltas.append(delta)
+                for emit in list(flight.subscribers):
+                    emit('delta', delta)
+            result = ('done', None)
+        except (TimeoutError, openai.APITimeoutError) as e:
+            self.timeouts += 1
+            result = ('error', TimeoutError(f"LLM request timed out: {e}"))
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"LLM request failed: {e}")
+            result = ('error', e)
+        finally:
+            self._forget(flight)
+            for emit in list(flight.subscribers):
+                emit(*result)
+                self._subscriptions.pop(emit, None)
+            flight.subscribers.clear()
+
+    async def _request(self, messages: List[Dict]) -> AsyncIterator[str]:
+        client = self._get_client()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.requests += 1
+        try:
+            started = time.monotonic()
+            first = True
+            async with asyncio.timeout(self.timeout):
+                stream = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    stream=True
+                )
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if first:
+                            self.first_token_times.append(time.monotonic() - started)
+                            first = False
+                        yield delta
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def complete(self, messages, key: Optional[Hashable] = None) -> str:
+        """Whole answer text"""
+        return ''.join([delta async for delta in self.stream(messages, key)])
+
+    def complete_sync(self, messages, key: Optional[Hashable] = None) -> str:
+        """Sync facade for views and worker threads"""
+        return asyncio.run_coroutine_threadsafe(self.complete(messages, key), self._get_loop()).result()
+
+    def stats(self) -> Dict:
+        times = sorted(self.first_token_times)
+        callers = self.flights_started + self.flights_joined
+        return {
+            'enabled': self.enabled,
+            'model': self.model,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'requests': self.requests,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'active_flights': len(self._flights),
+            'flights_started': self.flights_started,
+            'flights_joined': self.flights_joined,
+            'coalescing_ratio': round(self.flights_joined / callers, 3) if callers else 0.0,
+            'max_subscribers': self.max_subscribers,
+            'first_token_p50': round(times[len(times) // 2], 3) if times else None,
+            'first_token_p95': round(times[int(len(times) * 0.95)], 3) if times else None,
+        }
+
+llm_client = LLMClient(
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL,
+    model=settings.OPENAI_MODEL,
+    max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+    timeout=settings.OPENAI_TIMEOUT,
+    connect_timeout=settings.OPENAI_CONNECT_TIMEOUT
+)
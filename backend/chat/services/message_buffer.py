@@ -0,0 +1,114 @@
+import atexit
+import logging
+import threading
+import time
+from typing import Dict, List
+from django.conf import settings
+from django.db import close_old_connections
+from ..models import Message
+
+logger = logging.getLogger(__name__)
+
+class MessageWriteBuffer:
+    """Write-behind buffer for Message rows.
+
+    `add()` builds the Message in memory (its UUID primary key and created_at
+    are assigned immediately, so callers can publish them right away) and
+    returns without touching the database. A background thread inserts the
+    buffered rows with bulk_create when `max_batch` rows are waiting or every
+    `flush_interval` seconds, and once more at shutdown.
+    """
+
+    def __init__(self, max_batch: int = 200, flush_interval: float = 1.0):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._pending: List[Message] = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.buffered = 0
+        self.flushed = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+
+    def add(self, **fields) -> Message:
+        """Queue a Message for insertion and return the (unsaved) instance"""
+        message = Message(**fields)
+        with self._condition:
+            self._pending.append(message)
+            self.buffered += 1
+            if self._thread is None:
+                self._start()
+            if len(self._pending) >= self.max_batch:
+                self._condition.notify()
+        return message
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='message-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._pending) < self.max_batch:
+                    self._condition.wait(self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def flush(self):
+        """Insert everything buffered so far (blocking)"""
+        with self._condition:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        close_old_connections()
+        try:
+            Message.objects.bulk_create(batch, batch_size=self.max_batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            # Isolate the bad rows instead of losing the whole batch
+            logger.error(f"Bulk insert of {len(batch)} messages failed, retrying row by row: {e}")
+            for message in batch:
+                try:
+                    message.save(force_insert=True)
+                    self.flushed += 1
+                except Exception as row_error:
+                    self.failed += 1
+                    logger.error(f"Dropping message {message.id}: {row_error}")
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - started
+
+    def stop(self):
+        """Flush remaining rows and stop the background thread"""
+        with self._condition:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not threading.current_thread():
+            thread.join(timeout=10)
+        with self._condition:
+            self._thread = None
+            self._stopping = False
+
+    def stats(self) -> Dict:
+        return {
+            'pending': len(self._pending),
+            'buffered': self.buffered,
+            'flushed': self.flushed,
+            'failed': self.failed,
+            'flushes': self.flushes,
+            'last_flush_seconds': round(self.last_flush_seconds, 4),
+        }
+
+message_buffer = MessageWriteBuffer(
+    max_batch=settings.MESSAGE_BUFFER_MAX_BATCH,
+    flush_interval=settings.MESSAGE_BUFFER_FLUSH_INTERVAL
+)
@@ -1,52 +1,79 @@
-import openai
 from django.conf import settings
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Tuple
 import logging
+import time
 from ..models import ScrapedContent
 from .web_scraper import UniversityWebScraper
+from .knowledge_index import knowledge_index
+from .vector_index import vector_index
+from .answer_cache import answer_cache, normalize_question
+from .llm_client import llm_client
 
 logger = logging.getLogger(__name__)
 
 class UniversityAIService:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.llm = llm_client
     
-    def get_university_context(self):
-        """Get university information from scraped data"""
-        # Get recent scraped data
-        scraped_content = ScrapedContent.objects.filter(is_active=True)[:10]
-        
-        if not scraped_content.exists():
+    def get_university_context(self, user_question: str = None) -> List[Dict]:
+        """Chunks of the scraped pages most relevant to the question"""
+        knowledge_index.ensure_loaded()
+        if not knowledge_index.stats()['pages']:
             # If no scraped data, scrape fresh data
             self.refresh_university_data()
-            scraped_content = ScrapedContent.objects.filter(is_active=True)[:10]
         
-        context = []
-        for content in scraped_content:
-            context.append({
-                'url': content.url,
-                'title': content.title,
-                'content': content.content[:1500]  # Limit content
-            })
+        vector_index.ensure_synced()
+        limit = settings.AI_CONTEXT_CHUNKS
+        question = user_question or ''
+        ranked = self.fuse_rankings(
+            knowledge_index.search(question, limit),
+            vector_index.search(question, limit),
+            settings.AI_CONTEXT_KEYWORD_CHUNKS
+        )
+        return ranked[:limit] or knowledge_index.leading_chunks(limit)
+    
+    @staticmethod
+    def fuse_rankings(keyword: List[Dict], vector: List[Dict], keyword_first: int) -> List[Dict]:
+        """Top keyword chunks first, then vector chunks, then the other keyword ones.
         
-        return context
+        BM25 is best on exact wording and the vector index on typos. In
+        bench_ai_context reciprocal rank fusion lost to each of them on its
+        own case; a fixed keyword share keeps BM25's exact-question recall
+        (within one question) and matches vector search on typos.
+        """
+        fused, seen = [], set()
+        for chunk in keyword[:keyword_first] + vector + keyword[keyword_first:]:
+            if chunk['chunk_id'] not in seen:
+                seen.add(chunk['chunk_id'])
+                fused.append(chunk)
+        return fused
     
     def refresh_university_data(self):
         """Refresh university data by scraping"""
         try:
             scraper = UniversityWebScraper()
             scraped_data = scraper.scrape_university_info()
+            knowledge_index.ensure_loaded()
             
             # Deactivate old content
-            ScrapedContent.objects.filter(is_active=True).update(is_active=False)
+            old_ids = list(ScrapedContent.objects.filter(is_active=True).values_list('id', flat=True))
+            ScrapedContent.objects.filter(id__in=old_ids).update(is_active=False)
             
             # Save new content
-            for data in scraped_data:
+            stored = [
                 ScrapedContent.objects.create(
                     url=data['url'],
                     title=data['title'],
                     content=data['content']
                 )
+                for data in scraped_data
+            ]
+            
+            # Only pages whose text changed are re-chunked and re-tokenized
+            if knowledge_index.update(added=stored, removed=old_ids):
+                answer_cache.clear()
+            knowledge_index.save_snapshot()
+            vector_index.ensure_synced()
             
             logger.info(f"Refreshed {len(scraped_data)} pages of university data")
         except Exception as e:
@@ -59,7 +86,7 @@ class UniversityAIService:
         for data in university_data:
             context += f"Страница: {data['title']}\n"
             context += f"URL: {data['url']}\n"
-            context += f"Содержание: {data['content'][:800]}...\n\n"
+            context += f"Содержание: {data['content']}\n\n"
         
         prompt = f"""
 Ты - полезный ассистент для МВЭУ (Московский Внешкольный Экономический Университет).
@@ -78,9 +105,56 @@ class UniversityAIService:
 """
         return prompt
     
+    def build_messages(self, user_question: str) -> List[Dict]:
+        """Chat messages for the LLM: the prompt with the chunks retrieved for the question"""
+        context = self.get_university_context(user_question)
+        return [{'role': 'user', 'content': self.create_context_prompt(context, user_question)}]
+    
+    async def stream_ai_response(self, user_question: str) -> AsyncIterator[str]:
+        """Yield the answer as it is generated (a cached answer arrives in one piece)"""
+        # An answer generated across a knowledge refresh is stored under the old version
+        version = knowledge_index.version
+        cached = answer_cache.get(user_question, version)
+        if cached is not None:
+            yield cached
+            return
+        
+        started = time.perf_counter()
+        if self.llm.enabled:
+            parts = []
+            async for delta in self.llm.stream(lambda: self.build_messages(user_question), self.flight_key(user_question)):
+                parts.append(delta)
+                yield delta
+            answer = ''.join(parts)
+        else:
+            answer = self.demo_answer(user_question)
+            yield answer
+        answer_cache.put(user_question, answer, time.perf_counter() - started, version)
+    
     def get_ai_response(self, user_question: str) -> str:
-        """Get AI response for user question (TEMPORARY MOCK)"""
-        # Temporary mock response while OpenAI is disabled
+        """Get AI response for user question, reusing answers to the same or similar questions"""
+        version = knowledge_index.version
+        cached = answer_cache.get(user_question, version)
+        if cached is not None:
+            return cached
+        
+        started = time.perf_counter()
+        answer = self.generate_answer(user_question)
+        answer_cache.put(user_question, answer, time.perf_counter() - started, version)
+        return answer
+    
+    def generate_answer(self, user_question: str) -> str:
+        """Produce a fresh answer"""
+        if not self.llm.enabled:
+            return self.demo_answer(user_question)
+        return self.llm.complete_sync(lambda: self.build_messages(user_question), self.flight_key(user_question))
+    
+    def flight_key(self, user_question: str) -> Tuple[str, int]:
+        """Concurrent requests with the same key share one LLM call"""
+        return normalize_question(user_question) or user_question.strip().lower(), knowledge_index.version
+    
+    def demo_answer(self, user_question: str) -> str:
+        """Demo answer used while no OpenAI API key is configured"""
         return f"""
 🤖 Демо-ответ ИИ помощника МВЭУ:
 
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+class CachedSchedule:
+    """Lessons of one group/date with the time they were fetched upstream"""
+
+    __slots__ = ('lessons', 'fetched_at', 'source', 'degraded')
+
+    def __init__(self, lessons: List[Dict], fetched_at: float, source: str):
+        self.lessons = lessons
+        self.fetched_at = fetched_at
+        self.source = source  # 'upstream', 'db' or 'mock'
+        self.degraded = False  # a refresh failed, upstream could not confirm it
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+class LRUCache:
+    """Thread-safe dict bounded to `max_entries`, least recently used dropped first"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: Any):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class ScheduleCache(LRUCache):
+    """Bounded in-memory tier of the schedule read-through cache.
+
+    Entries are never dropped for being old, only when the LRU limit is hit
+    or when explicitly invalidated: stale entries are still served while a
+    refresh runs, and are the last resort when upstream is down.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        super().__init__(max_entries)
+        self.counters = {
+            'memory_hits': 0,
+            'week_hits': 0,
+            'db_hits': 0,
+            'upstream_fetches': 0,
+            'upstream_failures': 0,
+            'stale_serves': 0,
+            'degraded_serves': 0,
+            'mock_serves': 0,
+            'background_refreshes': 0,
+        }
+
+    def count(self, counter: str):
+        self.counters[counter] += 1
+
+    def stats(self) -> Dict:
+        stats = dict(self.counters)
+        stats['size'] = len(self._entries)
+        return stats
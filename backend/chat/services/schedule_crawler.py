@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from datetime import date as date_type, timedelta
+from typing import Dict, List, Optional
+from django.utils import timezone
+from ..models import StudentGroup
+from .db_executor import run_db
+from .schedule_cache import CachedSchedule
+from .schedule_store import apply_group_schedule
+
+logger = logging.getLogger(__name__)
+
+class CrawlReport:
+    """Timing and row-change counts of one crawler run"""
+
+    def __init__(self, days: int):
+        self.started_at = timezone.now()
+        self.days = days
+        self.groups = 0
+        self.fetched = 0
+        self.failed = 0
+        self.unchanged_groups = 0
+        self.failed_groups = 0
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+        self.unchanged = 0
+        self.fetch_seconds = 0.0
+        self.write_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            'started_at': self.started_at.isoformat(),
+            'groups': self.groups,
+            'days': self.days,
+            'fetched': self.fetched,
+            'failed': self.failed,
+            'failed_groups': self.failed_groups,
+            'unchanged_groups': self.unchanged_groups,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'deleted': self.deleted,
+            'unchanged': self.unchanged,
+            'fetch_seconds': round(self.fetch_seconds, 3),
+            'write_seconds': round(self.write_seconds, 3),
+            'total_seconds': round(self.total_seconds, 3),
+        }
+
+class ScheduleCrawler:
+    """Crawls every active group for the coming days.
+
+    Upstream fetches share one semaphore across the whole run; each group's
+    week is diffed against stored rows and written in one transaction (see
+    schedule_store.apply_group_schedule), so unchanged lessons cost no writes.
+    """
+
+    def __init__(self, service, concurrency: int = 8, days: int = 7):
+        self.service = service
+        self.concurrency = concurrency
+        self.days = days
+        self.last_report: Optional[Dict] = None
+        self._running = False
+
+    async def crawl(self, start: date_type = None) -> Optional[Dict]:
+        """Run one full crawl, returns the report (None if a crawl is already running)"""
+        if self._running:
+            logger.info("Schedule crawl already in progress, skipping")
+            return None
+        self._running = True
+        try:
+            return await self._crawl(start or timezone.localdate())
+        finally:
+            self._running = False
+
+    async def _crawl(self, start: date_type) -> Dict:
+        started = time.perf_counter()
+        report = CrawlReport(self.days)
+        days = [start + timedelta(days=i) for i in range(self.days)]
+
+        groups = await run_db(lambda: list(StudentGroup.objects.filter(is_active=True).order_by('name')))
+        report.groups = len(groups)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def crawl_group(group: StudentGroup):
+            try:
+                await self._crawl_group(group, days, semaphore, report)
+            except Exception as e:
+                report.failed_groups += 1
+                logger.error(f"Crawling schedule of {group.name} failed: {e}")
+
+        await asyncio.gather(*[crawl_group(group) for group in groups])
+
+        report.total_seconds = time.perf_counter() - started
+        self.last_report = report.as_dict()
+        logger.info(f"Schedule crawl finished: {self.last_report}")
+        return self.last_report
+
+    async def _crawl_group(self, group: StudentGroup, days: List[date_type], semaphore, report: CrawlReport):
+        async def fetch(day):
+            async with semaphore:
+                fetch_started = time.perf_counter()
+                try:
+                    return await self.service.fetch_group_schedule(group.name, day)
+                finally:
+                    report.fetch_seconds += time.perf_counter() - fetch_started
+
+        results = await asyncio.gather(*[fetch(day) for day in days], return_exceptions=True)
+        lessons_by_day = {}
+        for day, lessons in zip(days, results):
+            # None is a failed fetch and keeps the stored day; [] is a day without lessons
+            if isinstance(lessons, BaseException) or lessons is None:
+                report.failed += 1
+            else:
+                report.fetched += 1
+                lessons_by_day[day] = lessons
+        if not lessons_by_day:
+            return
+
+        write_started = time.perf_counter()
+        changes = await run_db(apply_group_schedule, group, lessons_by_day)
+        report.write_seconds += time.perf_counter() - write_started
+
+        report.inserted += changes['inserted']
+        report.updated += changes['updated']
+        report.deleted += changes['deleted']
+        report.unchanged += changes['unchanged']
+        if not changes['changed_dates']:
+            report.unchanged_groups += 1
+
+        fetched_at = time.time()
+        for day, lessons in lessons_by_day.items():
+            self.service.cache.set((group.name, day), CachedSchedule(lessons, fetched_at, 'upstream'))
+            self.service.invalidate_week(group.name, day)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import date as date_type, datetime, time as dt_time, timedelta
+from typing import Dict, List, Optional
+from ..models import StudentProfile
+from .db_executor import run_db
+from .send_scheduler import PRIORITY_NOTIFICATION
+
+logger = logging.getLogger(__name__)
+
+def render_day_schedule(group_name: str, day: date_type, lessons: List[Dict]) -> str:
+    """Digest text of one group's day"""
+    text = f"☀️ Доброе утро! Расписание группы {group_name}\n"
+    text += f"📆 {day.strftime('%d.%m.%Y (%A)')}\n\n"
+    for i, lesson in enumerate(lessons, 1):
+        text += f"{i}. {lesson['time']}\n"
+        text += f"   📚 {lesson['subject']}\n"
+        text += f"   👨‍🏫 {lesson['teacher']}\n"
+        text += f"   🏢 {lesson['classroom']}\n"
+    return text
+
+class DailyDigest:
+    """Morning schedule digest.
+
+    Subscribers are loaded with one query and grouped by group, each group's
+    text is rendered once and then fanned out through the send scheduler's
+    notification lane, so schedule and DB work grow with the number of
+    groups rather than students. Only stored or upstream schedules are
+    sent, never mock data, and groups without lessons that day are skipped.
+    """
+
+    def __init__(self, send_scheduler, schedule_service, send_at: Optional[dt_time] = None,
+                 render_concurrency: int = 4, send_concurrency: int = 30):
+        self.send_scheduler = send_scheduler
+        self.schedule_service = schedule_service
+        self.send_at = send_at
+        self.render_concurrency = render_concurrency
+        self.send_concurrency = send_concurrency
+        self.last_report: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Run the digest every day at `send_at` (schedule time zone)"""
+        if self.send_at is not None and self._task is None:
+            self._task = asyncio.create_task(self._run_daily(), name="daily-digest")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_daily(self):
+        while True:
+            now = self.schedule_service.local_now()
+            next_run = datetime.combine(now.date(), self.send_at, tzinfo=now.tzinfo)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            await asyncio.sleep((next_run - now).total_seconds())
+            try:
+                await self.run(next_run.date())
+            except Exception as e:
+                logger.error(f"Daily digest failed: {e}")
+
+    async def run(self, day: date_type = None) -> Dict:
+        """Render and send the digest for a day, returns the run report"""
+        started = time.perf_counter()
+        day = day or self.schedule_service.local_now().date()
+        audience = await run_db(self._load_audience)
+
+        render_started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.render_concurrency)
+
+        async def render(group_name):
+            async with semaphore:
+                lessons = await self.schedule_service.get_known_group_schedule(group_name, day)
+            # Unknown schedule (upstream down) or a day without lessons: nothing to send
+            return render_day_schedule(group_name, day, lessons) if lessons else None
+
+        texts = dict(zip(audience, await asyncio.gather(*[render(name) for name in audience])))
+        render_seconds = time.perf_counter() - render_started
+
+        send_started = time.perf_counter()
+        send_semaphore = asyncio.Semaphore(self.send_concurrency)
+
+        async def send(telegram_id, text):
+            async with send_semaphore:
+                try:
+                    await self.send_scheduler.send_message(telegram_id, text, priority=PRIORITY_NOTIFICATION)
+                    return True
+                except Exception as e:
+                    logger.warning(f"Failed to send digest to {telegram_id}: {e}")
+                    return False
+
+        results = await asyncio.gather(*[
+            send(telegram_id, texts[group_name])
+            for group_name, telegram_ids in audience.items() if texts[group_name]
+            for telegram_id in telegram_ids
+        ])
+        send_seconds = time.perf_counter() - send_started
+
+        self.last_report = {
+            'date': day.isoformat(),
+            'groups': len(audience),
+            'groups_without_lessons': sum(1 for text in texts.values() if text is None),
+            'recipients': sum(len(ids) for ids in audience.values()),
+            'sent': sum(results),
+            'failed': len(results) - sum(results),
+            'render_seconds': round(render_seconds, 3),
+            'send_seconds': round(send_seconds, 3),
+            'total_seconds': round(time.perf_counter() - started, 3),
+        }
+        logger.info(f"Daily digest finished: {self.last_report}")
+        return self.last_report
+
+    def _load_audience(self) -> Dict[str, List[str]]:
+        """Subscribed telegram ids grouped by group name"""
+        audience = defaultdict(list)
+        for group_name, telegram_id in StudentProfile.objects.filter(
+            daily_digest=True,
+            group__isnull=False,
+            group__is_active=True,
+            telegram_user__is_active=True
+        ).values_list('group__name', 'telegram_user__telegram_id').order_by('group__name'):
+            audience[group_name].append(telegram_id)
+        return dict(audience)
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from datetime import date as date_type, datetime, timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from ..models import StudentProfile
+from .db_executor import run_db
+from .send_scheduler import PRIORITY_NOTIFICATION
+
+logger = logging.getLogger(__name__)
+
+def _lesson_label(lesson: List[str]) -> str:
+    time_slot, subject, _, classroom, _ = lesson
+    return f"{time_slot} {subject} ({classroom})"
+
+def render_changes(group_name: str, changes: Dict[date_type, List[Dict]]) -> str:
+    """Notification text for the diffs of one group"""
+    text = f"🔔 Изменения в расписании группы {group_name}\n"
+    for day in sorted(changes):
+        text += f"\n📆 {day.strftime('%d.%m.%Y (%A)')}\n"
+        for diff in changes[day]:
+            for lesson in diff['removed']:
+                text += f"❌ Отменено: {_lesson_label(lesson)}\n"
+            for move in diff['moved']:
+                text += f"🔄 {move['from'][1]}: {move['from'][0]} ({move['from'][3]}) → {move['to'][0]} ({move['to'][3]})\n"
+            for lesson in diff['added']:
+                text += f"➕ Добавлено: {_lesson_label(lesson)}\n"
+    return text
+
+class ScheduleChangeNotifier:
+    """Pushes schedule diffs to the students of the affected group.
+
+    Changes arrive through the schedule_changed signal on any thread and are
+    coalesced per group for `coalesce_delay` seconds, so a crawl touching
+    several days of a group produces one message. Recipients are loaded per
+    group and sent to in batches through the send scheduler.
+    """
+
+    def __init__(self, coalesce_delay: float = 5.0, batch_size: int = 100, horizon_days: int = 7):
+        self.coalesce_delay = coalesce_delay
+        self.batch_size = batch_size
+        self.horizon_days = horizon_days
+        self.time_zone = ZoneInfo(settings.SCHEDULE_TIME_ZONE)
+        self.send_scheduler = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[int, tuple] = {}
+        self._tasks = set()
+        self.changes = 0
+        self.notifications = 0
+        self.sent = 0
+        self.failed = 0
+
+    async def start(self, send_scheduler):
+        self.send_scheduler = send_scheduler
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._loop = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def schedule_changed(self, group_id: int, group_name: str, diffs: Dict[date_type, Dict]):
+        """Queue the relevant diffs of a group (thread-safe)"""
+        loop = self._loop
+        if loop is None:
+            return
+        today = datetime.now(self.time_zone).date()
+        horizon = today + timedelta(days=self.horizon_days)
+        relevant = {
+            day: change['diff'] for day, change in diffs.items()
+            if not change['initial'] and today <= day <= horizon
+        }
+        if relevant:
+            loop.call_soon_threadsafe(self._queue, group_id, group_name, relevant)
+
+    def _queue(self, group_id: int, group_name: str, diffs: Dict[date_type, Dict]):
+        self.changes += 1
+        if group_id not in self._pending:
+            self._pending[group_id] = (group_name, {})
+            self._loop.call_later(self.coalesce_delay, self._spawn, group_id)
+        for day, diff in diffs.items():
+            self._pending[group_id][1].setdefault(day, []).append(diff)
+
+    def _spawn(self, group_id: int):
+        task = asyncio.create_task(self._notify(group_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _notify(self, group_id: int):
+        group_name, changes = self._pending.pop(group_id)
+        try:
+            recipients = await run_db(self._load_recipients, group_id)
+            if not recipients:
+                return
+            self.notifications += 1
+            text = render_changes(group_name, changes)
+
+            for start in range(0, len(recipients), self.batch_size):
+                results = await asyncio.gather(*[
+                    self.send_scheduler.send_message(telegram_id, text, priority=PRIORITY_NOTIFICATION)
+                    for telegram_id in recipients[start:start + self.batch_size]
+                ], return_exceptions=True)
+                failed = sum(1 for result in results if isinstance(result, Exception))
+                self.sent += len(results) - failed
+                self.failed += failed
+        except Exception as e:
+            logger.error(f"Notifying group {group_name} about schedule changes failed: {e}")
+
+    def _load_recipients(self, group_id: int) -> List[str]:
+        return list(StudentProfile.objects.filter(
+            group_id=group_id,
+            telegram_user__is_active=True
+        ).values_list('telegram_user__telegram_id', flat=True))
+
+    def stats(self) -> Dict:
+        return {
+            'pending_groups': len(self._pending),
+            'changes': self.changes,
+            'notifications': self.notifications,
+            'sent': self.sent,
+            'failed': self.failed,
+        }
+
+schedule_notifier = ScheduleChangeNotifier()
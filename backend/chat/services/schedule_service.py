@@ -1,10 +1,23 @@
-import requests
+import asyncio
+import aiohttp
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import threading
+import time
+from datetime import date as date_type, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
-from ..models import StudentGroup, Schedule, Teacher, Classroom, ScheduleEntry
+from ..models import StudentGroup, Schedule, ScheduleEntry
+from .circuit_breaker import CircuitBreaker
+from .db_executor import run_db
+from .schedule_cache import CachedSchedule, LRUCache, ScheduleCache
+from .group_catalog import GroupCatalog
+from .group_index import GroupSearchIndex
+from .schedule_crawler import ScheduleCrawler
+from .schedule_store import apply_group_schedule
 
 logger = logging.getLogger(__name__)
 
@@ -14,72 +27,376 @@ class ScheduleService:
     def __init__(self):
         self.base_url = "https://raspisanie.mvekspo.ru"
         self.api_url = f"{self.base_url}/api"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        }
+        self.timeout = aiohttp.ClientTimeout(
+            total=settings.SCHEDULE_HTTP_TIMEOUT,
+            connect=settings.SCHEDULE_HTTP_CONNECT_TIMEOUT
+        )
+        # Read-through schedule cache (memory -> ScheduleEntry -> upstream)
+        self.cache = ScheduleCache(max_entries=settings.SCHEDULE_CACHE_MAX_ENTRIES)
+        self.cache_ttl = settings.SCHEDULE_CACHE_TTL
+        self.mock_ttl = 60
+        # Lesson times are wall-clock times of the university
+        self.time_zone = ZoneInfo(settings.SCHEDULE_TIME_ZONE)
+        self.retry_interval = 60
+        # (group, ISO year, ISO week) -> (week schedule, built at)
+        self.week_cache = LRUCache(max_entries=settings.SCHEDULE_WEEK_CACHE_MAX_ENTRIES)
+        self._refreshing = set()
+        self._background_tasks = set()
+        # aiohttp sessions are bound to an event loop: one pooled session per loop
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_lock = threading.Lock()
+        # Health of the schedule URL patterns tried by fetch_group_schedule
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.SCHEDULE_BREAKER_FAILURE_THRESHOLD,
+            cooldown=settings.SCHEDULE_BREAKER_COOLDOWN,
+            hedge_percentile=settings.SCHEDULE_HEDGE_PERCENTILE,
+            hedge_min_samples=settings.SCHEDULE_HEDGE_MIN_SAMPLES
+        )
+        self.catalog = GroupCatalog(settings.GROUP_CATALOG_SNAPSHOT, ttl=settings.GROUP_CATALOG_TTL)
+        self._catalog_refreshing = False
+        self._catalog_synced = False
+        # A snapshot loaded by the catalog is searchable right away
+        self.group_index = GroupSearchIndex()
+        self._index_groups(self.catalog.data)
+        self.crawler = ScheduleCrawler(
+            self,
+            concurrency=settings.SCHEDULE_CRAWL_CONCURRENCY,
+            days=settings.SCHEDULE_CRAWL_DAYS
+        )
+    
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Get the keep-alive connection pool for the running event loop"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.SCHEDULE_HTTP_POOL_SIZE,
+                limit_per_host=settings.SCHEDULE_HTTP_POOL_PER_HOST,
+                keepalive_timeout=30,
+                ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=self.timeout
+            )
+            self._sessions[loop] = session
+        return session
+    
+    async def close(self):
+        """Close the session of the running event loop"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+    
+    async def fetch(self, url: str) -> Tuple[int, Optional[Any]]:
+        """GET a URL, returns (status, parsed JSON or None)"""
+        session = await self.get_session()
+        async with session.get(url) as response:
+            if response.status != 200:
+                return response.status, None
+            try:
+                return response.status, await response.json(content_type=None)
+            except (ValueError, aiohttp.ContentTypeError):
+                return response.status, None
+    
+    def run_sync(self, coro, timeout: Optional[float] = None):
+        """Sync facade for DRF views: run a coroutine on the service's own loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_sync_loop()).result(timeout)
     
-    async def get_groups_data(self) -> Dict:
-        """Get groups data from the schedule website"""
+    def submit(self, coro):
+        """Start a coroutine on the service's own loop without waiting for it"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_sync_loop())
+    
+    def _get_sync_loop(self) -> asyncio.AbstractEventLoop:
+        with self._sync_lock:
+            if self._sync_loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='schedule-service', daemon=True)
+                thread.start()
+                self._sync_loop = loop
+            return self._sync_loop
+    
+    async def get_groups_data(self, force_refresh: bool = False) -> Dict:
+        """Get groups data (in-memory catalog, stale-while-revalidate).
+        
+        A stale catalog (e.g. the snapshot after a restart) is returned at
+        once and revalidated upstream in the background; only an empty
+        catalog is waited for.
+        """
+        if not self._catalog_synced and self.catalog.data:
+            # First use of a snapshot catalog: mirror it into StudentGroup rows
+            self._catalog_synced = True
+            await self._catalog_changed()
+        if force_refresh or not self.catalog.data:
+            await self.refresh_groups_data()
+        elif self.catalog.is_stale() and not self._catalog_refreshing:
+            self._catalog_refreshing = True
+            task = asyncio.create_task(self.refresh_groups_data())
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+        self._index_groups(self.catalog.data)
+        return self.catalog.data
+    
+    async def refresh_groups_data(self):
+        """Revalidate the catalog with a conditional request to the schedule website"""
+        self._catalog_refreshing = True
         try:
-            # Try to get groups from API first
-            response = self.session.get(f"{self.api_url}/groups", timeout=10)
-            if response.status_code == 200:
-                return response.json()
-            
-            # Fallback to parsing main page
-            response = self.session.get(self.base_url, timeout=10)
-            response.raise_for_status()
-            
-            # Parse groups from page (this would need to be implemented based on actual page structure)
-            # For now, using the data we extracted
-            return {
-                "1 курс": ["ДБ-241/21", "ДГД-241.1/21", "ДГД-241.2/21", "ДГД-241.3/21", "ДГД-241.4/21", "ДД-241.1/21", "ДД-241/21.Б", "ДД-241.2/21", "ДИС-241.1/21", "ДИС-241.2/21", "ДИС-241.3/21", "ДИС-241.4/21", "ДИС-241.5/21", "ДИС-241/21.Б", "ДИС-241.6/21", "ДНГ-241/21", "ДП-241.1/21", "ДП-241.2/21", "ДП-241.3/21", "ДР-241.1/21", "ДР-241.2/21", "ДР-241.3/21", "ДТГ-241.1/21", "ДТГ-241.2/21", "ДТГ-241.3/21", "ДТД-241/21", "ДЮ-241.1/21", "ДЮ-241.2/21"],
-                "2 курс": ["ДБ-232/21", "ДГД-232.1/21", "ДГД-232.2/21", "ДГД-232/2", "ДГД-214/21", "ДГД-232/21", "ДГД-241/2", "ДГД-232/21Б", "ДГД-232.3/21", "ДД-232.1/21", "ДД-232/21Б", "ДД-232.2/21", "ДИС-232.1/21", "ДИС-241.1/2", "ДИС-232.2/21", "ДИС-232.3/21", "ДИС-232.4/21", "ДИС-232.5/21", "ДИС-232/21 Б", "ДИС-232.6/21", "ДИС-241.2/2", "ДИС-232.7/21", "ДК 232.1/21", "ДК-232/21Б", "ДК-232.2/21", "ДНГ-232/21", "ДНГ-241/2", "ДОИС-232/21", "ДОИС-241/2", "ДП-232.1/21", "ДП-232.2/21", "ДП-232.3/21", "ДП-241/2", "ДПО-232/21", "ДР-232.1/21", "ДР-232.2/21", "ДР-241/2", "ДР-232/21н", "ДТГ-232/21", "ДТГ-241/2"],
-                "3 курс": ["ДБ-223/21", "ДБ-232/2", "ДД-223.1/21", "ДД-232/2", "ДД-223.2/21", "ДИС-223.1/21", "ДИС-232.2/21", "ДИС-223.3/21", "ДИС-223.4/21", "ДК-223/21", "ДК-232/2", "ДНГ-223/21", "ДП-223.1/21", "ДП-223.2/21", "ДП-223.3/21", "ДП 232/2", "ДПО-223/21", "ДПО-232/2", "ДР-223.1/21", "ДР 232.1/2", "ДР-223.2/21", "ДР 232.2/2", "ДР-223.3/21", "ДР 232.3/2", "ДТГ-223/21", "ДТГ-232/2"],
-                "4 курс": ["ДД-214/21", "ДД-214/21Б", "ДД-223/2", "ДИС-214.1/21", "ДИС-223/2", "ДИС-214/21Б", "ДИС-214.2/21", "ДИС-214.3/21", "ДНГ-214/21", "ДНГ-223/2", "ДР-214.1/21", "ДР-223/2", "ДР-214.2/21"]
-            }
-            
-        except Exception as e:
+            session = await self.get_session()
+            async with session.get(
+                f"{self.api_url}/groups",
+                headers=self.catalog.conditional_headers()
+            ) as response:
+                if response.status == 304:
+                    self.catalog.mark_not_modified()
+                    return
+                if response.status == 200:
+                    data = await response.json(content_type=None)
+                    if isinstance(data, dict) and data:
+                        if self.catalog.update(
+                            data,
+                            etag=response.headers.get('ETag'),
+                            last_modified=response.headers.get('Last-Modified')
+                        ):
+                            await self._catalog_changed()
+                        return
+                logger.warning(f"Unexpected groups response: HTTP {response.status}")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
             logger.error(f"Error fetching groups data: {e}")
-            return {}
+        finally:
+            self._catalog_refreshing = False
+        
+        # Keep serving the known catalog; the built-in one only if there is nothing else
+        if self.catalog.mark_failed():
+            await self._catalog_changed()
+    
+    async def _catalog_changed(self):
+        self._catalog_synced = True
+        self._index_groups(self.catalog.data)
+        try:
+            result = await run_db(self.catalog.sync_groups, self.extract_faculty_from_group)
+            logger.info(f"Group catalog synced: {result}")
+        except Exception as e:
+            logger.error(f"Error syncing group catalog: {e}")
     
     async def get_group_schedule(self, group_name: str, date: datetime = None) -> List[Dict]:
-        """Get schedule for specific group"""
+        """Get schedule for specific group.
+
+        Read-through: memory, then stored ScheduleEntry rows, then upstream.
+        Stale data is returned immediately while a background refresh runs;
+        when upstream is down the last known schedule keeps being served.
+        """
         try:
             if date is None:
                 date = datetime.now()
+            day = date.date() if isinstance(date, datetime) else date
+            key = (group_name, day)
             
-            # Format date for API
-            date_str = date.strftime("%Y-%m-%d")
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.count('memory_hits')
+            else:
+                entry = await run_db(self._load_stored_schedule, group_name, day)
+                if entry is not None:
+                    self.cache.count('db_hits')
+                    self.cache.set(key, entry)
             
-            # Try different API endpoints
-            endpoints = [
-                f"{self.api_url}/schedule/{group_name}",
-                f"{self.api_url}/schedule?group={group_name}&date={date_str}",
-                f"{self.base_url}/schedule/{group_name}",
-            ]
+            if entry is not None:
+                ttl = self.mock_ttl if entry.source == 'mock' else self.cache_ttl
+                if entry.age() >= ttl:
+                    self.cache.count('stale_serves')
+                    self._refresh_in_background(group_name, day)
+                if entry.degraded or entry.source == 'mock':
+                    self.cache.count('degraded_serves')
+                return entry.lessons
             
-            for endpoint in endpoints:
-                try:
-                    response = self.session.get(endpoint, timeout=10)
-                    if response.status_code == 200:
-                        data = response.json()
-                        if isinstance(data, list) and data:
-                            return data
-                        elif isinstance(data, dict) and 'schedule' in data:
-                            return data['schedule']
-                except Exception as e:
-                    logger.debug(f"Endpoint {endpoint} failed: {e}")
-                    continue
+            lessons = await self.refresh_group_schedule(group_name, day)
+            if lessons is not None:
+                return lessons
             
-            # If API fails, return mock schedule data
-            return self.generate_mock_schedule(group_name, date)
+            # Nothing known and upstream is down: fall back to mock schedule data
+            self.cache.count('mock_serves')
+            self.cache.count('degraded_serves')
+            lessons = self.generate_mock_schedule(group_name, day)
+            self.cache.set(key, CachedSchedule(lessons, time.time(), 'mock'))
+            return lessons
             
         except Exception as e:
             logger.error(f"Error fetching schedule for group {group_name}: {e}")
             return []
     
+    async def get_known_group_schedule(self, group_name: str, day: date_type) -> Optional[List[Dict]]:
+        """Stored or upstream schedule of a group/date, never mock data.
+        
+        Returns None if the schedule is unknown and upstream is unavailable.
+        """
+        entry = self.cache.get((group_name, day))
+        if entry is None or entry.source == 'mock':
+            entry = await run_db(self._load_stored_schedule, group_name, day)
+        if entry is not None:
+            return entry.lessons
+        return await self.refresh_group_schedule(group_name, day)
+    
+    async def refresh_group_schedule(self, group_name: str, day: date_type) -> Optional[List[Dict]]:
+        """Fetch a group/date from upstream and store it in the DB and memory.
+        
+        Returns None if upstream is unavailable.
+        """
+        self.cache.count('upstream_fetches')
+        lessons = await self.fetch_group_schedule(group_name, day)
+        if lessons is None:
+            self.cache.count('upstream_failures')
+            return None
+        
+        await run_db(self._store_schedule, group_name, day, lessons)
+        self.cache.set((group_name, day), CachedSchedule(lessons, time.time(), 'upstream'))
+        self.invalidate_week(group_name, day)
+        return lessons
+    
+    def invalidate_week(self, group_name: str, day: date_type):
+        """Drop the cached week object containing a group/date"""
+        iso_year, iso_week, _ = day.isocalendar()
+        self.week_cache.invalidate((group_name, iso_year, iso_week))
+    
+    def _refresh_in_background(self, group_name: str, day: date_type):
+        key = (group_name, day)
+        if key in self._refreshing:
+            return
+        
+        async def refresh():
+            try:
+                self.cache.count('background_refreshes')
+                if await self.refresh_group_schedule(group_name, day) is None:
+                    # Degraded mode: keep serving the last known schedule, retry after a while
+                    entry = self.cache.get(key)
+                    if entry is not None:
+                        entry.degraded = True
+                        entry.fetched_at = time.time() - self.cache_ttl + self.retry_interval
+            except Exception as e:
+                logger.error(f"Background refresh of {group_name} on {day} failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+        
+        self._refreshing.add(key)
+        task = asyncio.create_task(refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    def schedule_endpoints(self, group_name: str, day: date_type) -> Dict[str, str]:
+        """URL patterns the schedule of a group/date may be served from"""
+        date_str = day.strftime("%Y-%m-%d")
+        return {
+            'api_path': f"{self.api_url}/schedule/{group_name}",
+            'api_query': f"{self.api_url}/schedule?group={group_name}&date={date_str}",
+            'site_path': f"{self.base_url}/schedule/{group_name}",
+        }
+    
+    async def fetch_group_schedule(self, group_name: str, day: date_type) -> Optional[List[Dict]]:
+        """Fetch a group's schedule from upstream, None if every endpoint failed.
+
+        Endpoints are tried in the order the circuit breaker suggests (last
+        working pattern first, open ones skipped). If the current attempt is
+        slower than the endpoint's latency percentile, the next endpoint is
+        raced against it and the first usable answer wins.
+        """
+        endpoints = self.schedule_endpoints(group_name, day)
+        candidates = self.breaker.candidates(list(endpoints))
+        pending: Dict[asyncio.Task, str] = {}
+        
+        def start(name):
+            pending[asyncio.create_task(self._fetch_endpoint(name, endpoints[name]))] = name
+        
+        try:
+            while candidates or pending:
+                if not pending:
+                    start(candidates.pop(0))
+                delay = self.breaker.hedge_delay(list(pending.values())[-1]) if candidates else None
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.breaker.hedges += 1
+                    start(candidates.pop(0))
+                    continue
+                for task in done:
+                    pending.pop(task)
+                    lessons = task.result()
+                    if lessons is not None:
+                        if pending:
+                            self.breaker.hedge_wins += 1
+                        return lessons
+            return None
+        finally:
+            for task, name in pending.items():
+                task.cancel()
+                self.breaker.release(name)
+            for name in candidates:
+                self.breaker.release(name)
+    
+    async def _fetch_endpoint(self, name: str, url: str) -> Optional[List[Dict]]:
+        """One attempt against one endpoint, recorded in the breaker.
+        
+        Only transport errors, timeouts and 5xx count as endpoint failures.
+        Only a 200 with a list is a schedule (an empty one is a day without
+        lessons); a 404 or any other unusable answer moves on to the next
+        pattern without counting for or against this one.
+        """
+        started = time.perf_counter()
+        try:
+            status, data = await self.fetch(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"Endpoint {url} failed: {e}")
+            self.breaker.record_failure(name)
+            return None
+        
+        if status >= 500:
+            self.breaker.record_failure(name)
+            return None
+        
+        lessons = None
+        if status == 200:
+            if isinstance(data, list):
+                lessons = data
+            elif isinstance(data, dict) and isinstance(data.get('schedule'), list):
+                lessons = data['schedule']
+        
+        if lessons is None:
+            # Unusable answer (404, other 4xx, unexpected payload): try the next pattern
+            logger.debug(f"Endpoint {url} returned HTTP {status} without a schedule")
+            self.breaker.release(name)
+        else:
+            self.breaker.record_success(name, time.perf_counter() - started)
+        return lessons
+    
+    def _load_stored_schedule(self, group_name: str, day: date_type) -> Optional[CachedSchedule]:
+        """Read a stored group/date schedule, None if it was never fetched"""
+        return self._load_stored_range(group_name, day, day).get(day)
+    
+    def _store_schedule(self, group_name: str, day: date_type, lessons: List[Dict]):
+        """Diff a fetched group/date against the stored ScheduleEntry rows"""
+        group, _ = StudentGroup.objects.get_or_create(
+            name=group_name,
+            defaults={
+                'course': '1 курс',
+                'faculty': self.extract_faculty_from_group(group_name),
+                'is_active': True
+            }
+        )
+        return apply_group_schedule(group, {day: lessons})
+    
+    @staticmethod
+    def entry_to_lesson(entry: ScheduleEntry) -> Dict:
+        """Convert a stored ScheduleEntry to the upstream lesson dict format"""
+        return {
+            "time": entry.time,
+            "subject": entry.subject,
+            "teacher": entry.teacher.name,
+            "classroom": entry.classroom.name,
+            "type": dict(ScheduleEntry.LESSON_TYPES).get(entry.lesson_type, entry.lesson_type),
+        }
+    
     def generate_mock_schedule(self, group_name: str, date: datetime) -> List[Dict]:
         """Generate mock schedule data for demonstration"""
         base_subjects = [
@@ -110,85 +427,26 @@ class ScheduleService:
         
         return schedule
     
-    async def update_schedule_data(self):
-        """Update all schedule data in database"""
+    async def update_schedule_data(self) -> Optional[Dict]:
+        """Refresh the group catalog, then crawl schedules of all active groups"""
         try:
             logger.info("Starting schedule data update...")
             
-            # Get groups data
-            groups_data = await self.get_groups_data()
-            
-            # Update groups in database
-            for course, groups in groups_data.items():
-                for group_name in groups:
-                    group, created = StudentGroup.objects.get_or_create(
-                        name=group_name,
-                        defaults={
-                            'course': course,
-                            'faculty': self.extract_faculty_from_group(group_name),
-                            'is_active': True
-                        }
-                    )
-                    if created:
-                        logger.info(f"Created new group: {group_name}")
-            
-            # Update schedule for active groups (limit to avoid overload)
-            active_groups = StudentGroup.objects.filter(is_active=True)[:20]  # Limit for demo
-            
-            for group in active_groups:
-                try:
-                    # Get schedule for current week
-                    today = timezone.now()
-                    for days_ahead in range(7):
-                        schedule_date = today + timedelta(days=days_ahead)
-                        await self.update_group_schedule(group, schedule_date)
-                
-                except Exception as e:
-                    logger.error(f"Error updating schedule for group {group.name}: {e}")
+            await self.get_groups_data(force_refresh=True)
+            report = await self.crawler.crawl()
             
             logger.info("Schedule data update completed")
+            return report
             
         except Exception as e:
             logger.error(f"Error in update_schedule_data: {e}")
+            return None
     
     async def update_group_schedule(self, group: StudentGroup, date: datetime):
         """Update schedule for specific group and date"""
         try:
-            schedule_data = await self.get_group_schedule(group.name, date)
-            
-            # Clear existing schedule for this date
-            ScheduleEntry.objects.filter(
-                group=group,
-                date=date.date()
-            ).delete()
-            
-            # Create new schedule entries
-            for entry_data in schedule_data:
-                # Get or create teacher
-                teacher_name = entry_data.get('teacher', 'Преподаватель')
-                teacher, _ = Teacher.objects.get_or_create(
-                    name=teacher_name,
-                    defaults={'email': f"{teacher_name.lower().replace(' ', '')}@mveu.ru"}
-                )
-                
-                # Get or create classroom
-                classroom_name = entry_data.get('classroom', 'Ауд. 101')
-                classroom, _ = Classroom.objects.get_or_create(
-                    name=classroom_name,
-                    defaults={'capacity': 30, 'building': 'Главный корпус'}
-                )
-                
-                # Create schedule entry
-                ScheduleEntry.objects.create(
-                    group=group,
-                    date=date.date(),
-                    time=entry_data.get('time', '09:00-10:30'),
-                    subject=entry_data.get('subject', 'Предмет'),
-                    teacher=teacher,
-                    classroom=classroom,
-                    lesson_type=entry_data.get('type', 'Лекция')
-                )
-            
+            day = date.date() if isinstance(date, datetime) else date
+            await self.refresh_group_schedule(group.name, day)
         except Exception as e:
             logger.error(f"Error updating schedule for {group.name} on {date}: {e}")
     
@@ -220,34 +478,128 @@ class ScheduleService:
         """Get today's schedule for group"""
         return await self.get_group_schedule(group_name, datetime.now())
     
-    async def get_week_schedule(self, group_name: str) -> Dict[str, List[Dict]]:
-        """Get week schedule for group"""
-        week_schedule = {}
-        today = datetime.now()
+    def local_now(self) -> datetime:
+        """Current time in the schedule's time zone"""
+        return timezone.localtime(timezone=self.time_zone)
+    
+    async def get_next_lesson(self, group_name: str, now: datetime = None) -> Optional[Dict]:
+        """The group's next lesson that hasn't started yet, None if nothing is scheduled"""
+        now = now or self.local_now()
+        # Make sure today's lessons are stored, later days come from the crawler
+        await self.get_group_schedule(group_name, now.date())
+        return await run_db(self._load_next_lesson, group_name, now)
+    
+    async def get_current_lessons(self, group_name: str, now: datetime = None) -> List[Dict]:
+        """Lessons of the group that are in progress right now"""
+        now = now or self.local_now()
+        await self.get_group_schedule(group_name, now.date())
+        return await run_db(self._load_current_lessons, group_name, now)
+    
+    def _load_next_lesson(self, group_name: str, now: datetime) -> Optional[Dict]:
+        day, moment = now.date(), now.time()
+        entry = ScheduleEntry.objects.filter(
+            Q(date=day, start_time__gt=moment) | Q(date__gt=day),
+            group__name=group_name,
+            is_cancelled=False,
+            start_time__isnull=False
+        ).select_related('teacher', 'classroom').order_by('date', 'start_time').first()
+        if entry is None:
+            return None
+        return dict(self.entry_to_lesson(entry), date=entry.date)
+    
+    def _load_current_lessons(self, group_name: str, now: datetime) -> List[Dict]:
+        entries = ScheduleEntry.objects.filter(
+            group__name=group_name,
+            date=now.date(),
+            start_time__lte=now.time(),
+            end_time__gt=now.time(),
+            is_cancelled=False
+        ).select_related('teacher', 'classroom').order_by('start_time')
+        return [dict(self.entry_to_lesson(entry), date=entry.date) for entry in entries]
+    
+    async def get_week_schedule(self, group_name: str, date: datetime = None) -> Dict[str, List[Dict]]:
+        """Get week schedule for group.
+
+        The whole week is cached as one object keyed by group and ISO week.
+        Days not in memory are loaded with one ranged DB query and whatever
+        is still missing is fetched upstream with bounded concurrency.
+        """
+        if date is None:
+            date = datetime.now()
+        day = date.date() if isinstance(date, datetime) else date
         
         # Get Monday of current week
-        monday = today - timedelta(days=today.weekday())
+        monday = day - timedelta(days=day.weekday())
+        days = [monday + timedelta(days=i) for i in range(7)]
+        iso_year, iso_week, _ = monday.isocalendar()
+        week_key = (group_name, iso_year, iso_week)
+        
+        cached = self.week_cache.get(week_key)
+        if cached is not None and time.time() - cached[1] < self.cache_ttl:
+            self.cache.count('week_hits')
+            return cached[0]
+        
+        missing = [d for d in days if self.cache.get((group_name, d)) is None]
+        if missing:
+            stored = await run_db(self._load_stored_range, group_name, missing[0], missing[-1])
+            for stored_day, entry in stored.items():
+                self.cache.count('db_hits')
+                self.cache.set((group_name, stored_day), entry)
         
-        for i in range(7):
-            date = monday + timedelta(days=i)
-            day_name = date.strftime("%A")
-            day_schedule = await self.get_group_schedule(group_name, date)
-            week_schedule[f"{day_name} ({date.strftime('%d.%m')})"] = day_schedule
+        semaphore = asyncio.Semaphore(settings.SCHEDULE_WEEK_CONCURRENCY)
         
+        async def get_day(d):
+            async with semaphore:
+                return await self.get_group_schedule(group_name, d)
+        
+        lessons_by_day = await asyncio.gather(*[get_day(d) for d in days])
+        
+        week_schedule = {}
+        for d, day_schedule in zip(days, lessons_by_day):
+            week_schedule[f"{d.strftime('%A')} ({d.strftime('%d.%m')})"] = day_schedule
+        
+        # Mock days are placeholders for an unreachable upstream, don't pin them for a full TTL
+        if not any(
+            (entry := self.cache.get((group_name, d))) is not None and entry.source == 'mock'
+            for d in days
+        ):
+            self.week_cache.set(week_key, (week_schedule, time.time()))
         return week_schedule
     
-    async def search_groups(self, query: str) -> List[str]:
-        """Search groups by name"""
-        groups_data = await self.get_groups_data()
-        all_groups = []
+    def _load_stored_range(self, group_name: str, first_day: date_type, last_day: date_type) -> Dict[date_type, CachedSchedule]:
+        """Read stored schedules of a group for a date range in two queries"""
+        schedules = {
+            schedule.date: schedule
+            for schedule in Schedule.objects.filter(
+                group__name=group_name,
+                date__range=(first_day, last_day)
+            )
+        }
+        if not schedules:
+            return {}
         
-        for course_groups in groups_data.values():
-            all_groups.extend(course_groups)
+        lessons_by_day = {d: [] for d in schedules}
+        entries = ScheduleEntry.objects.filter(
+            group__name=group_name,
+            date__in=list(schedules)
+        ).select_related('teacher', 'classroom').order_by('date', 'time')
+        for entry in entries:
+            lessons_by_day[entry.date].append(self.entry_to_lesson(entry))
         
-        # Filter groups by query
-        matching_groups = [
-            group for group in all_groups 
-            if query.lower() in group.lower()
-        ]
-        
-        return matching_groups[:10]  # Limit results
\ No newline at end of file
+        return {
+            d: CachedSchedule(lessons_by_day[d], schedule.updated_at.timestamp(), 'db')
+            for d, schedule in schedules.items()
+        }
+    
+    def _index_groups(self, groups_data: Dict):
+        """Rebuild the group search index when the catalog changed"""
+        if groups_data is not self.group_index.source:
+            self.group_index.build(groups_data)
+    
+    async def search_groups(self, query: str) -> List[str]:
+        """Search groups by name (fuzzy, ranked, served from the in-memory index)"""
+        await self.get_groups_data()
+        return self.group_index.search(query, limit=10)
+
+# Process-wide instance shared by the bot and the API views
+schedule_service = ScheduleService()
@@ -0,0 +1,239 @@
+import hashlib
+import logging
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Dict, List, Tuple
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from ..models import StudentGroup, Schedule, Teacher, Classroom, ScheduleEntry, ScheduleSnapshot, parse_lesson_time
+from ..signals import schedule_changed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LESSON = {
+    'time': '09:00-10:30',
+    'subject': 'Предмет',
+    'teacher': 'Преподаватель',
+    'classroom': 'Ауд. 101',
+    'type': 'lecture',
+}
+
+def lesson_type_key(lesson_type: str) -> str:
+    """Map an upstream lesson type label ("Лекция") to a ScheduleEntry choice key"""
+    for key, label in ScheduleEntry.LESSON_TYPES:
+        if lesson_type in (key, label):
+            return key
+    return (lesson_type or 'lecture')[:20]
+
+def normalize_lesson(lesson: Dict) -> Tuple[str, str, str, str, str]:
+    """Canonical (time, subject, teacher, classroom, type) tuple of an upstream lesson"""
+    return (
+        lesson.get('time') or DEFAULT_LESSON['time'],
+        lesson.get('subject') or DEFAULT_LESSON['subject'],
+        lesson.get('teacher') or DEFAULT_LESSON['teacher'],
+        lesson.get('classroom') or DEFAULT_LESSON['classroom'],
+        lesson_type_key(lesson.get('type') or DEFAULT_LESSON['type']),
+    )
+
+def entry_key(entry: ScheduleEntry) -> Tuple[str, str, str, str, str]:
+    return (entry.time, entry.subject, entry.teacher.name, entry.classroom.name, entry.lesson_type)
+
+def content_hash(key: Tuple) -> str:
+    return hashlib.sha1('\x1f'.join(key).encode('utf-8')).hexdigest()
+
+def day_hash(keys) -> str:
+    """Order-independent hash of a day's lessons"""
+    return hashlib.sha1('\n'.join(sorted(content_hash(key) for key in keys)).encode('ascii')).hexdigest()
+
+def diff_lessons(old_keys, new_keys) -> Dict[str, List]:
+    """Compact diff of a day: removed, added and moved lessons.
+
+    A removed and an added lesson with the same subject and teacher count
+    as one lesson moved to another time or classroom.
+    """
+    old, new = Counter(old_keys), Counter(new_keys)
+    removed = list((old - new).elements())
+    added = list((new - old).elements())
+    moved = []
+    for lesson in list(removed):
+        match = next((candidate for candidate in added if candidate[1:3] == lesson[1:3]), None)
+        if match is not None:
+            removed.remove(lesson)
+            added.remove(match)
+            moved.append({'from': list(lesson), 'to': list(match)})
+    return {
+        'added': [list(key) for key in added],
+        'removed': [list(key) for key in removed],
+        'moved': moved,
+    }
+
+def _resolve(model, names, defaults) -> Dict[str, int]:
+    """Map names to pks, bulk-creating the missing rows"""
+    found = {}
+    for pk, name in model.objects.filter(name__in=names).order_by('pk').values_list('pk', 'name'):
+        found.setdefault(name, pk)
+    missing = [name for name in names if name not in found]
+    if missing:
+        model.objects.bulk_create([model(name=name, **defaults(name)) for name in missing])
+        for pk, name in model.objects.filter(name__in=missing).order_by('pk').values_list('pk', 'name'):
+            found.setdefault(name, pk)
+    return found
+
+def apply_group_schedule(group: StudentGroup, lessons_by_day: Dict[date, List[Dict]]) -> Dict:
+    """Bring stored ScheduleEntry rows of a group in line with fetched lessons.
+
+    Lessons are compared by content hash: unchanged rows are left alone,
+    rows in the same time slot whose content changed are updated, the rest
+    are inserted or deleted. Everything runs in bulk inside one transaction.
+    Every changed day gets a new ScheduleSnapshot version holding its diff.
+    An empty list is a day fetched without lessons (all its rows are
+    deleted); days whose fetch failed must be left out of `lessons_by_day`.
+    Returns change counts, the dates that actually changed and their diffs.
+    """
+    counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'changed_dates': [], 'diffs': {}}
+    if not lessons_by_day:
+        return counts
+
+    days = list(lessons_by_day)
+    fetched = {day: [normalize_lesson(lesson) for lesson in lessons] for day, lessons in lessons_by_day.items()}
+
+    with transaction.atomic():
+        stored = defaultdict(list)
+        for entry in ScheduleEntry.objects.filter(group=group, date__in=days).select_related('teacher', 'classroom'):
+            stored[entry.date].append(entry)
+        existing_days = set(
+            Schedule.objects.filter(group=group, date__in=days).values_list('date', flat=True)
+        )
+
+        teachers = _resolve(
+            Teacher,
+            {key[2] for keys in fetched.values() for key in keys},
+            lambda name: {'email': f"{name.lower().replace(' ', '')}@mveu.ru"}
+        )
+        classrooms = _resolve(
+            Classroom,
+            {key[3] for keys in fetched.values() for key in keys},
+            lambda name: {'capacity': 30, 'building': 'Главный корпус'}
+        )
+
+        to_insert, to_update, to_delete = [], [], []
+        for day in days:
+            old_keys = [entry_key(entry) for entry in stored.get(day, [])]
+            remaining = defaultdict(list)
+            for entry in stored.get(day, []):
+                remaining[content_hash(entry_key(entry))].append(entry)
+
+            new_keys = []
+            for key in fetched[day]:
+                bucket = remaining.get(content_hash(key))
+                if bucket:
+                    bucket.pop()
+                    counts['unchanged'] += 1
+                else:
+                    new_keys.append(key)
+
+            leftovers = [entry for bucket in remaining.values() for entry in bucket]
+            by_slot = defaultdict(list)
+            for entry in leftovers:
+                by_slot[entry.time].append(entry)
+
+            for key in new_keys:
+                time_slot, subject, teacher, classroom, lesson_type = key
+                slot = by_slot.get(time_slot)
+                if slot:
+                    entry = slot.pop()
+                    entry.subject = subject
+                    entry.teacher_id = teachers[teacher]
+                    entry.classroom_id = classrooms[classroom]
+                    entry.lesson_type = lesson_type
+                    # bulk_update bypasses save(), keep the parsed times in step with `time`
+                    entry.start_time, entry.end_time = parse_lesson_time(entry.time)
+                    to_update.append(entry)
+                else:
+                    start_time, end_time = parse_lesson_time(time_slot)
+                    to_insert.append(ScheduleEntry(
+                        group=group,
+                        date=day,
+                        time=time_slot,
+                        start_time=start_time,
+                        end_time=end_time,
+                        subject=subject,
+                        teacher_id=teachers[teacher],
+                        classroom_id=classrooms[classroom],
+                        lesson_type=lesson_type
+                    ))
+            day_deleted = [entry.pk for slot in by_slot.values() for entry in slot]
+            to_delete.extend(day_deleted)
+
+            if new_keys or day_deleted:
+                counts['changed_dates'].append(day)
+                counts['diffs'][day] = {
+                    'old_keys': old_keys,
+                    'diff': diff_lessons(old_keys, fetched[day]),
+                    # First fetch of the day: nothing was known, nobody needs telling
+                    'initial': day not in existing_days,
+                }
+
+        if to_delete:
+            ScheduleEntry.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            ScheduleEntry.objects.bulk_update(
+                to_update, ['subject', 'teacher', 'classroom', 'lesson_type', 'start_time', 'end_time']
+            )
+        if to_insert:
+            ScheduleEntry.objects.bulk_create(to_insert)
+
+        if counts['diffs']:
+            _store_snapshots(group, counts['diffs'], fetched)
+            for change in counts['diffs'].values():
+                del change['old_keys']
+        
+        # Schedule rows mark a group/date as fetched; updated_at is the freshness timestamp
+        now = timezone.now()
+        Schedule.objects.filter(group=group, date__in=existing_days).update(updated_at=now, is_active=True)
+        Schedule.objects.bulk_create([
+            Schedule(group=group, date=day, updated_at=now)
+            for day in days if day not in existing_days
+        ])
+
+    counts['inserted'] = len(to_insert)
+    counts['updated'] = len(to_update)
+    counts['deleted'] = len(to_delete)
+    if counts['changed_dates']:
+        schedule_changed.send(
+            sender=ScheduleEntry,
+            group_id=group.pk,
+            group_name=group.name,
+            dates=counts['changed_dates'],
+            diffs=counts['diffs']
+        )
+    return counts
+
+def _store_snapshots(group: StudentGroup, changes: Dict[date, Dict], fetched: Dict[date, List[Tuple]]):
+    """Append a diff version per changed day (a baseline first if history is missing)"""
+    latest = dict(
+        ScheduleSnapshot.objects.filter(group=group, date__in=list(changes))
+        .values('date').annotate(latest=Max('version')).values_list('date', 'latest')
+    )
+    snapshots = []
+    for day, change in changes.items():
+        version = latest.get(day, 0)
+        if version == 0 and change['old_keys']:
+            # Rows stored before history was kept: record them as the baseline
+            version += 1
+            snapshots.append(ScheduleSnapshot(
+                group=group,
+                date=day,
+                version=version,
+                content_hash=day_hash(change['old_keys']),
+                diff=diff_lessons([], change['old_keys'])
+            ))
+        snapshots.append(ScheduleSnapshot(
+            group=group,
+            date=day,
+            version=version + 1,
+            content_hash=day_hash(fetched[day]),
+            diff=change['diff']
+        ))
+    ScheduleSnapshot.objects.bulk_create(snapshots)
@@ -0,0 +1,244 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+from django.conf import settings
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower value is sent first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NOTIFICATION = 5
+PRIORITY_BROADCAST = 10
+
+LANES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_NOTIFICATION: 'notification',
+    PRIORITY_BROADCAST: 'broadcast',
+}
+
+class TokenBucket:
+    """Token bucket that can reserve future tokens (the balance may go negative)"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available"""
+        self._refill(time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        """Take a token, returns how long the caller must wait before using it"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def is_idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+class _SendJob:
+    __slots__ = ('chat_id', 'call', 'priority', 'future', 'enqueued_at', 'attempts', 'chat_reserved')
+
+    def __init__(self, chat_id, call, priority, future):
+        self.chat_id = chat_id
+        self.call = call
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+        self.chat_reserved = False
+
+class SendScheduler:
+    """Central outbound scheduler for Telegram API calls.
+
+    Enforces a global rate and per-chat rates (private chats and groups have
+    different limits), serves the interactive lane before broadcasts and
+    retries calls rejected with 429 after the advertised retry_after.
+    """
+
+    def __init__(self, bot, global_rate: float = 30, chat_rate: float = 1,
+                 group_rate: float = 20 / 60, max_in_flight: int = 30, max_attempts: int = 3):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_attempts = max_attempts
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        # Keyed by str(chat_id): the same chat arrives both as int and as str
+        self.chat_buckets: Dict[str, TokenBucket] = {}
+        self.paused_until = 0.0
+        self.max_in_flight = max_in_flight
+        self._seq = itertools.count()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.depth = {lane: 0 for lane in LANES.values()}
+        self.wait_times = {lane: deque(maxlen=1000) for lane in LANES.values()}
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.rate_limited = 0
+
+    async def start(self):
+        """Start the dispatcher on the running event loop"""
+        self._queue = asyncio.PriorityQueue()
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._dispatcher = asyncio.create_task(self._dispatch(), name="send-scheduler")
+
+    async def stop(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+
+    async def submit(self, chat_id, call: Callable[[], Awaitable[Any]],
+                     priority: int = PRIORITY_INTERACTIVE) -> Any:
+        """Run `call` (a coroutine factory) once the rate limits allow it"""
+        if self._queue is None:
+            raise RuntimeError("Send scheduler is not started")
+
+        job = _SendJob(chat_id, call, priority, asyncio.get_running_loop().create_future())
+        self.depth[self._lane(priority)] += 1
+        self._queue.put_nowait((priority, next(self._seq), job))
+        return await job.future
+
+    async def send_message(self, chat_id, text: str, priority: int = PRIORITY_INTERACTIVE, **kwargs):
+        """Rate-limited bot.send_message"""
+        return await self.submit(
+            chat_id,
+            lambda: self.bot.send_message(chat_id=chat_id, text=text, **kwargs),
+            priority=priority
+        )
+
+    async def edit_message_text(self, chat_id, message_id: int, text: str,
+                                priority: int = PRIORITY_INTERACTIVE, **kwargs):
+        """Rate-limited bot.edit_message_text"""
+        return await self.submit(
+            chat_id,
+            lambda: self.bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, **kwargs),
+            priority=priority
+        )
+
+    def _lane(self, priority: int) -> str:
+        return LANES.get(priority, 'broadcast' if priority > PRIORITY_NOTIFICATION else 'notification')
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self.chat_buckets.get(key)
+        if bucket is None:
+            if len(self.chat_buckets) > 10000:
+                self._prune_buckets()
+            rate = self.group_rate if key.startswith('-') else self.chat_rate
+            bucket = TokenBucket(rate, 1)
+            self.chat_buckets[key] = bucket
+        return bucket
+
+    def _prune_buckets(self):
+        for chat_id in [chat_id for chat_id, bucket in self.chat_buckets.items() if bucket.is_idle()]:
+            del self.chat_buckets[chat_id]
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            wait = max(self.global_bucket.wait_time(), self.paused_until - time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            item = await self._queue.get()
+            job = item[2]
+
+            if not job.chat_reserved:
+                job.chat_reserved = True
+                delay = self._chat_bucket(job.chat_id).reserve()
+                if delay > 0:
+                    # Keep the original sequence number so per-chat order is preserved
+                    loop.call_later(delay, self._queue.put_nowait, item)
+                    continue
+
+            self.global_bucket.reserve()
+            self.depth[self._lane(job.priority)] -= 1
+            await self._semaphore.acquire()
+            asyncio.create_task(self._execute(item))
+
+    async def _execute(self, item):
+        job = item[2]
+        lane = self._lane(job.priority)
+        try:
+            if job.attempts == 0:
+                self.wait_times[lane].append(time.monotonic() - job.enqueued_at)
+            job.attempts += 1
+            result = await job.call()
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        except RetryAfter as e:
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + e.retry_after)
+            logger.warning(f"Telegram flood control, pausing sends for {e.retry_after}s")
+            self._retry(item, e, e.retry_after)
+        except (TimedOut, NetworkError) as e:
+            self._retry(item, e, 2 ** job.attempts)
+        except Exception as e:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self._semaphore.release()
+
+    def _retry(self, item, error: Exception, delay: float):
+        job = item[2]
+        if job.attempts >= self.max_attempts or job.future.done():
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(error)
+            return
+
+        self.retried += 1
+        self.depth[self._lane(job.priority)] += 1
+        # The retry is a new send and needs its own per-chat token
+        job.chat_reserved = False
+        asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, item)
+
+    def stats(self) -> Dict:
+        wait_stats = {}
+        for lane, samples in self.wait_times.items():
+            ordered = sorted(samples)
+            wait_stats[lane] = {
+                'avg': round(sum(ordered) / len(ordered), 4) if ordered else 0.0,
+                'p95': round(ordered[int(len(ordered) * 0.95) - 1], 4) if ordered else 0.0,
+                'max': round(ordered[-1], 4) if ordered else 0.0,
+            }
+        return {
+            'queue_depth': dict(self.depth),
+            'wait_seconds': wait_stats,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'rate_limited': self.rate_limited,
+            'tracked_chats': len(self.chat_buckets),
+        }
+
+def create_send_scheduler(bot) -> SendScheduler:
+    """Build the send scheduler with the limits configured in settings"""
+    return SendScheduler(
+        bot,
+        global_rate=settings.TELEGRAM_GLOBAL_RATE,
+        chat_rate=settings.TELEGRAM_CHAT_RATE,
+        group_rate=settings.TELEGRAM_GROUP_RATE_PER_MINUTE / 60,
+    )
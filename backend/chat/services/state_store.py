@@ -0,0 +1,138 @@
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+class StateStore(ABC):
+    """Conversation state store with per-key TTL and hit/miss/eviction counters"""
+
+    def __init__(self, ttl: int = 86400):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        values = await self.get_many([key])
+        return values.get(key, default)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        await self.set_many({key: value}, ttl=ttl)
+
+    @abstractmethod
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values of the keys that are present and not expired"""
+
+    @abstractmethod
+    async def set_many(self, values: Dict[str, Any], ttl: Optional[int] = None):
+        """Store several values with one TTL"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Drop a key if present"""
+
+    def _count(self, found: int, requested: int):
+        self.hits += found
+        self.misses += requested - found
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+class MemoryStateStore(StateStore):
+    """In-process store bounded by TTL and LRU eviction"""
+
+    def __init__(self, ttl: int = 86400, max_keys: int = 50000):
+        super().__init__(ttl=ttl)
+        self.max_keys = max_keys
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        now = time.monotonic()
+        keys = list(keys)
+        result = {}
+        for key in keys:
+            item = self._data.get(key)
+            if item is None:
+                continue
+            value, expires_at = item
+            if expires_at <= now:
+                del self._data[key]
+                self.evictions += 1
+                continue
+            self._data.move_to_end(key)
+            result[key] = value
+        self._count(len(result), len(keys))
+        return result
+
+    async def set_many(self, values: Dict[str, Any], ttl: Optional[int] = None):
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        for key, value in values.items():
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats.update({'backend': 'memory', 'size': len(self._data), 'max_keys': self.max_keys})
+        return stats
+
+class RedisStateStore(StateStore):
+    """Redis-backed store shared by all bot workers; Redis expires keys by TTL"""
+
+    def __init__(self, redis_url: str, ttl: int = 86400, prefix: str = 'bot:state:'):
+        super().__init__(ttl=ttl)
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._client = None
+
+    @property
+    def client(self):
+        # Created lazily so the connection pool binds to the bot event loop
+        if self._client is None:
+            import redis.asyncio
+            self._client = redis.asyncio.Redis.from_url(self.redis_url, decode_responses=True)
+        return self._client
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = await self.client.mget([self.prefix + key for key in keys])
+        result = {key: value for key, value in zip(keys, values) if value is not None}
+        self._count(len(result), len(keys))
+        return result
+
+    async def set_many(self, values: Dict[str, Any], ttl: Optional[int] = None):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipe.set(self.prefix + key, value, ex=ttl or self.ttl)
+        await pipe.execute()
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats['backend'] = 'redis'
+        return stats
+
+def create_state_store() -> StateStore:
+    """Build the conversation state store configured in settings"""
+    if settings.BOT_STATE_BACKEND == 'redis':
+        return RedisStateStore(settings.REDIS_URL, ttl=settings.BOT_STATE_TTL)
+    return MemoryStateStore(ttl=settings.BOT_STATE_TTL, max_keys=settings.BOT_STATE_MAX_KEYS)
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional
+from django.conf import settings
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+class UpdateQueue:
+    """In-process queue of raw Telegram updates drained by a pool of workers.
+
+    The webhook view only calls `submit()` and returns immediately; workers
+    running on the bot event loop feed the updates into
+    `application.process_update`.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, data: Dict) -> bool:
+        """Enqueue a raw update from any thread, returns False if it was dropped"""
+        if self.loop is None or self.loop.is_closed() or self.queue.full():
+            self.dropped += 1
+            return False
+
+        self.received += 1
+        self.loop.call_soon_threadsafe(self._put, data)
+        return True
+
+    def _put(self, data: Dict):
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Update queue is full, dropping update")
+
+    async def _next(self) -> Dict:
+        return await self.queue.get()
+
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def start(self, application, workers: int = 8):
+        """Start worker tasks on the running event loop"""
+        self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self.loop = asyncio.get_running_loop()
+        self.workers = [
+            asyncio.create_task(self._worker(application), name=f"update-worker-{i}")
+            for i in range(workers)
+        ]
+        logger.info(f"Update queue started with {workers} workers")
+
+    async def stop(self):
+        """Cancel worker tasks"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.loop = None
+
+    async def _worker(self, application):
+        while True:
+            data = await self._next()
+            try:
+                update = Update.de_json(data, application.bot)
+                await application.process_update(update)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing update {data.get('update_id')}: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            'backend': 'memory',
+            'depth': self.depth(),
+            'workers': len(self.workers),
+            'received': self.received,
+            'processed': self.processed,
+            'failed': self.failed,
+            'dropped': self.dropped,
+        }
+
+# Returns the new list length, or 0 when the list already holds ARGV[2] items
+PUSH_IF_ROOM = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+return redis.call('RPUSH', KEYS[1], ARGV[1])
+"""
+
+class RedisUpdateQueue(UpdateQueue):
+    """Update queue backed by a Redis list so several web processes can share it"""
+
+    def __init__(self, redis_url: str, key: str = 'telegram:updates', maxsize: int = 10000):
+        super().__init__(maxsize=maxsize)
+        import redis
+        self.redis_url = redis_url
+        self.key = key
+        self.sync_client = redis.Redis.from_url(redis_url)
+        self.push_if_room = self.sync_client.register_script(PUSH_IF_ROOM)
+        self.async_client = None
+
+    def submit(self, data: Dict) -> bool:
+        try:
+            # Length check and push in one script, so a full queue rejects the new update
+            if not self.push_if_room(keys=[self.key], args=[json.dumps(data), self.maxsize]):
+                self.dropped += 1
+                logger.warning("Update queue is full, dropping update")
+                return False
+            self.received += 1
+            return True
+        except Exception as e:
+            self.dropped += 1
+            logger.error(f"Error pushing update to Redis: {e}")
+            return False
+
+    async def _next(self) -> Dict:
+        while True:
+            item = await self.async_client.blpop(self.key, timeout=5)
+            if item:
+                return json.loads(item[1])
+
+    def depth(self) -> int:
+        try:
+            return self.sync_client.llen(self.key)
+        except Exception:
+            return -1
+
+    async def start(self, application, workers: int = 8):
+        import redis.asyncio
+        self.async_client = redis.asyncio.Redis.from_url(self.redis_url)
+        await super().start(application, workers)
+
+    async def stop(self):
+        await super().stop()
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats['backend'] = 'redis'
+        return stats
+
+def create_update_queue() -> UpdateQueue:
+    """Build the update queue configured in settings"""
+    if settings.TELEGRAM_UPDATE_QUEUE_BACKEND == 'redis':
+        return RedisUpdateQueue(settings.REDIS_URL, maxsize=settings.TELEGRAM_UPDATE_QUEUE_SIZE)
+    return UpdateQueue(maxsize=settings.TELEGRAM_UPDATE_QUEUE_SIZE)
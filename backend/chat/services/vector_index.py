@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from typing import Dict, List
+import numpy as np
+from django.conf import settings
+from .knowledge_index import STOP_WORDS, TOKEN_RE, KnowledgeIndex, knowledge_index
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 2
+NGRAM_SIZES = (4, 5)
+
+def embed(text: str, dim: int = 2048) -> np.ndarray:
+    """Hashed character n-gram embedding, L2-normalized float32.
+
+    Each 4-5 char n-gram of every space-padded non-stop word is hashed to a
+    dimension and a sign; counts are damped with log1p. Shared word stems
+    give shared n-grams, so inflected forms land close to each other.
+    """
+    grams = [
+        padded[i:i + n]
+        for word in TOKEN_RE.findall((text or '').lower().replace('ё', 'е')) if word not in STOP_WORDS
+        for padded in (f" {word} ",)
+        for n in NGRAM_SIZES for i in range(len(padded) - n + 1)
+    ]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not grams:
+        return vector
+    hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint32, count=len(grams))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    counts = np.bincount(hashes % dim, weights=signs, minlength=dim)
+    vector = (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def text_digest(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+class VectorIndex:
+    """Dense cosine-similarity index over the KnowledgeIndex chunks.
+
+    Chunk embeddings are rows of one float32 matrix saved as .npy and
+    memory-mapped on load; a query is a single matrix-vector product and an
+    argpartition. The matrix follows KnowledgeIndex.version: on a change,
+    rows of surviving chunks whose text digest still matches are copied and
+    only new or edited chunks are embedded.
+    """
+
+    def __init__(self, matrix_path: str, source: KnowledgeIndex, dim: int = 2048):
+        self.matrix_path = matrix_path
+        self.meta_path = f"{os.path.splitext(matrix_path)[0]}.json"
+        self.source = source
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._chunk_ids: List[int] = []
+        self._digests: List[str] = []
+        self._version = None
+        self.loaded = False
+        self.searches = 0
+        self.embedded = 0
+
+    def ensure_synced(self):
+        """Load the saved matrix once, then catch up with the keyword index"""
+        with self._lock:
+            if not self.loaded:
+                self._load()
+                self.loaded = True
+            if self._version != self.source.version:
+                self._rebuild()
+
+    def _load(self):
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('format') != SNAPSHOT_FORMAT or meta.get('dim') != self.dim:
+                return
+            matrix = np.load(self.matrix_path, mmap_mode='r') if meta['chunk_ids'] else self._matrix
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable vector index {self.matrix_path}: {e}")
+            return
+        if matrix.shape != (len(meta['chunk_ids']), self.dim) or len(meta['digests']) != len(meta['chunk_ids']):
+            return
+        self._matrix, self._chunk_ids, self._digests = matrix, meta['chunk_ids'], meta['digests']
+        self._version = meta['version']
+        logger.info(f"Loaded vector index: {len(self._chunk_ids)} chunks")
+
+    def _rebuild(self):
+        version = self.source.version
+        texts = self.source.chunk_texts()
+        rows = {(chunk_id, digest): row for row, (chunk_id, digest) in enumerate(zip(self._chunk_ids, self._digests))}
+        chunk_ids = sorted(texts)
+        digests = [text_digest(texts[chunk_id]) for chunk_id in chunk_ids]
+
+        matrix = np.empty((len(chunk_ids), self.dim), dtype=np.float32)
+        for i, (chunk_id, digest) in enumerate(zip(chunk_ids, digests)):
+            row = rows.get((chunk_id, digest))
+            if row is not None:
+                matrix[i] = self._matrix[row]
+            else:
+                matrix[i] = embed(texts[chunk_id], self.dim)
+                self.embedded += 1
+
+        self._matrix, self._chunk_ids, self._digests, self._version = matrix, chunk_ids, digests, version
+        self._save()
+
+    def _save(self):
+        tmp_path = f"{self.matrix_path}.tmp"
+        try:
+            if self._chunk_ids:
+                # np.save would append .npy to a name not ending in it
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, self._matrix)
+                os.replace(tmp_path, self.matrix_path)
+                self._matrix = np.load(self.matrix_path, mmap_mode='r')
+            with open(f"{self.meta_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump({
+                    'format': SNAPSHOT_FORMAT,
+                    'dim': self.dim,
+                    'version': self._version,
+                    'chunk_ids': self._chunk_ids,
+                    'digests': self._digests,
+                }, f)
+            os.replace(f"{self.meta_path}.tmp", self.meta_path)
+        except OSError as e:
+            logger.warning(f"Could not write vector index: {e}")
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """Top-k chunks by cosine similarity"""
+        vector = embed(query, self.dim)
+        with self._lock:
+            self.searches += 1
+            matrix, chunk_ids = self._matrix, self._chunk_ids
+        if not chunk_ids or not vector.any():
+            return []
+        scores = matrix @ vector
+        k = min(k, len(chunk_ids))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        results = [self.source.result(chunk_ids[row], float(scores[row])) for row in best if scores[row] > 0]
+        return [result for result in results if result is not None]
+
+    def stats(self) -> Dict:
+        return {
+            'chunks': len(self._chunk_ids),
+            'dim': self.dim,
+            'version': self._version,
+            'memory_mapped': isinstance(self._matrix, np.memmap),
+            'embedded': self.embedded,
+            'searches': self.searches,
+        }
+
+vector_index = VectorIndex(settings.KNOWLEDGE_VECTORS_PATH, knowledge_index, settings.KNOWLEDGE_VECTOR_DIM)
@@ -0,0 +1,49 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from .models import TelegramUser, StudentProfile, StudentGroup, ScheduleEntry
+from .services.identity_cache import identity_cache
+from .services.lesson_reminders import lesson_reminders
+from .services.schedule_notifier import schedule_notifier
+from .services.interval_index import interval_index
+from .services.ics_feed import ics_feed
+
+# Sent after stored lessons of a group changed; kwargs: group_id, group_name, dates,
+# diffs ({date: {'diff': ..., 'initial': bool}}, see schedule_store.diff_lessons)
+schedule_changed = Signal()
+
+@receiver([post_save, post_delete], sender=TelegramUser)
+def invalidate_telegram_user(sender, instance, **kwargs):
+    identity_cache.invalidate(instance.telegram_id)
+
+@receiver([post_save, post_delete], sender=StudentProfile)
+def invalidate_student_profile(sender, instance, **kwargs):
+    identity_cache.invalidate_user_pk(instance.telegram_user_id)
+
+@receiver([post_save, post_delete], sender=StudentProfile)
+def update_reminder_subscription(sender, instance, signal, **kwargs):
+    deleted = signal is post_delete
+    lesson_reminders.update_subscriber(
+        instance.telegram_user.telegram_id,
+        None if deleted else instance.group_id,
+        None if deleted else instance.reminder_minutes
+    )
+
+@receiver([post_save, post_delete], sender=StudentGroup)
+def invalidate_student_group(sender, instance, **kwargs):
+    identity_cache.invalidate_group(instance.pk)
+
+@receiver(schedule_changed, sender=ScheduleEntry)
+def reload_lesson_reminders(sender, group_id, dates, **kwargs):
+    lesson_reminders.schedule_changed(group_id, dates)
+
+@receiver(schedule_changed, sender=ScheduleEntry)
+def notify_schedule_change(sender, group_id, group_name, diffs, **kwargs):
+    schedule_notifier.schedule_changed(group_id, group_name, diffs)
+
+@receiver(schedule_changed, sender=ScheduleEntry)
+def refresh_interval_index(sender, group_id, dates, **kwargs):
+    interval_index.group_changed(group_id, dates)
+
+@receiver(schedule_changed, sender=ScheduleEntry)
+def invalidate_ics_feed(sender, group_name, dates, **kwargs):
+    ics_feed.invalidate(group_name, dates)
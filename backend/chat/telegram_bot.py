@@ -1,14 +1,27 @@
 import asyncio
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, time as dt_time
+from typing import Optional
 from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import Application, MessageHandler, CallbackQueryHandler, CommandHandler, filters, CallbackContext
 from django.conf import settings
 from channels.layers import get_channel_layer
-from asgiref.sync import sync_to_async
 from .models import Message, TelegramUser, ChatSession, Document, ApplicantProfile, StudentProfile, StudentGroup
 from .services.openai_service import UniversityAIService
-from .services.schedule_service import ScheduleService
+from .services.schedule_service import schedule_service
+from .services.update_queue import create_update_queue
+from .services.state_store import create_state_store
+from .services.send_scheduler import create_send_scheduler
+from .services.broadcast_service import BroadcastEngine
+from .services.schedule_digest import DailyDigest
+from .services.lesson_reminders import lesson_reminders, REMINDER_CHOICES
+from .services.schedule_notifier import schedule_notifier
+from .services.identity_cache import identity_cache
+from .services.message_buffer import message_buffer
+from .services.knowledge_index import knowledge_index
+from .services.vector_index import vector_index
+from .services.db_executor import run_db
 import json
 
 logger = logging.getLogger(__name__)
@@ -17,10 +30,27 @@ logger = logging.getLogger(__name__)
 bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
 channel_layer = get_channel_layer()
 ai_service = UniversityAIService()
-schedule_service = ScheduleService()
+update_queue = create_update_queue()
+send_scheduler = create_send_scheduler(bot)
+broadcast_engine = BroadcastEngine(send_scheduler)
+daily_digest = DailyDigest(
+    send_scheduler,
+    schedule_service,
+    send_at=dt_time.fromisoformat(settings.DAILY_DIGEST_TIME) if settings.DAILY_DIGEST_TIME else None
+)
 
-# Bot states
-USER_STATES = {}
+# Max characters in one Telegram message
+TELEGRAM_TEXT_LIMIT = 4096
+
+# Event loop the bot runs on (set by start_telegram_bot)
+bot_loop = None
+
+# Conversation states (per telegram user id)
+user_states = create_state_store()
+
+async def reply_text(update: Update, text: str, **kwargs):
+    """Reply in the update's chat through the rate-limited send scheduler"""
+    return await send_scheduler.send_message(update.effective_chat.id, text, **kwargs)
 
 class TelegramBotHandler:
     
@@ -30,7 +60,7 @@ class TelegramBotHandler:
         user = update.effective_user
         
         # Get or create telegram user
-        telegram_user = await sync_to_async(TelegramUser.objects.get_or_create)(
+        telegram_user = await TelegramUser.objects.aget_or_create(
             telegram_id=str(user.id),
             defaults={
                 'username': user.username,
@@ -52,7 +82,7 @@ class TelegramBotHandler:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(welcome_text, reply_markup=reply_markup)
+        await reply_text(update, welcome_text, reply_markup=reply_markup)
     
     @staticmethod
     async def button_handler(update: Update, context: CallbackContext):
@@ -75,6 +105,18 @@ class TelegramBotHandler:
             await TelegramBotHandler.show_applicant_menu(query)
         elif data == "back_to_student":
             await TelegramBotHandler.show_student_menu(query)
+        elif data.startswith("course_"):
+            await TelegramBotHandler.show_course_groups(query, data)
+        elif data.startswith("select_group_"):
+            group_name = data.replace("select_group_", "").replace("_", "/")
+            await TelegramBotHandler.set_student_group(query, group_name)
+        elif data == "search_group":
+            await query.edit_message_text(
+                "🔍 Введите название группы (например: ДИС-241.1/21):",
+                reply_markup=InlineKeyboardMarkup([
+                    [InlineKeyboardButton("↩️ Назад", callback_data="student_set_group")]
+                ])
+            )
     
     @staticmethod
     async def handle_user_type_selection(query, data):
@@ -83,9 +125,9 @@ class TelegramBotHandler:
         user_id = str(query.from_user.id)
         
         # Update user type in database
-        telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
+        telegram_user = (await identity_cache.get(user_id)).user
         telegram_user.user_type = user_type
-        await sync_to_async(telegram_user.save)()
+        await telegram_user.asave(update_fields=['user_type'])
         
         if user_type == "applicant":
             await TelegramBotHandler.show_applicant_menu(query)
@@ -129,10 +171,8 @@ class TelegramBotHandler:
         
         # Get student profile if exists
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
-            student_profile = await sync_to_async(
-                lambda: getattr(telegram_user, 'studentprofile', None)
-            )()
+            identity = await identity_cache.get(user_id)
+            student_profile = identity.profile
         except:
             student_profile = None
         
@@ -152,10 +192,18 @@ class TelegramBotHandler:
             [InlineKeyboardButton("🔍 Найти расписание группы", callback_data="student_search_schedule")],
             [InlineKeyboardButton("📊 Расписание на сегодня", callback_data="student_today_schedule")],
             [InlineKeyboardButton("📋 Расписание на неделю", callback_data="student_week_schedule")],
+            [
+                InlineKeyboardButton("⏭ Следующая пара", callback_data="student_next_lesson"),
+                InlineKeyboardButton("🟢 Идёт сейчас", callback_data="student_now_lesson")
+            ],
             [InlineKeyboardButton("⚙️ Настроить группу", callback_data="student_set_group")],
             [InlineKeyboardButton("❓ Задать вопрос", callback_data="student_ask_question")],
             [InlineKeyboardButton("↩️ Назад к меню", callback_data="back_to_main")]
         ]
+        if student_profile and student_profile.group:
+            digest_label = "🔕 Отключить утреннее расписание" if student_profile.daily_digest else "🔔 Включить утреннее расписание"
+            keyboard.insert(-2, [InlineKeyboardButton(digest_label, callback_data="student_toggle_digest")])
+            keyboard.insert(-2, [InlineKeyboardButton("⏰ Напоминания о парах", callback_data="student_reminders")])
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         await query.edit_message_text(text=text, reply_markup=reply_markup)
@@ -173,13 +221,20 @@ class TelegramBotHandler:
             await TelegramBotHandler.show_today_schedule(query)
         elif data == "student_week_schedule":
             await TelegramBotHandler.show_week_schedule(query)
+        elif data == "student_next_lesson":
+            await TelegramBotHandler.show_next_lesson(query)
+        elif data == "student_now_lesson":
+            await TelegramBotHandler.show_current_lessons(query)
+        elif data == "student_toggle_digest":
+            await TelegramBotHandler.toggle_daily_digest(query)
+        elif data == "student_reminders":
+            await TelegramBotHandler.show_reminder_settings(query)
+        elif data.startswith("student_reminder_"):
+            await TelegramBotHandler.set_reminder_minutes(query, data.replace("student_reminder_", ""))
         elif data == "student_set_group":
             await TelegramBotHandler.start_group_setup(query)
         elif data == "student_ask_question":
             await TelegramBotHandler.start_ai_chat_student(query)
-        elif data.startswith("select_group_"):
-            group_name = data.replace("select_group_", "").replace("_", "/")
-            await TelegramBotHandler.set_student_group(query, group_name)
         elif data.startswith("schedule_group_"):
             group_name = data.replace("schedule_group_", "").replace("_", "/")
             await TelegramBotHandler.show_group_schedule(query, group_name)
@@ -190,10 +245,8 @@ class TelegramBotHandler:
         user_id = str(query.from_user.id)
         
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
-            student_profile = await sync_to_async(
-                lambda: getattr(telegram_user, 'studentprofile', None)
-            )()
+            identity = await identity_cache.get(user_id)
+            student_profile = identity.profile
             
             if not student_profile or not student_profile.group:
                 text = (
@@ -240,11 +293,135 @@ class TelegramBotHandler:
                 ])
             )
     
+    @staticmethod
+    async def toggle_daily_digest(query):
+        """Subscribe to / unsubscribe from the morning schedule digest"""
+        user_id = str(query.from_user.id)
+        
+        try:
+            student_profile = (await identity_cache.get(user_id)).profile
+            if student_profile:
+                student_profile.daily_digest = not student_profile.daily_digest
+                # save() (not update()) so the post_save signal refreshes the identity cache
+                await student_profile.asave(update_fields=['daily_digest', 'updated_at'])
+        except Exception as e:
+            logger.error(f"Error toggling daily digest: {e}")
+        
+        await TelegramBotHandler.show_student_menu(query)
+    
+    @staticmethod
+    async def show_reminder_settings(query):
+        """Let the student pick how long before a lesson to be reminded"""
+        user_id = str(query.from_user.id)
+        
+        try:
+            student_profile = (await identity_cache.get(user_id)).profile
+        except Exception:
+            student_profile = None
+        current = student_profile.reminder_minutes if student_profile else None
+        
+        text = (
+            "⏰ Напоминания о парах\n\n"
+            f"Сейчас: {f'за {current} мин. до начала' if current else 'выключены'}\n\n"
+            "За сколько минут напоминать?"
+        )
+        keyboard = [[
+            InlineKeyboardButton(
+                f"{'✅ ' if minutes == current else ''}{minutes} мин.",
+                callback_data=f"student_reminder_{minutes}"
+            )
+            for minutes in REMINDER_CHOICES
+        ]]
+        keyboard.append([InlineKeyboardButton("🔕 Выключить", callback_data="student_reminder_off")])
+        keyboard.append([InlineKeyboardButton("↩️ Назад", callback_data="back_to_student")])
+        
+        await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+    
+    @staticmethod
+    async def set_reminder_minutes(query, value):
+        """Save the reminder lead time (or turn reminders off)"""
+        user_id = str(query.from_user.id)
+        
+        try:
+            student_profile = (await identity_cache.get(user_id)).profile
+            if student_profile:
+                minutes = int(value) if value.isdigit() else None
+                student_profile.reminder_minutes = minutes if minutes in REMINDER_CHOICES else None
+                # post_save updates the identity cache and the reminder index
+                await student_profile.asave(update_fields=['reminder_minutes', 'updated_at'])
+        except Exception as e:
+            logger.error(f"Error setting reminder: {e}")
+        
+        await TelegramBotHandler.show_reminder_settings(query)
+    
+    @staticmethod
+    async def show_next_lesson(query):
+        """Show the next lesson of the student's group"""
+        await TelegramBotHandler._show_lesson_status(query, 'next')
+    
+    @staticmethod
+    async def show_current_lessons(query):
+        """Show the lessons of the student's group that are in progress"""
+        await TelegramBotHandler._show_lesson_status(query, 'now')
+    
+    @staticmethod
+    async def _show_lesson_status(query, mode):
+        user_id = str(query.from_user.id)
+        callback = "student_next_lesson" if mode == 'next' else "student_now_lesson"
+        
+        try:
+            identity = await identity_cache.get(user_id)
+            student_profile = identity.profile
+            
+            if not student_profile or not student_profile.group:
+                text = "⚠️ Группа не настроена. Настройте группу для просмотра расписания."
+                keyboard = [
+                    [InlineKeyboardButton("⚙️ Настроить группу", callback_data="student_set_group")],
+                    [InlineKeyboardButton("↩️ Назад", callback_data="back_to_student")]
+                ]
+            else:
+                group_name = student_profile.group.name
+                if mode == 'next':
+                    lesson = await schedule_service.get_next_lesson(group_name)
+                    lessons = [lesson] if lesson else []
+                    text = f"⏭ Следующая пара ({group_name})\n\n"
+                    empty = "📭 Ближайших занятий нет"
+                else:
+                    lessons = await schedule_service.get_current_lessons(group_name)
+                    text = f"🟢 Идёт сейчас ({group_name})\n\n"
+                    empty = "☕ Сейчас занятий нет"
+                
+                if lessons:
+                    for lesson in lessons:
+                        text += f"📆 {lesson['date'].strftime('%d.%m.%Y')} {lesson['time']}\n"
+                        text += f"📚 {lesson['subject']}\n"
+                        text += f"👨‍🏫 {lesson['teacher']}\n"
+                        text += f"🏢 {lesson['classroom']}\n"
+                        text += f"📝 {lesson['type']}\n\n"
+                else:
+                    text += empty
+                
+                keyboard = [
+                    [InlineKeyboardButton("🔄 Обновить", callback_data=callback)],
+                    [InlineKeyboardButton("↩️ Назад", callback_data="back_to_student")]
+                ]
+            
+            await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+            
+        except Exception as e:
+            logger.error(f"Error in _show_lesson_status: {e}")
+            await query.edit_message_text(
+                "❌ Ошибка получения расписания. Попробуйте позже.",
+                reply_markup=InlineKeyboardMarkup([
+                    [InlineKeyboardButton("↩️ Назад", callback_data="back_to_student")]
+                ])
+            )
+    
     @staticmethod
     async def start_schedule_search(query):
         """Start schedule search process"""
         user_id = str(query.from_user.id)
-        USER_STATES[user_id] = "searching_schedule"
+        await user_states.set(user_id, "searching_schedule")
         
         text = (
             "🔍 Поиск расписания группы\n\n"
@@ -295,10 +472,8 @@ class TelegramBotHandler:
         user_id = str(query.from_user.id)
         
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
-            student_profile = await sync_to_async(
-                lambda: getattr(telegram_user, 'studentprofile', None)
-            )()
+            identity = await identity_cache.get(user_id)
+            student_profile = identity.profile
             
             if not student_profile or not student_profile.group:
                 text = "⚠️ Группа не настроена. Настройте группу для просмотра расписания."
@@ -344,7 +519,7 @@ class TelegramBotHandler:
     async def start_group_setup(query):
         """Start group setup process"""
         user_id = str(query.from_user.id)
-        USER_STATES[user_id] = "setting_group"
+        await user_states.set(user_id, "setting_group")
         
         text = (
             "⚙️ Настройка группы\n\n"
@@ -363,6 +538,34 @@ class TelegramBotHandler:
         
         await query.edit_message_text(text=text, reply_markup=reply_markup)
     
+    @staticmethod
+    async def show_course_groups(query, data):
+        """Show the groups of a course (StudentGroup rows mirror the group catalog)"""
+        course = f"{data.replace('course_', '')} курс"
+        
+        try:
+            await schedule_service.get_groups_data()
+            groups = [
+                name async for name in StudentGroup.objects.filter(
+                    course=course, is_active=True
+                ).order_by('name').values_list('name', flat=True)
+            ]
+            
+            keyboard = []
+            for i in range(0, len(groups), 2):
+                keyboard.append([
+                    InlineKeyboardButton(name, callback_data=f"select_group_{name.replace('/', '_')}")
+                    for name in groups[i:i + 2]
+                ])
+            keyboard.append([InlineKeyboardButton("↩️ Назад", callback_data="student_set_group")])
+            
+            text = f"👥 Группы ({course}):" if groups else f"Группы ({course}) не найдены."
+            await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+            
+        except Exception as e:
+            logger.error(f"Error in show_course_groups: {e}")
+            await query.edit_message_text("❌ Ошибка получения списка групп.")
+    
     @staticmethod
     async def set_student_group(query, group_name):
         """Set student's group"""
@@ -370,7 +573,7 @@ class TelegramBotHandler:
         
         try:
             # Get or create student group
-            group = await sync_to_async(StudentGroup.objects.get_or_create)(
+            group = await StudentGroup.objects.aget_or_create(
                 name=group_name,
                 defaults={
                     'course': '1 курс',  # Default, will be updated
@@ -381,17 +584,17 @@ class TelegramBotHandler:
             group = group[0]
             
             # Get or create telegram user
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
+            telegram_user = (await identity_cache.get(user_id)).user
             
             # Get or create student profile
-            student_profile, created = await sync_to_async(StudentProfile.objects.get_or_create)(
+            student_profile, created = await StudentProfile.objects.aget_or_create(
                 telegram_user=telegram_user,
                 defaults={'group': group}
             )
             
             if not created:
                 student_profile.group = group
-                await sync_to_async(student_profile.save)()
+                await student_profile.asave()
             
             text = (
                 f"✅ Группа установлена!\n\n"
@@ -459,7 +662,7 @@ class TelegramBotHandler:
     async def start_ai_chat_student(query):
         """Start AI chat for students"""
         user_id = str(query.from_user.id)
-        USER_STATES[user_id] = "ai_chat_student"
+        await user_states.set(user_id, "ai_chat_student")
         
         text = (
             "🤖 ИИ-помощник для студентов\n\n"
@@ -499,7 +702,7 @@ class TelegramBotHandler:
     async def start_ai_chat(query):
         """Start AI chat session"""
         user_id = str(query.from_user.id)
-        USER_STATES[user_id] = "ai_chat"
+        await user_states.set(user_id, "ai_chat")
         
         text = (
             "🤖 ИИ-помощник активирован!\n\n"
@@ -523,7 +726,7 @@ class TelegramBotHandler:
     async def start_document_upload(query):
         """Start document upload process"""
         user_id = str(query.from_user.id)
-        USER_STATES[user_id] = "uploading_docs"
+        await user_states.set(user_id, "uploading_docs")
         
         upload_text = (
             "📤 Загрузка документов\n\n"
@@ -548,9 +751,9 @@ class TelegramBotHandler:
         
         try:
             # Update document type
-            document = await sync_to_async(Document.objects.get)(id=doc_id)
+            document = await Document.objects.aget(id=doc_id)
             document.document_type = doc_type
-            await sync_to_async(document.save)()
+            await document.asave(update_fields=['document_type'])
             
             doc_type_names = {
                 'passport': 'Паспорт',
@@ -608,11 +811,11 @@ class TelegramBotHandler:
     async def start_admission_chat(query):
         """Start admission office chat"""
         user_id = str(query.from_user.id)
-        USER_STATES[user_id] = "admission_chat"
+        await user_states.set(user_id, "admission_chat")
         
         # Create chat session
-        telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
-        chat_session = await sync_to_async(ChatSession.objects.create)(
+        telegram_user = (await identity_cache.get(user_id)).user
+        chat_session = await ChatSession.objects.acreate(
             telegram_user=telegram_user,
             session_type='admission'
         )
@@ -663,7 +866,7 @@ class TelegramBotHandler:
         message_text = update.message.text
         
         # Get user state
-        state = USER_STATES.get(user_id, "")
+        state = await user_states.get(user_id, "")
         
         if state == "ai_chat":
             await TelegramBotHandler.handle_ai_question(update, message_text)
@@ -679,25 +882,76 @@ class TelegramBotHandler:
             await TelegramBotHandler.handle_group_input(update, message_text)
         else:
             # Default response
-            await update.message.reply_text(
+            await reply_text(
+                update,
                 "Используйте /start для начала работы с ботом."
             )
     
+    @staticmethod
+    async def stream_ai_answer(update: Update, question: str, reply_markup) -> Optional[str]:
+        """Send a placeholder and edit it as the AI answer streams in.
+        
+        Edits are throttled to AI_STREAM_EDIT_INTERVAL with at most one in
+        flight; the final edit adds the keyboard, text over the Telegram limit
+        continues in new messages. Returns the answer, None if it failed.
+        """
+        chat_id = update.effective_chat.id
+        placeholder = await reply_text(update, "🤖 Думаю над ответом...")
+        answer, last_edit, pending = '', 0.0, None
+        
+        try:
+            async for delta in ai_service.stream_ai_response(question):
+                # A cached or demo answer arrives as one delta: only edit once more text follows
+                streaming = bool(answer)
+                answer += delta
+                now = time.monotonic()
+                if streaming and (pending is None or pending.done()) and now - last_edit >= settings.AI_STREAM_EDIT_INTERVAL:
+                    last_edit = now
+                    pending = asyncio.create_task(send_scheduler.edit_message_text(
+                        chat_id, placeholder.message_id, answer[:TELEGRAM_TEXT_LIMIT - 2] + " ▌"
+                    ))
+                    pending.add_done_callback(lambda task: task.cancelled() or task.exception())
+        except Exception as e:
+            logger.error(f"Error streaming AI answer: {e}")
+            answer = None
+        
+        if pending is not None:
+            await asyncio.gather(pending, return_exceptions=True)
+        if not answer:
+            await send_scheduler.edit_message_text(
+                chat_id, placeholder.message_id,
+                "Извините, произошла ошибка при обработке вашего вопроса. Попробуйте позже."
+            )
+            return None
+        
+        parts = [answer[i:i + TELEGRAM_TEXT_LIMIT] for i in range(0, len(answer), TELEGRAM_TEXT_LIMIT)]
+        await send_scheduler.edit_message_text(
+            chat_id, placeholder.message_id, parts[0],
+            reply_markup=reply_markup if len(parts) == 1 else None
+        )
+        for i, part in enumerate(parts[1:], start=2):
+            await reply_text(update, part, reply_markup=reply_markup if i == len(parts) else None)
+        return answer
+    
     @staticmethod
     async def handle_ai_question(update: Update, question: str):
         """Handle AI question"""
         user_id = str(update.effective_user.id)
-        
-        # Send "typing" action
-        await bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+        keyboard = [
+            [InlineKeyboardButton("❓ Задать еще вопрос", callback_data="applicant_ask_question")],
+            [InlineKeyboardButton("↩️ Назад к меню", callback_data="back_to_applicant")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
         
         try:
-            # Get AI response
-            ai_response = await sync_to_async(ai_service.get_ai_response)(question)
+            # Stream the AI response into a placeholder message
+            ai_response = await TelegramBotHandler.stream_ai_answer(update, question, reply_markup)
+            if ai_response is None:
+                return
             
-            # Save message to database
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
-            await sync_to_async(Message.objects.create)(
+            # Save messages (write-behind, flushed in batches)
+            telegram_user = (await identity_cache.get(user_id)).user
+            message_buffer.add(
                 text=question,
                 source='telegram',
                 direction='incoming',
@@ -705,7 +959,7 @@ class TelegramBotHandler:
                 telegram_user=telegram_user
             )
             
-            await sync_to_async(Message.objects.create)(
+            message_buffer.add(
                 text=ai_response,
                 source='telegram',
                 direction='outgoing',
@@ -713,21 +967,13 @@ class TelegramBotHandler:
                 telegram_user=telegram_user
             )
             
-            # Send response
-            keyboard = [
-                [InlineKeyboardButton("❓ Задать еще вопрос", callback_data="applicant_ask_question")],
-                [InlineKeyboardButton("↩️ Назад к меню", callback_data="back_to_applicant")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(ai_response, reply_markup=reply_markup)
-            
             # Clear state to allow new questions
-            USER_STATES[user_id] = "ai_chat"
+            await user_states.set(user_id, "ai_chat")
             
         except Exception as e:
             logger.error(f"Error handling AI question: {e}")
-            await update.message.reply_text(
+            await reply_text(
+                update,
                 "Извините, произошла ошибка при обработке вашего вопроса. Попробуйте позже."
             )
     
@@ -735,19 +981,24 @@ class TelegramBotHandler:
     async def handle_ai_question_student(update: Update, question: str):
         """Handle AI question from student"""
         user_id = str(update.effective_user.id)
-        
-        # Send "typing" action
-        await bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+        keyboard = [
+            [InlineKeyboardButton("❓ Еще вопрос", callback_data="student_ask_question")],
+            [InlineKeyboardButton("📅 Мое расписание", callback_data="student_my_schedule")],
+            [InlineKeyboardButton("↩️ Назад к меню", callback_data="back_to_student")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
         
         try:
-            # Get AI response with student context
-            ai_response = await sync_to_async(ai_service.get_ai_response)(
-                f"Вопрос студента: {question}"
+            # Stream the AI response with student context
+            ai_response = await TelegramBotHandler.stream_ai_answer(
+                update, f"Вопрос студента: {question}", reply_markup
             )
+            if ai_response is None:
+                return
             
-            # Save message to database
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
-            await sync_to_async(Message.objects.create)(
+            # Save messages (write-behind, flushed in batches)
+            telegram_user = (await identity_cache.get(user_id)).user
+            message_buffer.add(
                 text=question,
                 source='telegram',
                 direction='incoming',
@@ -755,7 +1006,7 @@ class TelegramBotHandler:
                 telegram_user=telegram_user
             )
             
-            await sync_to_async(Message.objects.create)(
+            message_buffer.add(
                 text=ai_response,
                 source='telegram',
                 direction='outgoing',
@@ -763,22 +1014,13 @@ class TelegramBotHandler:
                 telegram_user=telegram_user
             )
             
-            # Send response
-            keyboard = [
-                [InlineKeyboardButton("❓ Еще вопрос", callback_data="student_ask_question")],
-                [InlineKeyboardButton("📅 Мое расписание", callback_data="student_my_schedule")],
-                [InlineKeyboardButton("↩️ Назад к меню", callback_data="back_to_student")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(ai_response, reply_markup=reply_markup)
-            
             # Clear state to allow new questions
-            USER_STATES[user_id] = "ai_chat_student"
+            await user_states.set(user_id, "ai_chat_student")
             
         except Exception as e:
             logger.error(f"Error handling student AI question: {e}")
-            await update.message.reply_text(
+            await reply_text(
+                update,
                 "Извините, произошла ошибка при обработке вашего вопроса. Попробуйте позже."
             )
     
@@ -807,10 +1049,10 @@ class TelegramBotHandler:
                 keyboard.append([InlineKeyboardButton("↩️ Назад", callback_data="back_to_student")])
                 
                 reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(text, reply_markup=reply_markup)
+                await reply_text(update, text, reply_markup=reply_markup)
                 
                 # Clear search state
-                USER_STATES[user_id] = ""
+                await user_states.delete(user_id)
                 
             else:
                 text = (
@@ -827,11 +1069,12 @@ class TelegramBotHandler:
                 ]
                 reply_markup = InlineKeyboardMarkup(keyboard)
                 
-                await update.message.reply_text(text, reply_markup=reply_markup)
+                await reply_text(update, text, reply_markup=reply_markup)
             
         except Exception as e:
             logger.error(f"Error in schedule search: {e}")
-            await update.message.reply_text(
+            await reply_text(
+                update,
                 "❌ Ошибка поиска. Попробуйте еще раз.",
                 reply_markup=InlineKeyboardMarkup([
                     [InlineKeyboardButton("↩️ Назад", callback_data="back_to_student")]
@@ -873,7 +1116,7 @@ class TelegramBotHandler:
                     keyboard.append([InlineKeyboardButton("↩️ Назад", callback_data="back_to_student")])
                 
                 reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(text, reply_markup=reply_markup)
+                await reply_text(update, text, reply_markup=reply_markup)
                 
             else:
                 text = (
@@ -887,14 +1130,15 @@ class TelegramBotHandler:
                 ]
                 reply_markup = InlineKeyboardMarkup(keyboard)
                 
-                await update.message.reply_text(text, reply_markup=reply_markup)
+                await reply_text(update, text, reply_markup=reply_markup)
             
             # Clear state
-            USER_STATES[user_id] = ""
+            await user_states.delete(user_id)
             
         except Exception as e:
             logger.error(f"Error handling group input: {e}")
-            await update.message.reply_text(
+            await reply_text(
+                update,
                 "❌ Ошибка обработки. Попробуйте еще раз."
             )
     
@@ -903,7 +1147,7 @@ class TelegramBotHandler:
         """Helper method to set student group by name"""
         try:
             # Get or create student group
-            group = await sync_to_async(StudentGroup.objects.get_or_create)(
+            group = await StudentGroup.objects.aget_or_create(
                 name=group_name,
                 defaults={
                     'course': '1 курс',  # Default
@@ -914,17 +1158,17 @@ class TelegramBotHandler:
             group = group[0]
             
             # Get telegram user
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
+            telegram_user = (await identity_cache.get(user_id)).user
             
             # Get or create student profile
-            student_profile, created = await sync_to_async(StudentProfile.objects.get_or_create)(
+            student_profile, created = await StudentProfile.objects.aget_or_create(
                 telegram_user=telegram_user,
                 defaults={'group': group}
             )
             
             if not created:
                 student_profile.group = group
-                await sync_to_async(student_profile.save)()
+                await student_profile.asave()
             
             return True
             
@@ -938,10 +1182,10 @@ class TelegramBotHandler:
         user_id = str(update.effective_user.id)
         
         try:
-            telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
+            telegram_user = (await identity_cache.get(user_id)).user
             
-            # Save message to database
-            message = await sync_to_async(Message.objects.create)(
+            # Save message (write-behind); id and created_at are assigned up front
+            message = message_buffer.add(
                 text=message_text,
                 source='telegram',
                 direction='incoming',
@@ -963,20 +1207,21 @@ class TelegramBotHandler:
                 }
             )
             
-            await update.message.reply_text(
+            await reply_text(
+                update,
                 "✅ Ваше сообщение отправлено в приемную комиссию. Ожидайте ответа..."
             )
             
         except Exception as e:
             logger.error(f"Error handling admission message: {e}")
-            await update.message.reply_text("Ошибка отправки сообщения.")
+            await reply_text(update, "Ошибка отправки сообщения.")
     
     @staticmethod
     async def handle_document(update: Update, context: CallbackContext):
         """Handle document upload"""
         user_id = str(update.effective_user.id)
         
-        if USER_STATES.get(user_id) != "uploading_docs":
+        if await user_states.get(user_id) != "uploading_docs":
             return
         
         document = update.message.document
@@ -984,7 +1229,7 @@ class TelegramBotHandler:
         
         if document or photo:
             try:
-                telegram_user = await sync_to_async(TelegramUser.objects.get)(telegram_id=user_id)
+                telegram_user = (await identity_cache.get(user_id)).user
                 
                 if document:
                     file_info = document
@@ -998,7 +1243,7 @@ class TelegramBotHandler:
                     file_size = photo[-1].file_size
                 
                 # Save document info
-                doc = await sync_to_async(Document.objects.create)(
+                doc = await Document.objects.acreate(
                     telegram_user=telegram_user,
                     document_type='other',  # Will be updated when user specifies
                     file_id=file_id,
@@ -1017,14 +1262,15 @@ class TelegramBotHandler:
                 ]
                 reply_markup = InlineKeyboardMarkup(keyboard)
                 
-                await update.message.reply_text(
+                await reply_text(
+                    update,
                     f"✅ Документ '{file_name}' получен!\n\nУкажите тип документа:",
                     reply_markup=reply_markup
                 )
                 
             except Exception as e:
                 logger.error(f"Error handling document: {e}")
-                await update.message.reply_text("Ошибка обработки документа.")
+                await reply_text(update, "Ошибка обработки документа.")
 
 # Setup application
 def setup_telegram_application():
@@ -1042,20 +1288,61 @@ def setup_telegram_application():
 # Global application instance
 application = setup_telegram_application()
 
+def run_in_bot_loop(coro):
+    """Schedule a coroutine on the bot event loop from any thread"""
+    if bot_loop is None or bot_loop.is_closed():
+        coro.close()
+        raise RuntimeError("Telegram bot loop is not running")
+    return asyncio.run_coroutine_threadsafe(coro, bot_loop)
+
 async def start_telegram_bot():
     """Start the Telegram bot"""
+    global bot_loop
     try:
+        if settings.TELEGRAM_MODE == 'webhook' and not settings.TELEGRAM_WEBHOOK_SECRET:
+            # The webhook endpoint rejects every update without a secret to check
+            raise RuntimeError("webhook mode requires TELEGRAM_WEBHOOK_SECRET")
+        bot_loop = asyncio.get_running_loop()
         await application.initialize()
         await application.start()
-        await application.updater.start_polling()
-        logger.info("Telegram bot started successfully")
+        await send_scheduler.start()
+        
+        if settings.TELEGRAM_MODE == 'webhook':
+            await update_queue.start(application, workers=settings.TELEGRAM_UPDATE_WORKERS)
+            await application.bot.set_webhook(
+                url=settings.TELEGRAM_WEBHOOK_URL,
+                secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Telegram bot started in webhook mode ({settings.TELEGRAM_WEBHOOK_URL})")
+        else:
+            await application.updater.start_polling()
+            logger.info("Telegram bot started successfully")
+        
+        await broadcast_engine.resume_unfinished()
+        # Load the AI retrieval indexes now rather than on the first question
+        await run_db(knowledge_index.ensure_loaded)
+        await run_db(vector_index.ensure_synced)
+        daily_digest.start()
+        await lesson_reminders.start(send_scheduler)
+        await schedule_notifier.start(send_scheduler)
     except Exception as e:
         logger.error(f"Failed to start Telegram bot: {e}")
 
 async def stop_telegram_bot():
     """Stop the Telegram bot"""
     try:
+        if settings.TELEGRAM_MODE == 'webhook':
+            await update_queue.stop()
+        elif application.updater.running:
+            await application.updater.stop()
+        await daily_digest.stop()
+        await lesson_reminders.stop()
+        await schedule_notifier.stop()
+        await send_scheduler.stop()
+        await schedule_service.close()
         await application.stop()
+        message_buffer.stop()
         logger.info("Telegram bot stopped")
     except Exception as e:
-        logger.error(f"Error stopping Telegram bot: {e}")
\ No newline at end of file
+        logger.error(f"Error stopping Telegram bot: {e}")
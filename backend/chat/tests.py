@@ -1,3 +1,269 @@
-from django.test import TestCase
+import asyncio
+from concurrent.futures import Future
+from datetime import date
+from unittest import mock
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from .consumers import ChatConsumer
+from .models import BroadcastMessage, Message, ScheduleEntry, ScheduleSnapshot, StudentGroup, StudentProfile, TelegramUser
+from .services.answer_cache import AnswerCache, normalize_question
+from .services.group_catalog import FALLBACK_CATALOG, GroupCatalog
+from .services.group_index import GroupSearchIndex
+from .services.identity_cache import identity_cache
+from .services.schedule_crawler import ScheduleCrawler
+from .services.schedule_service import ScheduleService
+from .services.schedule_digest import DailyDigest
+from .services.update_queue import RedisUpdateQueue
+from .services.schedule_store import apply_group_schedule
+from .signals import schedule_changed
 
-# Create your tests here.
+
+class FakeScheduleService:
+    def __init__(self, schedules):
+        self.schedules = schedules
+
+    async def get_known_group_schedule(self, group_name, day):
+        return self.schedules.get(group_name)
+
+
+class FakeSendScheduler:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class DailyDigestTests(TransactionTestCase):
+    # The audience is loaded on the DB executor threads, outside a test transaction
+
+    def subscribe(self, telegram_id, group_name):
+        group, _ = StudentGroup.objects.get_or_create(name=group_name, defaults={'course': '1 курс', 'faculty': ''})
+        user = TelegramUser.objects.create(telegram_id=telegram_id, user_type='student')
+        StudentProfile.objects.create(telegram_user=user, group=group, daily_digest=True)
+
+    def test_daily_digest_is_opt_in(self):
+        user = TelegramUser.objects.create(telegram_id='1', user_type='student')
+        self.assertFalse(StudentProfile.objects.create(telegram_user=user).daily_digest)
+
+    def test_day_without_lessons_sends_nothing(self):
+        self.subscribe('1', 'ДИС-101')
+        self.subscribe('2', 'ДБ-201')
+        self.subscribe('3', 'ДР-301')
+        lesson = {'time': '09:00-10:30', 'subject': 'Экономика', 'teacher': 'Иванов', 'classroom': '101'}
+        send_scheduler = FakeSendScheduler()
+        digest = DailyDigest(send_scheduler, FakeScheduleService({'ДИС-101': [], 'ДБ-201': [lesson]}))
+
+        report = asyncio.run(digest.run(date(2026, 10, 19)))
+
+        # ДИС-101 has an empty day and ДР-301 an unknown schedule
+        self.assertEqual([chat_id for chat_id, _ in send_scheduler.sent], ['2'])
+        self.assertEqual(report['groups_without_lessons'], 2)
+        self.assertEqual(report['sent'], 1)
+
+
+class GroupSearchIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = GroupSearchIndex()
+        self.index.build(FALLBACK_CATALOG)
+
+    def test_short_queries_match_inside_names(self):
+        self.assertIn('ДИС-241.1/21', self.index.search('ИС', limit=100))
+        self.assertIn('ДГД-241.1/21', self.index.search('ГД', limit=100))
+        self.assertTrue(all('ГД' in name for name in self.index.search('ГД', limit=100)))
+
+    def test_short_query_prefers_name_prefix(self):
+        self.assertTrue(self.index.search('ДБ')[0].startswith('ДБ-'))
+
+
+class GroupCatalogTests(TransactionTestCase):
+
+    def test_synced_group_is_not_served_stale_from_identity_cache(self):
+        group = StudentGroup.objects.create(name='ДИС-241.1/21', course='2 курс', faculty='', is_active=False)
+        user = TelegramUser.objects.create(telegram_id='1', user_type='student')
+        StudentProfile.objects.create(telegram_user=user, group=group)
+        self.addCleanup(identity_cache.clear)
+        self.assertEqual(asyncio.run(identity_cache.get('1')).group.course, '2 курс')
+
+        catalog = GroupCatalog('/nonexistent/groups.json')
+        catalog.data = {'1 курс': ['ДИС-241.1/21']}
+        self.assertEqual(catalog.sync_groups(lambda name: ''), {'created': 0, 'updated': 1})
+
+        identity = asyncio.run(identity_cache.get('1'))
+        self.assertEqual(identity.group.course, '1 курс')
+        self.assertTrue(identity.group.is_active)
+
+
+class AnswerCacheTests(TestCase):
+
+    def test_opposite_questions_do_not_share_an_answer(self):
+        cache = AnswerCache()
+        cache.put("Можно ли поступить без ЕГЭ?", "answer", latency=1.0)
+        self.assertIsNone(cache.get("Можно ли поступить с ЕГЭ?"))
+        self.assertNotEqual(normalize_question("Что нужно до сессии?"), normalize_question("Что нужно после сессии?"))
+        self.assertEqual(cache.get("можно ли поступит без ЕГЭ"), "answer")
+
+    def test_answer_from_an_older_knowledge_version_is_not_served(self):
+        cache = AnswerCache()
+        # Generated against version 1, stored after a refresh moved the index to 2
+        cache.put("Сколько стоит обучение?", "old price", latency=1.0, version=1)
+        self.assertIsNone(cache.get("Сколько стоит обучение?", version=2))
+        self.assertIsNone(cache.get("Сколько стоит обучения?", version=2))
+        self.assertEqual(cache.get("Сколько стоит обучение?", version=1), "old price")
+
+
+class FakeUpstream:
+    def __init__(self, schedules):
+        self.schedules = schedules
+        self.cache = self
+        self.cached = {}
+
+    async def fetch_group_schedule(self, group_name, day):
+        return self.schedules[day]
+
+    def set(self, key, entry):
+        self.cached[key] = entry
+
+    def invalidate_week(self, group_name, day):
+        pass
+
+
+class ScheduleCrawlerTests(TransactionTestCase):
+
+    def test_cancelled_day_is_cleared_but_failed_day_is_kept(self):
+        group = StudentGroup.objects.create(name='ДИС-241.1/21', course='1 курс', faculty='')
+        cancelled, unreachable = date(2026, 10, 19), date(2026, 10, 20)
+        lesson = {'time': '09:00-10:30', 'subject': 'Экономика', 'teacher': 'Иванов', 'classroom': '101'}
+        apply_group_schedule(group, {cancelled: [lesson], unreachable: [lesson]})
+        changes = []
+        receiver = lambda sender, **kwargs: changes.append(kwargs)
+        schedule_changed.connect(receiver)
+        self.addCleanup(schedule_changed.disconnect, receiver)
+
+        # [] is a fetched day without lessons, None a failed fetch
+        crawler = ScheduleCrawler(FakeUpstream({cancelled: [], unreachable: None}), days=2)
+        report = asyncio.run(crawler.crawl(cancelled))
+
+        self.assertEqual(report['fetched'], 1)
+        self.assertEqual(report['failed'], 1)
+        self.assertEqual(report['deleted'], 1)
+        self.assertFalse(ScheduleEntry.objects.filter(group=group, date=cancelled).exists())
+        self.assertTrue(ScheduleEntry.objects.filter(group=group, date=unreachable).exists())
+        self.assertEqual(changes[0]['dates'], [cancelled])
+        self.assertEqual(len(changes[0]['diffs'][cancelled]['diff']['removed']), 1)
+        self.assertFalse(changes[0]['diffs'][cancelled]['initial'])
+
+    def test_empty_day_is_fetched_not_failed(self):
+        service = ScheduleService()
+        day = date(2026, 10, 19)
+        with mock.patch.object(service, 'fetch', mock.AsyncMock(return_value=(200, []))):
+            self.assertEqual(asyncio.run(service.fetch_group_schedule('ДИС-241.1/21', day)), [])
+        with mock.patch.object(service, 'fetch', mock.AsyncMock(return_value=(503, None))):
+            self.assertIsNone(asyncio.run(service.fetch_group_schedule('ДИС-241.1/21', day)))
+        failures = sum(endpoint['failures'] for endpoint in service.breaker.stats()['endpoints'].values())
+        self.assertEqual(failures, 3)
+
+    def test_not_found_falls_through_to_next_pattern(self):
+        service = ScheduleService()
+        day = date(2026, 10, 19)
+        endpoints = service.schedule_endpoints('ДИС-241.1/21', day)
+        lesson = {'time': '09:00-10:30', 'subject': 'Экономика', 'teacher': 'Иванов', 'classroom': '101'}
+
+        async def fetch(url):
+            return (200, [lesson]) if url == endpoints['site_path'] else (404, None)
+
+        with mock.patch.object(service, 'fetch', side_effect=fetch):
+            self.assertEqual(asyncio.run(service.fetch_group_schedule('ДИС-241.1/21', day)), [lesson])
+        with mock.patch.object(service, 'fetch', mock.AsyncMock(return_value=(404, None))):
+            self.assertIsNone(asyncio.run(service.fetch_group_schedule('ДИС-241.1/21', day)))
+        stats = service.breaker.stats()['endpoints']
+        self.assertEqual(sum(endpoint['failures'] for endpoint in stats.values()), 0)
+        self.assertEqual(stats['api_path']['successes'], 0)
+
+
+    def test_not_found_day_is_not_a_cancellation(self):
+        group = StudentGroup.objects.create(name='ДИС-241.1/21', course='1 курс', faculty='')
+        day = date(2026, 10, 19)
+        lesson = {'time': '09:00-10:30', 'subject': 'Экономика', 'teacher': 'Иванов', 'classroom': '101'}
+        apply_group_schedule(group, {day: [lesson]})
+        snapshots = ScheduleSnapshot.objects.count()
+        changes = []
+        receiver = lambda sender, **kwargs: changes.append(kwargs)
+        schedule_changed.connect(receiver)
+        self.addCleanup(schedule_changed.disconnect, receiver)
+        service = ScheduleService()
+        endpoints = service.schedule_endpoints(group.name, day)
+
+        async def fetch(url):
+            return (404, None) if url == endpoints['api_path'] else (503, None)
+
+        with mock.patch.object(service, 'fetch', side_effect=fetch):
+            self.assertIsNone(asyncio.run(service.refresh_group_schedule(group.name, day)))
+
+        self.assertEqual(changes, [])
+        self.assertEqual(ScheduleSnapshot.objects.count(), snapshots)
+        self.assertTrue(ScheduleEntry.objects.filter(group=group, date=day).exists())
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerTests(TransactionTestCase):
+
+    def test_message_to_telegram_user_is_saved_and_sent(self):
+        user = TelegramUser.objects.create(telegram_id='42')
+        sent = Future()
+        sent.set_result(None)
+
+        async def exchange():
+            communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+            await communicator.connect()
+            await communicator.send_json_to({'message': 'Здравствуйте', 'telegram_user_id': '42'})
+            response = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return response
+
+        with mock.patch('chat.consumers.send_scheduler') as send_scheduler, \
+                mock.patch('chat.consumers.run_in_bot_loop', return_value=sent), \
+                mock.patch('chat.consumers.message_buffer.add', side_effect=lambda **fields: Message(**fields)) as add:
+            response = asyncio.run(exchange())
+
+        self.assertNotIn('error', response)
+        self.assertEqual(response['message'], 'Здравствуйте')
+        self.assertEqual(add.call_args.kwargs['telegram_user_id'], user.pk)
+        send_scheduler.send_message.assert_called_once_with('42', 'Здравствуйте')
+
+
+class BroadcastMessageTests(TestCase):
+
+    def test_broadcast_that_cannot_be_scheduled_is_failed(self):
+        TelegramUser.objects.create(telegram_id='1', user_type='student')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin'))
+
+        with mock.patch('chat.telegram_bot.bot_loop', None):
+            response = client.post('/api/admin/broadcast/', {'message': 'Завтра занятий нет'}, format='json')
+
+        self.assertEqual(response.status_code, 500)
+        # A failed row is not picked up by resume_unfinished after a restart
+        self.assertEqual(BroadcastMessage.objects.get().status, 'failed')
+
+
+@override_settings(TELEGRAM_WEBHOOK_SECRET='secret')
+class TelegramWebhookTests(TestCase):
+
+    def test_full_redis_queue_is_refused_not_trimmed(self):
+        queue = RedisUpdateQueue('redis://localhost:6379/0', maxsize=1)
+
+        with mock.patch.object(queue, 'push_if_room', return_value=0) as push_if_room, \
+                mock.patch('chat.telegram_bot.update_queue', queue):
+            response = self.client.post(
+                '/api/telegram/webhook/', {'update_id': 1}, content_type='application/json',
+                HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN='secret'
+            )
+
+        # Telegram redelivers a refused update; a trimmed one would be lost
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(push_if_room.call_args.kwargs['args'][1], 1)
+        self.assertEqual(queue.stats()['dropped'], 1)
+        self.assertEqual(queue.stats()['received'], 0)
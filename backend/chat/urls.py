@@ -14,16 +14,22 @@ urlpatterns = [
     # Student and Schedule API endpoints
     path('groups/', views.get_student_groups, name='get_student_groups'),
     path('groups/search/', views.search_groups, name='search_groups'),
+    path('schedule/conflicts/', views.get_schedule_conflicts, name='get_schedule_conflicts'),
+    path('schedule/<path:group_name>/ics', views.group_schedule_ics, name='group_schedule_ics'),
     path('schedule/<str:group_name>/', views.get_group_schedule, name='get_group_schedule'),
     path('schedule/stats/', views.get_schedule_stats, name='get_schedule_stats'),
     path('schedule/update/', views.update_schedule_data, name='update_schedule_data'),
+    path('classrooms/free/', views.get_free_classrooms, name='get_free_classrooms'),
+    path('teachers/<int:teacher_id>/timetable/', views.get_teacher_timetable, name='get_teacher_timetable'),
     
     # Admin API endpoints
     path('admin/sessions/', views.get_chat_sessions, name='get_chat_sessions'),
     path('admin/send/', views.send_admin_message, name='send_admin_message'),
     path('admin/broadcast/', views.broadcast_message, name='broadcast_message'),
+    path('admin/broadcast/<uuid:broadcast_id>/status/', views.get_broadcast_status, name='get_broadcast_status'),
     path('admin/stats/', views.get_documents_stats, name='get_documents_stats'),
     path('admin/user/<str:telegram_user_id>/documents/', views.get_user_documents, name='get_user_documents'),
+    path('admin/metrics/', views.get_bot_metrics, name='get_bot_metrics'),
     
     # AI and webhook endpoints
     path('ai-chat/', views.ai_chat_api, name='ai_chat_api'),
@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
@@ -7,10 +8,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import Message, TelegramUser, ChatSession, Document, ApplicantProfile, BroadcastMessage, ScrapedContent, StudentGroup, StudentProfile, Schedule, ScheduleEntry
-from .serializers import MessageSerializer, TelegramUserSerializer, DocumentSerializer, ChatSessionSerializer, StudentGroupSerializer, ScheduleEntrySerializer
+from .serializers import MessageSerializer, TelegramUserSerializer, DocumentSerializer, ChatSessionSerializer, StudentGroupSerializer, ScheduleEntrySerializer, BroadcastMessageSerializer
 from .services.openai_service import UniversityAIService
-from .services.schedule_service import ScheduleService
+from .services.schedule_service import schedule_service
 import json
+import hmac
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
@@ -88,10 +90,9 @@ def send_message(request):
         
         # Send to Telegram if user_id provided
         if telegram_user_id:
-            from .telegram_bot import bot
-            import asyncio
+            from .telegram_bot import send_scheduler, run_in_bot_loop
             try:
-                asyncio.create_task(bot.send_message(chat_id=telegram_user_id, text=message_text))
+                run_in_bot_loop(send_scheduler.send_message(telegram_user_id, message_text))
             except Exception as e:
                 return Response({'error': f'Failed to send to Telegram: {str(e)}'}, status=500)
         
@@ -124,9 +125,8 @@ def send_admin_message(request):
         )
         
         # Send to Telegram
-        from .telegram_bot import bot
-        import asyncio
-        asyncio.create_task(bot.send_message(chat_id=telegram_user_id, text=message_text))
+        from .telegram_bot import send_scheduler, run_in_bot_loop
+        run_in_bot_loop(send_scheduler.send_message(telegram_user_id, message_text))
         
         serializer = MessageSerializer(message)
         return Response(serializer.data)
@@ -166,44 +166,39 @@ def broadcast_message(request):
         
         # Add to broadcast
         broadcast.target_users.set(target_users)
+        broadcast.total_count = broadcast.target_users.filter(is_active=True).count()
+        broadcast.save(update_fields=['total_count'])
         
-        # Send messages
-        from .telegram_bot import bot
-        import asyncio
-        sent_count = 0
-        
-        async def send_broadcasts():
-            nonlocal sent_count
-            for user in target_users:
-                try:
-                    await bot.send_message(chat_id=user.telegram_id, text=message_text)
-                    
-                    # Save individual message
-                    Message.objects.create(
-                        text=message_text,
-                        source='web',
-                        direction='outgoing',
-                        message_type='admin_broadcast',
-                        telegram_user=user
-                    )
-                    sent_count += 1
-                except Exception as e:
-                    print(f"Failed to send to {user.telegram_id}: {e}")
-            
-            # Update sent count
-            broadcast.sent_count = sent_count
-            broadcast.save()
-        
-        asyncio.create_task(send_broadcasts())
+        # Send messages in the background, chunk by chunk
+        from .telegram_bot import broadcast_engine, run_in_bot_loop
+        try:
+            run_in_bot_loop(broadcast_engine.run(broadcast.id))
+        except Exception:
+            # Not scheduled: keep the row from being resumed after the 500
+            BroadcastMessage.objects.filter(pk=broadcast.pk).update(status='failed')
+            raise
         
         return Response({
-            'message': f'Broadcasting to {target_users.count()} users',
+            'message': f'Broadcasting to {broadcast.total_count} users',
             'broadcast_id': str(broadcast.id)
         })
         
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_broadcast_status(request, broadcast_id):
+    """Get live progress of a broadcast"""
+    try:
+        broadcast = BroadcastMessage.objects.get(id=broadcast_id)
+        serializer = BroadcastMessageSerializer(broadcast)
+        return Response(serializer.data)
+    except BroadcastMessage.DoesNotExist:
+        return Response({'error': 'Broadcast not found'}, status=404)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
 @api_view(['GET'])
 def get_documents_stats(request):
     """Get documents statistics"""
@@ -287,22 +282,72 @@ def ai_chat_api(request):
 
 @csrf_exempt
 def telegram_webhook(request):
-    """Handle Telegram webhooks"""
+    """Handle Telegram webhooks: verify the secret, enqueue the update, ack at once"""
     if request.method == 'POST':
+        # Without a configured secret anyone could post updates: refuse them all
+        secret = settings.TELEGRAM_WEBHOOK_SECRET
+        token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not secret or not hmac.compare_digest(token, secret):
+            return JsonResponse({'error': 'Invalid secret token'}, status=403)
+        
         try:
             data = json.loads(request.body)
-            # Process webhook data here if needed
-            return JsonResponse({'status': 'ok'})
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
+        
+        from .telegram_bot import update_queue
+        if not update_queue.submit(data):
+            # Telegram retries the update later
+            return JsonResponse({'error': 'Update queue unavailable'}, status=503)
+        return JsonResponse({'status': 'ok'})
     
     return JsonResponse({'status': 'method not allowed'}, status=405)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_bot_metrics(request):
+    """Get runtime metrics of the bot pipeline"""
+    from .telegram_bot import update_queue, user_states, send_scheduler, daily_digest
+    from .services.identity_cache import identity_cache
+    from .services.message_buffer import message_buffer
+    from .services.lesson_reminders import lesson_reminders
+    from .services.schedule_notifier import schedule_notifier
+    from .services.interval_index import interval_index
+    from .services.ics_feed import ics_feed
+    from .services.knowledge_index import knowledge_index
+    from .services.vector_index import vector_index
+    from .services.answer_cache import answer_cache
+    from .services.llm_client import llm_client
+    
+    return Response({
+        'update_queue': update_queue.stats(),
+        'state_store': user_states.stats(),
+        'send_scheduler': send_scheduler.stats(),
+        'identity_cache': identity_cache.stats(),
+        'message_buffer': message_buffer.stats(),
+        'schedule_cache': schedule_service.cache.stats(),
+        'schedule_crawl': schedule_service.crawler.last_report,
+        'group_catalog': schedule_service.catalog.stats(),
+        'schedule_endpoints': schedule_service.breaker.stats(),
+        'daily_digest': daily_digest.last_report,
+        'lesson_reminders': lesson_reminders.stats(),
+        'schedule_notifier': schedule_notifier.stats(),
+        'interval_index': interval_index.stats(),
+        'ics_feed': ics_feed.stats(),
+        'knowledge_index': knowledge_index.stats(),
+        'vector_index': vector_index.stats(),
+        'answer_cache': answer_cache.stats(),
+        'llm_client': llm_client.stats(),
+    })
+
 @api_view(['GET'])
 def get_student_groups(request):
     """Get list of student groups"""
     try:
         groups = StudentGroup.objects.filter(is_active=True).order_by('name')
+        course = request.GET.get('course')
+        if course:
+            groups = groups.filter(course=course)
         serializer = StudentGroupSerializer(groups, many=True)
         return Response(serializer.data)
     except Exception as e:
@@ -313,7 +358,6 @@ def get_group_schedule(request, group_name):
     """Get schedule for specific group"""
     try:
         from datetime import datetime
-        import asyncio
         
         # Get date parameter or use today
         date_str = request.GET.get('date')
@@ -322,18 +366,10 @@ def get_group_schedule(request, group_name):
         else:
             date = datetime.now()
         
-        # Get schedule from service (using sync wrapper)
-        schedule_service = ScheduleService()
-        
-        # Run async function in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            schedule_data = loop.run_until_complete(
-                schedule_service.get_group_schedule(group_name, date)
-            )
-        finally:
-            loop.close()
+        # Get schedule from service (sync facade over the async client)
+        schedule_data = schedule_service.run_sync(
+            schedule_service.get_group_schedule(group_name, date)
+        )
         
         return Response({
             'group': group_name,
@@ -348,25 +384,13 @@ def get_group_schedule(request, group_name):
 def search_groups(request):
     """Search groups by query"""
     try:
-        import asyncio
-        
         query = request.data.get('query', '')
         
         if not query:
             return Response({'error': 'Query parameter is required'}, status=400)
         
         # Search groups
-        schedule_service = ScheduleService()
-        
-        # Run async function in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            matching_groups = loop.run_until_complete(
-                schedule_service.search_groups(query)
-            )
-        finally:
-            loop.close()
+        matching_groups = schedule_service.run_sync(schedule_service.search_groups(query))
         
         return Response({
             'query': query,
@@ -376,6 +400,101 @@ def search_groups(request):
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+def group_schedule_ics(request, group_name):
+    """iCalendar feed of a group's schedule (current and next week)"""
+    from django.http import HttpResponse, HttpResponseNotModified
+    from .services.ics_feed import ics_feed
+    
+    try:
+        body, etag = ics_feed.feed(group_name, schedule_service.local_now().date())
+    except StudentGroup.DoesNotExist:
+        return JsonResponse({'error': 'Group not found'}, status=404)
+    
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="schedule.ics"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
+
+def _schedule_day(request):
+    """`date` query parameter (YYYY-MM-DD), today in the schedule time zone by default"""
+    from datetime import datetime
+    
+    date_str = request.GET.get('date')
+    if date_str:
+        return datetime.strptime(date_str, '%Y-%m-%d').date()
+    return schedule_service.local_now().date()
+
+@api_view(['GET'])
+def get_free_classrooms(request):
+    """Classrooms free at `time` (or for the whole `time`-`until` range) on a date"""
+    from datetime import datetime
+    from .services.interval_index import interval_index
+    
+    try:
+        day = _schedule_day(request)
+        start = datetime.strptime(request.GET.get('time', ''), '%H:%M').time()
+        until = request.GET.get('until')
+        end = datetime.strptime(until, '%H:%M').time() if until else None
+    except ValueError:
+        return Response({'error': 'Use date=YYYY-MM-DD, time=HH:MM and optional until=HH:MM'}, status=400)
+    
+    try:
+        classrooms = interval_index.free_classrooms(day, start, end)
+        return Response({
+            'date': day,
+            'time': start.strftime('%H:%M'),
+            'until': end.strftime('%H:%M') if end else None,
+            'classrooms': classrooms
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+def get_teacher_timetable(request, teacher_id):
+    """Lessons of a teacher on a date"""
+    from .services.interval_index import interval_index
+    
+    try:
+        day = _schedule_day(request)
+    except ValueError:
+        return Response({'error': 'Use date=YYYY-MM-DD'}, status=400)
+    
+    try:
+        return Response({
+            'date': day,
+            'teacher_id': teacher_id,
+            'lessons': interval_index.teacher_timetable(day, teacher_id)
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+def get_schedule_conflicts(request):
+    """Double-booked teachers (kind=teacher) or classrooms (kind=classroom) on a date"""
+    from .services.interval_index import interval_index
+    
+    kind = request.GET.get('kind', 'teacher')
+    if kind not in ('teacher', 'classroom'):
+        return Response({'error': 'kind must be teacher or classroom'}, status=400)
+    try:
+        day = _schedule_day(request)
+    except ValueError:
+        return Response({'error': 'Use date=YYYY-MM-DD'}, status=400)
+    
+    try:
+        return Response({
+            'date': day,
+            'kind': kind,
+            'conflicts': interval_index.conflicts(day, kind)
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
 @api_view(['GET'])
 def get_schedule_stats(request):
     """Get schedule statistics"""
@@ -406,14 +525,11 @@ def get_schedule_stats(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-async def update_schedule_data(request):
+def update_schedule_data(request):
     """Update schedule data from external source"""
     try:
-        schedule_service = ScheduleService()
-        
-        # Run update in background (in production, use Celery)
-        import asyncio
-        asyncio.create_task(schedule_service.update_schedule_data())
+        # Run update in background on the schedule service loop
+        schedule_service.submit(schedule_service.update_schedule_data())
         
         return Response({
             'message': 'Schedule update started',
@@ -421,4 +537,4 @@ async def update_schedule_data(request):
         })
         
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
\ No newline at end of file
+        return Response({'error': str(e)}, status=500)
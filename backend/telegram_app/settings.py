@@ -64,15 +64,24 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections of the DB executor threads open between bot updates
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Worker threads for ORM calls made from the bot event loop
+DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', '8'))
+
+# Redis
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
 # Channels configuration
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            'hosts': [os.getenv('REDIS_URL', 'redis://localhost:6379/0')],
+            'hosts': [REDIS_URL],
         },
     },
 }
@@ -110,8 +119,85 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Telegram Bot Configuration
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
+# Update ingestion: 'polling' or 'webhook'
+TELEGRAM_MODE = os.getenv('TELEGRAM_MODE', 'polling').lower()
+TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL', '')
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
+
+# Webhook update queue: 'memory' (in-process asyncio queue) or 'redis'
+TELEGRAM_UPDATE_QUEUE_BACKEND = os.getenv('TELEGRAM_UPDATE_QUEUE_BACKEND', 'memory').lower()
+TELEGRAM_UPDATE_QUEUE_SIZE = int(os.getenv('TELEGRAM_UPDATE_QUEUE_SIZE', '10000'))
+TELEGRAM_UPDATE_WORKERS = int(os.getenv('TELEGRAM_UPDATE_WORKERS', '8'))
+
+# Conversation state store: 'memory' or 'redis' (required for several bot workers)
+BOT_STATE_BACKEND = os.getenv('BOT_STATE_BACKEND', 'memory').lower()
+BOT_STATE_TTL = int(os.getenv('BOT_STATE_TTL', '86400'))
+BOT_STATE_MAX_KEYS = int(os.getenv('BOT_STATE_MAX_KEYS', '50000'))
+
+# Identity cache (TelegramUser + StudentProfile + StudentGroup) used by bot handlers
+IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', '300'))
+IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv('IDENTITY_CACHE_MAX_ENTRIES', '10000'))
+
+# Write-behind buffer for Message rows
+MESSAGE_BUFFER_MAX_BATCH = int(os.getenv('MESSAGE_BUFFER_MAX_BATCH', '200'))
+MESSAGE_BUFFER_FLUSH_INTERVAL = float(os.getenv('MESSAGE_BUFFER_FLUSH_INTERVAL', '1.0'))
+
+# Outbound rate limits (Telegram allows ~30 msg/s overall, 1 msg/s per chat, 20 msg/min per group)
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_GROUP_RATE_PER_MINUTE = float(os.getenv('TELEGRAM_GROUP_RATE_PER_MINUTE', '20'))
+
+# Schedule site HTTP client (raspisanie.mvekspo.ru)
+SCHEDULE_HTTP_TIMEOUT = float(os.getenv('SCHEDULE_HTTP_TIMEOUT', '10'))
+SCHEDULE_HTTP_CONNECT_TIMEOUT = float(os.getenv('SCHEDULE_HTTP_CONNECT_TIMEOUT', '3'))
+SCHEDULE_HTTP_POOL_SIZE = int(os.getenv('SCHEDULE_HTTP_POOL_SIZE', '50'))
+SCHEDULE_HTTP_POOL_PER_HOST = int(os.getenv('SCHEDULE_HTTP_POOL_PER_HOST', '10'))
+
+# Schedule read-through cache: entries older than the TTL are served stale while refreshed
+SCHEDULE_CACHE_TTL = int(os.getenv('SCHEDULE_CACHE_TTL', '900'))
+SCHEDULE_CACHE_MAX_ENTRIES = int(os.getenv('SCHEDULE_CACHE_MAX_ENTRIES', '5000'))
+SCHEDULE_WEEK_CACHE_MAX_ENTRIES = int(os.getenv('SCHEDULE_WEEK_CACHE_MAX_ENTRIES', '1000'))
+# Time zone of lesson times published by the schedule site
+SCHEDULE_TIME_ZONE = os.getenv('SCHEDULE_TIME_ZONE', 'Europe/Moscow')
+# Max concurrent upstream fetches when building a week
+SCHEDULE_WEEK_CONCURRENCY = int(os.getenv('SCHEDULE_WEEK_CONCURRENCY', '4'))
+# Full-catalog crawler: concurrent upstream fetches and number of days crawled per group
+SCHEDULE_CRAWL_CONCURRENCY = int(os.getenv('SCHEDULE_CRAWL_CONCURRENCY', '8'))
+SCHEDULE_CRAWL_DAYS = int(os.getenv('SCHEDULE_CRAWL_DAYS', '7'))
+# Per-endpoint circuit breaker and request hedging for schedule URL patterns
+SCHEDULE_BREAKER_FAILURE_THRESHOLD = int(os.getenv('SCHEDULE_BREAKER_FAILURE_THRESHOLD', '5'))
+SCHEDULE_BREAKER_COOLDOWN = int(os.getenv('SCHEDULE_BREAKER_COOLDOWN', '300'))
+SCHEDULE_HEDGE_PERCENTILE = float(os.getenv('SCHEDULE_HEDGE_PERCENTILE', '0.95'))
+SCHEDULE_HEDGE_MIN_SAMPLES = int(os.getenv('SCHEDULE_HEDGE_MIN_SAMPLES', '20'))
+# Morning schedule digest, local time in SCHEDULE_TIME_ZONE (empty disables it)
+DAILY_DIGEST_TIME = os.getenv('DAILY_DIGEST_TIME', '07:30')
+# Group catalog: revalidated upstream after the TTL, persisted for warm starts
+GROUP_CATALOG_TTL = int(os.getenv('GROUP_CATALOG_TTL', '3600'))
+GROUP_CATALOG_SNAPSHOT = os.getenv('GROUP_CATALOG_SNAPSHOT', str(BASE_DIR / 'group_catalog.json'))
+
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Any OpenAI-compatible endpoint (empty = api.openai.com), e.g. http://127.0.0.1:8089/v1 for run_llm_stub
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+# Max concurrent LLM requests per process and request timeouts in seconds
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '8'))
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+# Min seconds between progressive edits of a streamed bot answer
+AI_STREAM_EDIT_INTERVAL = float(os.getenv('AI_STREAM_EDIT_INTERVAL', '1.0'))
+# Retrieval over scraped university pages: chunks put into the prompt, index snapshot for warm starts
+AI_CONTEXT_CHUNKS = int(os.getenv('AI_CONTEXT_CHUNKS', '5'))
+# How many of them are the top BM25 chunks, the rest come from vector search
+AI_CONTEXT_KEYWORD_CHUNKS = int(os.getenv('AI_CONTEXT_KEYWORD_CHUNKS', '3'))
+KNOWLEDGE_INDEX_SNAPSHOT = os.getenv('KNOWLEDGE_INDEX_SNAPSHOT', str(BASE_DIR / 'knowledge_index.json'))
+# Dense chunk embeddings (hashed char n-grams), memory-mapped float32 matrix
+KNOWLEDGE_VECTORS_PATH = os.getenv('KNOWLEDGE_VECTORS_PATH', str(BASE_DIR / 'knowledge_vectors.npy'))
+KNOWLEDGE_VECTOR_DIM = int(os.getenv('KNOWLEDGE_VECTOR_DIM', '2048'))
+# AI answer cache: LRU size, TTL in seconds, trigram Jaccard threshold for near-duplicate questions
+AI_ANSWER_CACHE_SIZE = int(os.getenv('AI_ANSWER_CACHE_SIZE', '1000'))
+AI_ANSWER_CACHE_TTL = int(os.getenv('AI_ANSWER_CACHE_TTL', '3600'))
+AI_ANSWER_CACHE_SIMILARITY = float(os.getenv('AI_ANSWER_CACHE_SIMILARITY', '0.8'))
 
 # CORS settings for frontend
 CORS_ALLOWED_ORIGINS = [